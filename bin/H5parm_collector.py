@@ -6,7 +6,7 @@ import sys, os, logging
 import codecs
 import numpy as np
 from itertools import chain
-from losoto.h5parm import h5parm, Soltab
+from losoto.h5parm import h5parm, Soltab, makeVirtualH5parm
 from losoto import _version, _logging
 
 _author = "Francesco de Gasperin (astro@voo.it)"
@@ -20,6 +20,7 @@ parser.add_argument('--outsolset', '-u', default='sol000', dest='outsolset', hel
 parser.add_argument('--insoltab', '-t', default=None, dest='insoltab', help='Input soltab name (e.g. tabin000) - if not given use all')
 parser.add_argument('--outh5parm', '-o', default='output.h5', dest='outh5parm', help='Output h5parm name [default: output.h5]')
 parser.add_argument('--verbose', '-V', default=False, action='store_true', help='Go Vebose! (default=False)')
+parser.add_argument('--virtual', '-x', default=False, action='store_true', help='Create a virtual h5parm referencing the input files instead of copying their data, weights are kept as they are (default=False)')
 parser.add_argument('--clobber', '-c', default=False, action='store_true', help='Replace exising outh5parm file instead of appending to it (default=False)')
 args = parser.parse_args()
 
@@ -37,6 +38,18 @@ if len(args.h5parmFiles) == 1 and ',' in args.h5parmFiles[0]:
     args.h5parmFiles = args.h5parmFiles[0].strip('[]').split(',')
     args.h5parmFiles  = [f.strip() for f in args.h5parmFiles]
 
+# virtual view of the input files, no data are copied
+if args.virtual:
+    if os.path.exists(args.outh5parm) and args.clobber:
+        os.remove(args.outh5parm)
+    insoltabs = None if args.insoltab is None else [args.insoltab]
+    h5parmFiles = [h5parmFile.replace("'","") for h5parmFile in args.h5parmFiles]
+    makeVirtualH5parm(h5parmFiles, args.outh5parm, args.insolset, insoltabs, args.outsolset)
+    h5Out = h5parm(args.outh5parm, readonly=True)
+    logging.info(str(h5Out))
+    h5Out.close()
+    sys.exit(0)
+
 # read all tables
 insolset = args.insolset
 if args.insoltab is None:
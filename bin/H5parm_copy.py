@@ -9,8 +9,6 @@ _author = "Francesco de Gasperin (astro@voo.it)"
 import sys, os, glob
 import numpy as np
 import logging
-import pyrap.tables as pt
-import lofar.parmdb
 from losoto import _version
 from losoto import _logging
 import losoto.h5parm
@@ -21,6 +19,7 @@ if __name__=='__main__':
     opt = optparse.OptionParser(usage='%prog [-v] <H5parm:solset> <H5parm:solset> \n'\
                             +_author, version='%prog '+_version.__version__)
     opt.add_option('-V', '--verbose', help='Go VERBOSE! (default=False)', action='store_true', default=False)
+    opt.add_option('-c', '--complevel', help='Re-compress the copied soltabs with this compression level 0-9 (default=keep the original)', type='int', default=None)
     (options, args) = opt.parse_args()
 
     # Check options
@@ -43,27 +42,25 @@ if __name__=='__main__':
         logging.critical("Missing H5parm file.")
         sys.exit(1)
 
-    # retrieve table
-    hf = losoto.h5parm.h5parm(h5parmFromFile)
-    ssF = hf.getSolset(solset=solsetFrom)
-
     # write table
     ht = losoto.h5parm.h5parm(h5parmToFile, readonly=False)
     # check if the solset exists
-    if solsetTo in ht.getSolsets():
+    if solsetTo in ht.getSolsetNames():
         logging.critical('Destination solset already exists, quitting.')
         sys.exit(1)
-    ssT = ht.makeSolset(solsetName = solsetTo, addTables=False)
-    # write the soltabs
-    ssF._f_copy_children(ssT, recursive=True)
 
-    del hf
+    # retrieve table
+    if os.path.samefile(h5parmFromFile, h5parmToFile): hf = ht
+    else: hf = losoto.h5parm.h5parm(h5parmFromFile)
+    ssF = hf.getSolset(solsetFrom)
+
+    # copy the solset on disk, data are not loaded in memory
+    ssT = ssF.copy(ht, solsetTo, complevel=options.complevel)
+    if hf is not ht: hf.close()
 
     # Add entry to history
-    soltabs = ht.getSoltabs(solset=solsetTo)
-    for st in soltabs:
-        sw = losoto.h5parm.solWriter(soltabs[st])
-        sw.addHistory('Copied (from {0}:{1})'.format(h5parmFromFile, solsetFrom))
-    del ht
+    for st in ssT.getSoltabs():
+        st.addHistory('Copied (from {0}:{1})'.format(h5parmFromFile, solsetFrom))
+    ht.close()
 
     logging.info("Done.")
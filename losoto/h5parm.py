@@ -3,7 +3,7 @@
 
 # Retrieving and writing data in H5parm format
 
-import os, sys, re, itertools
+import os, sys, re, itertools, collections
 import numpy as np
 import tables
 import logging
@@ -15,7 +15,7 @@ if int(tables.__version__.split('.')[0]) < 3:
     sys.exit(1)
 
 
-def openSoltab(h5parmFile, solsetName=None, soltabName=None, address=None, readonly=True):
+def openSoltab(h5parmFile, solsetName=None, soltabName=None, address=None, readonly=True, mmap=False):
     """
     Convenience function to get a soltab object from an h5parm file and an address like "solset000/phase000".
 
@@ -31,13 +31,15 @@ def openSoltab(h5parmFile, solsetName=None, soltabName=None, address=None, reado
         solset/soltab name (to use in place of the parameters solset and soltab).
     readonly : bool, optional
         if True the table is open in readonly mode, by default True.
+    mmap : bool, optional
+        if True (and readonly) contiguous tables are accessed through memory maps, by default False.
 
     Returns
     -------
     Soltab obj
         A solution table object.
     """
-    h5 = h5parm(h5parmFile, readonly)
+    h5 = h5parm(h5parmFile, readonly, mmap=mmap)
     if solsetName is None or soltabName is None:
         if address is None:
             logging.error('Address must be specified if solsetName and soltabName are not given.')
@@ -47,6 +49,111 @@ def openSoltab(h5parmFile, solsetName=None, soltabName=None, address=None, reado
     return solset.getSoltab(soltabName)
 
 
+def makeVirtualH5parm(h5parmFiles, outH5parm, solsetName='sol000', soltabNames=None, outSolsetName=None):
+    """
+    Create a solset which is a virtual view of the same solset in many h5parms (e.g. one per subband).
+    Axes values are merged and sorted, the val/weight arrays of each soltab are HDF5 virtual datasets
+    mapping the member arrays onto the merged axes: no data are copied and reads touch only the needed
+    member files. Data not covered by any member have val NaN and weight 0.
+    The output should be opened read-only, writing into it modifies the member files. Requires h5py.
+
+    Parameters
+    ----------
+    h5parmFiles : list
+        H5parm filenames, they are referenced relative to the output file and must not be moved.
+    outH5parm : str
+        Output h5parm filename, created if missing.
+    solsetName : str, optional
+        Solset to collect, by default 'sol000'.
+    soltabNames : list, optional
+        Soltabs to collect, by default all the soltabs of the first h5parm.
+    outSolsetName : str, optional
+        Output solset name, by default the same as solsetName.
+
+    Returns
+    -------
+    str
+        The output solset name.
+    """
+    try:
+        import h5py
+    except ImportError:
+        logging.critical('h5py is needed to create virtual h5parms.')
+        raise Exception('h5py is needed to create virtual h5parms.')
+
+    if outSolsetName is None: outSolsetName = solsetName
+    outDir = os.path.dirname(os.path.abspath(outH5parm))
+
+    # collect axes and member layout
+    h5s = [h5parm(h5parmFile, readonly=True) for h5parmFile in h5parmFiles]
+    if soltabNames is None: soltabNames = list(h5s[0].getCatalog()[solsetName])
+    ants = collections.OrderedDict()
+    sous = collections.OrderedDict()
+    for h5 in h5s:
+        solset = h5.getSolset(solsetName)
+        for name, pos in solset.getAnt().items(): ants.setdefault(name, pos)
+        for name, coord in solset.getSou().items(): sous.setdefault(name, coord)
+
+    tabs = collections.OrderedDict()
+    for soltabName in soltabNames:
+        soltabs = []
+        for h5 in h5s:
+            if not soltabName in h5.getCatalog()[solsetName]:
+                logging.warning('Soltab '+soltabName+' missing in '+h5.fileName+', skipped.')
+                continue
+            soltab = h5.getSolset(solsetName).getSoltab(soltabName)
+            if soltab.getDtype(weight=True) == 'bit':
+                raise Exception('Bit-packed weights in '+h5.fileName+' cannot be mapped in a virtual soltab.')
+            if len(soltabs) > 0 and soltab.getAxesNames() != soltabs[0].getAxesNames():
+                raise Exception('Soltab '+soltabName+' in '+h5.fileName+' has different axes.')
+            soltabs.append(soltab)
+
+        axesNames = soltabs[0].getAxesNames()
+        axesVals = [np.array(sorted(set(itertools.chain(*[soltab.getAxisValues(axis, ignoreSelection=True) \
+                for soltab in soltabs])))) for axis in axesNames]
+        members = []
+        for soltab in soltabs:
+            coords = [np.searchsorted(axisVals, soltab.getAxisValues(axis, ignoreSelection=True)) \
+                    for axis, axisVals in zip(axesNames, axesVals)]
+            fileName = os.path.relpath(os.path.abspath(soltab.obj._v_file.filename), outDir)
+            members.append((fileName, coords, soltab.obj.val.shape))
+        tabs[soltabName] = {'type': soltabs[0].getType(), 'parmdbType': soltabs[0].obj._v_attrs['parmdb_type'], \
+                'axesNames': axesNames, 'axesVals': axesVals, 'members': members, \
+                'valDtype': np.result_type(*[soltab.obj.val.dtype for soltab in soltabs]), \
+                'weightDtype': np.result_type(*[soltab.obj.weight.dtype for soltab in soltabs])}
+    for h5 in h5s: h5.close()
+
+    # groups, axes and tables
+    H = h5parm(outH5parm, readonly=False)
+    solset = H.makeSolset(outSolsetName)
+    outSolsetName = solset.name
+    if len(ants) > 0: solset.obj.antenna.append(list(ants.items()))
+    if len(sous) > 0: solset.obj.source.append(list(sous.items()))
+    for soltabName, tab in tabs.items():
+        soltab = H.H.create_group(solset.obj, soltabName, title=tab['type'])
+        soltab._v_attrs['parmdb_type'] = tab['parmdbType']
+        for axisName, axisVals in zip(tab['axesNames'], tab['axesVals']):
+            H.H.create_array(soltab, axisName, obj=axisVals)
+    H.close()
+
+    # virtual val/weight arrays, a mapping for each block of contiguous positions of each member
+    with h5py.File(outH5parm, 'a') as f:
+        for soltabName, tab in tabs.items():
+            shape = tuple(len(axisVals) for axisVals in tab['axesVals'])
+            for name, dtype, fillvalue in [('val', tab['valDtype'], np.nan), ('weight', tab['weightDtype'], 0)]:
+                layout = h5py.VirtualLayout(shape=shape, dtype=dtype)
+                for fileName, coords, memberShape in tab['members']:
+                    source = h5py.VirtualSource(fileName, '/'+solsetName+'/'+soltabName+'/'+name, shape=memberShape)
+                    for runs in itertools.product(*[_listToRuns(c) for c in coords]):
+                        layout[tuple(slice(r[0], r[1]) for r in runs)] = \
+                                source[tuple(slice(r[2], r[2]+r[1]-r[0]) for r in runs)]
+                dset = f['/'+outSolsetName+'/'+soltabName].create_virtual_dataset(name, layout, fillvalue=fillvalue)
+                dset.attrs['AXES'] = ','.join(tab['axesNames'])
+
+    logging.info('Virtual solset '+outSolsetName+' created in '+outH5parm+' from '+str(len(h5parmFiles))+' h5parms.')
+    return outSolsetName
+
+
 class h5parm( object ):
     """
     Create an h5parm object.
@@ -58,21 +165,38 @@ class h5parm( object ):
     readonly : bool, optional
         if True the table is open in readonly mode, by default True.
     complevel : int, optional
-        compression level from 0 to 9 when creating the file, by default 5.
+        compression level from 0 to 9 when creating the file, by default 0.
+        If > 0 the val/weight arrays of new soltabs are stored as chunked, compressed CArrays.
     complib : str, optional
-        library for compression: lzo, zlib, bzip2, by default zlib.
+        library for compression: zlib, lzo, bzip2, blosc, blosc:lz4, blosc:zstd..., by default zlib.
+    mmap : bool, optional
+        if True (only in readonly mode) uncompressed, contiguous val/weight arrays are read through
+        read-only numpy memory maps instead of being copied, by default False. Requires h5py.
+    swmr : bool, optional
+        if True use the HDF5 single-writer/multiple-reader mode, by default False. Requires h5py.
+        In readonly mode the file is read while another process writes it, use Soltab.refresh() to see
+        the new data. Otherwise the file is written in SWMR mode, see startSwmr(): an existing file is
+        switched to SWMR immediately, a new file is created in the latest HDF5 format (needed by SWMR)
+        and opened normally to create its solsets/soltabs, then call startSwmr().
     """
 
-    def __init__(self, h5parmFile, readonly=True, complevel=0, complib='zlib'):
+    def __init__(self, h5parmFile, readonly=True, complevel=0, complib='zlib', mmap=False, swmr=False):
 
         self.H = None # variable to store the pytable object
         self.fileName = h5parmFile
 
+        if complib not in tables.filters.all_complibs:
+            logging.critical('Compression library '+complib+' not available, use one of: '+', '.join(tables.filters.all_complibs)+'.')
+            raise Exception('Compression library '+complib+' not available.')
+
         if os.path.isfile(h5parmFile):
             if not tables.is_hdf5_file(h5parmFile):
                 logging.critical('Not a HDF5 file: '+h5parmFile+'.')
                 raise Exception('Not a HDF5 file: '+h5parmFile+'.')
-            if readonly:
+            if readonly and swmr:
+                logging.debug('Reading from '+h5parmFile+' in SWMR mode.')
+                self.H = SwmrFile(h5parmFile, readonly=True)
+            elif readonly:
                 logging.debug('Reading from '+h5parmFile+'.')
                 self.H = tables.open_file(h5parmFile, 'r', IO_BUFFER_SIZE=1024*1024*10, BUFFER_TIMES=500)
             else:
@@ -88,6 +212,17 @@ class h5parm( object ):
             if not is_h5parm:
                 logging.warning('Missing H5pram version. Is this a properly made h5parm?')
 
+            if mmap:
+                if readonly and not swmr: _mmaps[id(self.H)] = {}
+                else: logging.warning('Memory mapping is available only in readonly, non-SWMR mode, ignoring.')
+
+            if swmr and not readonly:
+                try:
+                    self.startSwmr()
+                except:
+                    self.close()
+                    raise
+
         else:
             if readonly:
                 raise Exception('Missing file '+h5parmFile+'.')
@@ -95,7 +230,55 @@ class h5parm( object ):
                 logging.debug('Creating '+h5parmFile+'.')
                 # add a compression filter
                 f = tables.Filters(complevel=complevel, complib=complib)
-                self.H = tables.open_file(h5parmFile, filters=f, mode='w', IO_BUFFER_SIZE=1024*1024*10, BUFFER_TIMES=500)
+                if swmr:
+                    # pytables cannot choose the file format, the file is created by h5py
+                    try:
+                        import h5py
+                    except ImportError:
+                        logging.critical('h5py is needed for SWMR mode.')
+                        raise Exception('h5py is needed for SWMR mode.')
+                    h5py.File(h5parmFile, 'w', libver='latest').close()
+                    self.H = tables.open_file(h5parmFile, mode='r+', IO_BUFFER_SIZE=1024*1024*10, BUFFER_TIMES=500)
+                    self.H.filters = f
+                else:
+                    self.H = tables.open_file(h5parmFile, filters=f, mode='w', IO_BUFFER_SIZE=1024*1024*10, BUFFER_TIMES=500)
+
+
+    def startSwmr(self):
+        """
+        Switch the file to SWMR writing: from now on other processes can open it with h5parm(swmr=True)
+        while this object appends data (Soltab.append()), flags or modifies values (Soltab.setValues())
+        and adds history to the existing soltabs. Solsets/soltabs can no longer be created, removed or renamed.
+        Solset/Soltab objects obtained before must be obtained again.
+
+        The file must be in the latest HDF5 format, as made by h5parm(swmr=True), existing files can be converted
+        with "h5repack --latest". Statistics are removed, as attributes cannot be safely modified in SWMR mode,
+        they are computed when needed and stored again the next time the file is written normally.
+        """
+        if isinstance(self.H, SwmrFile):
+            logging.warning('Already in SWMR mode.')
+            return
+        if self.H.mode == 'r':
+            logging.error('Cannot write a file opened in readonly mode.')
+            raise Exception('Cannot write a file opened in readonly mode.')
+
+        if _superblockVersion(self.fileName) < 3:
+            logging.critical('SWMR needs a file in the latest HDF5 format, convert '+self.fileName+' with "h5repack --latest".')
+            raise Exception('SWMR needs a file in the latest HDF5 format, convert '+self.fileName+' with "h5repack --latest".')
+
+        # nodes cannot be created or removed later
+        _flushStats(self.H, discard=True)
+        for solset in self.getSolsets():
+            for soltabName, soltabInfo in self.getCatalog()[solset.name].items():
+                if soltabInfo is None: continue
+                soltab = solset.getSoltab(soltabName)
+                soltab._getHistoryTable(create=True)
+                for attrName in soltab.obj._v_attrs._v_attrnames[:]:
+                    if attrName.startswith('stats_'): soltab.obj._f_delattr(attrName)
+
+        logging.info('Switching '+self.fileName+' to SWMR mode.')
+        self.close()
+        self.H = SwmrFile(self.fileName, readonly=False)
 
 
     def close(self):
@@ -103,6 +286,11 @@ class h5parm( object ):
         Close the open table.
         """
         logging.debug('Closing table.')
+        if self.H.isopen:
+            if self.H.mode != 'r': _flushStats(self.H)
+            cacheManager.clear(self.H)
+            _mmaps.pop(id(self.H), None)
+            _catalogs.pop(id(self.H), None)
         self.H.close()
 
 
@@ -146,6 +334,7 @@ class h5parm( object ):
             solsetName = self._firstAvailSolsetName()
 
         logging.info('Creating a new solution-set: '+solsetName+'.')
+        _catalogs.pop(id(self.H), None)
         solset = self.H.create_group("/", solsetName)
         solset._f_setattr('h5parm_version', losoto._version.__h5parmVersion__)
 
@@ -165,6 +354,20 @@ class h5parm( object ):
         return Solset(solset)
 
 
+    def getCatalog(self):
+        """
+        Get the names, types and axes of all solsets/soltabs without building their objects.
+        The catalog is read once per file and cached.
+
+        Returns
+        -------
+        OrderedDict
+            {solsetName: {soltabName: {'type': str, 'axesNames': list, 'axesLens': list}}},
+            the soltab entry is None for soltabs without valid data.
+        """
+        return _getCatalog(self.H)
+
+
     def getSolsets(self):
         """
         Get all solution set objects.
@@ -175,7 +378,7 @@ class h5parm( object ):
             A list of all solsets objects.
         """
         solsets = []
-        for solset in self.H.root._v_groups.itervalues():
+        for solset in self.H.root._v_groups.values():
             solsets.append(Solset(solset))
         return solsets
 
@@ -216,6 +419,43 @@ class h5parm( object ):
         return Solset(self.H.get_node('/',solset))
 
 
+    def getCheckpoints(self):
+        """
+        Get the checkpoints of the parset steps run on this file (see lib_losoto.runSteps()),
+        stored as CHECKPOINTnnn attributes of the root group.
+
+        Returns
+        -------
+        list
+            One dict per step, in running order: {'step': str, 'operation': str, 'params': str,
+            'inputs': {soltab: hash}, 'outputs': {soltab: hash or None if deleted}}.
+        """
+        import json
+        attrs = [attr for attr in self.H.root._v_attrs._f_list("user") if re.match(r'^CHECKPOINT[0-9]{3}$', attr)]
+        return [json.loads(self.H.root._v_attrs[attr]) for attr in sorted(attrs)]
+
+
+    def addCheckpoint(self, checkpoint):
+        """
+        Add the checkpoint of a parset step, see getCheckpoints().
+
+        Parameters
+        ----------
+        checkpoint : dict
+            The checkpoint.
+        """
+        import json
+        self.H.root._v_attrs['CHECKPOINT%03d' % len(self.getCheckpoints())] = json.dumps(checkpoint)
+
+
+    def clearCheckpoints(self):
+        """
+        Remove all checkpoints, see getCheckpoints().
+        """
+        for attr in self.H.root._v_attrs._f_list("user"):
+            if re.match(r'^CHECKPOINT[0-9]{3}$', attr): self.H.root._f_delattr(attr)
+
+
     def _firstAvailSolsetName(self):
         """
         Find the first available solset name which has the form of "sol###".
@@ -233,7 +473,7 @@ class h5parm( object ):
         return "sol%03d" % min(list(set(range(1000)) - set(nums)))
 
 
-    def printInfo(self, filter=None, verbose=False):
+    def printInfo(self, filter=None, verbose=False, recompute=False):
         """
         Used to get readable information on the h5parm file.
 
@@ -242,7 +482,9 @@ class h5parm( object ):
         filter: str, optional
             Solution set name to get info for
         verbose: bool, optional
-            If True, return additional info on axes
+            If True, return additional info on axes and the flagged fraction per antenna
+        recompute: bool, optional
+            If True, compute the statistics from the data instead of using the stored ones
 
         Returns
         -------
@@ -334,19 +576,21 @@ class h5parm( object ):
             # operations applied to the table.
             if verbose:
                 logging.warning('Axes values saved in '+self.fileName+'-axes_values.txt')
-                f = file(self.fileName+'-axes_values.txt','a')
-            soltabs = solset.getSoltabs()
-            names = np.array([s.name for s in soltabs])
-            sorted_soltabs = [x for _, x in sorted(zip(names, soltabs))]
-            for soltab in sorted_soltabs:
+                f = open(self.fileName+'-axes_values.txt','a')
+            soltabsInfo = self.getCatalog()[solset.name]
+            for soltabName in sorted(soltabsInfo):
+                soltabInfo = soltabsInfo[soltabName]
+                if soltabInfo is None:
+                    info += "\nSolution table '%s': No valid data found\n" % (soltabName)
+                    continue
                 try:
+                    soltab = solset.getSoltab(soltabName)
                     if verbose:
                         f.write("### /"+solset.name+"/"+soltab.name+"\n")
                     logging.debug('Fetching info for '+soltab.name+'.')
-                    axisNames = soltab.getAxesNames()
+                    axisNames = soltabInfo['axesNames']
                     axis_str_list = []
-                    for axisName in axisNames:
-                        nslots = soltab.getAxisLen(axisName)
+                    for axisName, nslots in zip(axisNames, soltabInfo['axesLens']):
                         if nslots > 1:
                             pls = "s"
                         else:
@@ -359,9 +603,21 @@ class h5parm( object ):
                             if axisName == 'freq': f.write(" ".join(["{0:.8f}".format(v) for v in vals])+"\n\n")
                             elif axisName == 'time': f.write(" ".join(["{0:.7f}".format(v) for v in vals])+"\n\n")
                             else: f.write(" ".join(["{}".format(v) for v in vals])+"\n\n")
-                    info += "\nSolution table '%s' (type: %s): %s\n" % (soltab.name, soltab.getType(), ", ".join(axis_str_list))
-                    weights = soltab.getValues(weight = True, retAxesVals = False)
-                    info += '    Flagged data: %.3f%%\n' % (100.*np.sum(weights==0)/len(weights.flat))
+                    info += "\nSolution table '%s' (type: %s): %s\n" % (soltab.name, soltabInfo['type'], ", ".join(axis_str_list))
+                    size = np.prod(soltabInfo['axesLens'])
+                    stats = soltab.getStats(recompute=recompute)
+                    info += '    Flagged data: %.3f%%\n' % (100.*stats['flagged']/size)
+                    if size > stats['nan']:
+                        info += '    Values: mean %g' % (stats['sum']/(size-stats['nan']))
+                        if stats['minmax']: info += ', min %g, max %g' % (stats['min'], stats['max'])
+                        info += ', NaNs: %i\n' % stats['nan']
+                    if verbose and 'ant' in axisNames:
+                        fractions = soltab.getFlaggedFraction('ant')
+                        antFlagged = ", ".join(["%s:%.1f%%" % (ant, 100.*frac) for ant, frac in \
+                                zip(soltab.getAxisValues('ant', ignoreSelection=True), fractions)])
+                        info += 4*" " + "Flagged per antenna: "
+                        joinstr = "\n" + 4*" "
+                        info += joinstr.join(wrap(antFlagged)) + "\n"
 
                     # Add some extra attributes stored in screen-type tables
                     if soltab.getType() == 'screen':
@@ -381,241 +637,1528 @@ class h5parm( object ):
                         joinstr = "\n" + 13*" "
                         info += joinstr.join(wrap(history)) + "\n"
                 except tables.exceptions.NoSuchNodeError:
-                    info += "\nSolution table '%s': No valid data found\n" % (soltab.name)
+                    info += "\nSolution table '%s': No valid data found\n" % (soltabName)
 
             if verbose:
                 f.close()
         return info
 
 
-class Solset( object ):
+def _getAvailableMemory():
     """
-    Create a solset object
+    Get the memory available to the process: the available system memory, capped by the cgroup memory limit.
 
-    Parameters
-    ----------
-    solset : pytables group
-        The solution set pytables group object
+    Returns
+    -------
+    int or None
+        Memory in bytes, None if unknown.
     """
+    available = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'): available = int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    if available is None:
+        try:
+            available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            return None
 
-    def __init__(self, solset):
+    # cgroup v2 and v1
+    for limitFile in ['/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes']:
+        try:
+            with open(limitFile) as f:
+                limit = f.read().strip()
+            if limit != 'max': available = min(available, int(limit))
+            break
+        except (IOError, ValueError):
+            pass
+    return available
 
-        if not isinstance( solset, tables.Group ):
-            logging.error("Object must be initialized with a pyTables Group object.")
-            sys.exit(1)
 
-        self.obj = solset
-        self.name = solset._v_name
+def _getDtype(dtype):
+    """
+    Get the numpy dtype and pytables atom for a val/weight dtype.
 
-    def close(self):
-        """
-        """
-        self.obj._g_flushGroup()
+    Parameters
+    ----------
+    dtype : str or numpy dtype
+        One of 'f16', 'f32', 'f64' or the equivalent numpy dtype.
 
+    Returns
+    -------
+    tuple
+        (numpy dtype, pytables Atom)
+    """
+    if not isinstance(dtype, str): dtype = 'f%i' % (np.dtype(dtype).itemsize*8)
+    assert dtype in ['f16','f32', 'f64'], "Allowed dtypes are 'f16','f32', 'f64'"
+    if dtype == 'f16':
+        return np.float16, tables.Float16Atom()
+    elif dtype == 'f32':
+        return np.float32, tables.Float32Atom()
+    elif dtype == 'f64':
+        return np.float64, tables.Float64Atom()
 
-    def delete(self):
-        """
-        Delete this solset.
-        """
-        logging.info("Solset \""+self.name+"\" deleted.")
-        self.obj._f_remove(recursive=True)
 
+def _chunkShape(shape, itemsize, axesNames, contiguousAxis=None, chunkBytes=2**18):
+    """
+    Guess a chunk shape for a val/weight array.
+    The contiguous axis is kept as long as possible inside each chunk, then the other axes are
+    grown (antennas and directions last) until the chunk reaches chunkBytes. This keeps partial
+    reads selecting a few antennas/directions cheap.
 
-    def rename(self, newname, overwrite=False):
-        """
-        Rename this solset.
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array.
+    itemsize : int
+        Size in bytes of a single element.
+    axesNames : list
+        List with the axes names.
+    contiguousAxis : str, optional
+        Axis most frequently read in full (e.g. 'time' or 'freq'), by default 'time' if present.
+    chunkBytes : int, optional
+        Target chunk size in bytes, by default 256 kB.
 
-        Parameters
-        ----------
-        newname : str
-            New solution set name.
-        overwrite : bool, optional
-            Overwrite existing solset with same name.
-        """
-        self.obj._f_rename(newname, overwrite)
-        logging.info('Solset "'+self.name+'" renamed to "'+newname+'".')
-        self.name = self.obj._v_name
+    Returns
+    -------
+    tuple
+        The chunk shape.
+    """
+    if contiguousAxis is None and 'time' in axesNames: contiguousAxis = 'time'
+    chunk = [1] * len(shape)
+    maxElements = max(1, chunkBytes // itemsize)
 
+    # order in which axes are grown: contiguous axis, then the others from the fastest varying,
+    # antenna and direction last as they are the most commonly sub-selected
+    order = list(range(len(shape)))[::-1]
+    order.sort(key=lambda i: (axesNames[i] != contiguousAxis, axesNames[i] in ['ant','dir']))
 
-    def makeSoltab(self, soltype=None, soltabName=None,
-            axesNames = [], axesVals = [], chunkShape=None, vals=None,
-            weights=None, parmdbType='', weightDtype='f16'):
-        """
-        Create a Soltab into this solset.
+    for i in order:
+        nElements = int(np.prod(chunk))
+        if nElements >= maxElements: break
+        chunk[i] = int(min(shape[i], max(1, maxElements // nElements)))
 
-        Parameters
-        ----------
-        soltype : str
-            Solution-type (e.g. amplitude, phase)
-        soltabName : str, optional
-            The solution-table name, if not specified is generated from the solution-type
-        axesNames : list
-            List with the axes names
-        axesVals : list
-            List with the axes values (each is a separate list)
-        chunkShape : list, optional
-            List with the chunk shape
-        vals : numpy array
-            Array with shape given by the axesVals lenghts
-        weights : numpy array
-            Same shape of the vals array
-            0->FLAGGED, 1->MAX_WEIGHT
-        parmdbType : str
-            Original parmdb solution type
-        weightDtype : str
-            THe dtype of weights allowed values are ('f16' or 'f32' or 'f64')
+    return tuple(chunk)
 
-        Returns
-        -------
-        soltab obj
-            Newly created soltab object
-        """
 
-        if soltype is None:
-            raise Exception("Solution-type not specified while adding a solution-table.")
+def _superblockVersion(filename):
+    """
+    Get the version of the superblock of an HDF5 file, 3 or more for files in the latest format (needed by SWMR).
+    The superblock is at the beginning of the file or after a user block (512, 1024, 2048... bytes).
+    """
+    with open(filename, 'rb') as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            header = f.read(9)
+            if len(header) < 9: return -1
+            if header[:8] == b'\x89HDF\r\n\x1a\n': return ord(header[8:9])
+            offset = max(512, 2*offset)
 
-        # checks on the soltab
-        if type(soltabName) is str and not re.match(r'^[A-Za-z0-9_-]+$', soltabName):
-            logging.warning('Solution-table '+soltabName+' contains unsuported characters. Use [A-Za-z0-9_-]. Switching to default.')
-            soltabName = None
 
-        if soltabName in self.getSoltabNames():
-            logging.warning('Solution-table '+soltabName+' already present. Switching to default.')
-            soltabName = None
+# memory maps of the contiguous val/weight arrays of files opened with mmap=True: id(file) -> {path: memmap or None}
+_mmaps = {}
 
-        if soltabName is None:
-            soltabName = self._fisrtAvailSoltabName(soltype)
 
-        logging.info('Creating a new solution-table: '+soltabName+'.')
+# catalogs of the solsets/soltabs of the open files: id(file) -> catalog, see _getCatalog()
+_catalogs = {}
 
-        # check input
-        assert len(axesNames) == len(axesVals)
-        dim = []
-        for i, axisName in enumerate(axesNames):
-            dim.append(len(axesVals[i]))
-        assert dim == list(vals.shape)
-        assert dim == list(weights.shape)
 
-        # if input is OK, create table
-        soltab = self.obj._v_file.create_group("/"+self.name, soltabName, title=soltype)
-        soltab._v_attrs['parmdb_type'] = parmdbType
-        for i, axisName in enumerate(axesNames):
-            #axis = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, axisName,\
-            #        obj=axesVals[i], chunkshape=[len(axesVals[i])])
-            axis = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, axisName, obj=axesVals[i])
-
-        # create the val/weight Carrays
-        #val = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, 'val', obj=vals.astype(np.float64), chunkshape=None, atom=tables.Float64Atom())
-        #weight = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, 'weight', obj=weights.astype(np.float16), chunkshape=None, atom=tables.Float16Atom())
-        # array do not have compression but are much faster
-        val = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, 'val', obj=vals.astype(np.float64), atom=tables.Float64Atom())
-        assert weightDtype in ['f16','f32', 'f64'], "Allowed weight dtypes are 'f16','f32', 'f64'"
-        if weightDtype == 'f16':
-            np_d = np.float16
-            pt_d = tables.Float16Atom()
-        elif weightDtype == 'f32':
-            np_d = np.float32
-            pt_d = tables.Float32Atom()
-        elif weightDtype == 'f64':
-            np_d = np.float64
-            pt_d = tables.Float64Atom()
-        weight = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, 'weight', obj=weights.astype(np_d), atom=pt_d)
-        val.attrs['AXES'] = ','.join([axisName for axisName in axesNames])
-        weight.attrs['AXES'] = ','.join([axisName for axisName in axesNames])
+# statistics modified and not yet stored in the soltab attributes: (id(file), soltab path) -> [soltab group, stats, axes],
+# stats is None if they must be computed again from the data, with per-axis counters for axes (see Soltab._getStats())
+_stats = {}
 
-        return Soltab(soltab)
 
+def _flushStats(fileh, pathnames=None, discard=False):
+    """
+    Store in the soltab attributes the statistics modified in memory, see Soltab._setStats().
 
-    def _fisrtAvailSoltabName(self, soltype):
-        """
-        Find the first available soltab name which
-        has the form of "soltypeName###"
+    Parameters
+    ----------
+    fileh : pytables File
+        The file handler.
+    pathnames : list, optional
+        Soltab paths (e.g. "/sol000/phase000") or solset paths (all their soltabs), by default all the soltabs of the file.
+    discard : bool, optional
+        Forget the statistics instead of storing them (e.g. the soltabs are deleted), by default False.
+    """
+    for key in [key for key in _stats if key[0] == id(fileh)]:
+        if pathnames is not None and not key[1] in pathnames and not os.path.dirname(key[1]) in pathnames: continue
+        obj, stats, perAxis = _stats.pop(key)
+        if discard: continue
+        if stats is None: stats = Soltab(obj)._computeCurrentStats(perAxis)
+        for name, val in stats.items():
+            obj._v_attrs['stats_'+name] = val
 
-        Parameters
-        ----------
-        soltype : str
-            Type of solution (amplitude, phase, RM, clock...)
 
-        Returns
-        -------
-        str
-            First available soltab name
-        """
-        nums = []
-        for soltab in self.getSoltabs():
-            if re.match(r'^'+soltype+'[0-9][0-9][0-9]$', soltab.name):
-                nums.append(int(soltab.name[-3:]))
+def _getCatalog(fileh):
+    """
+    Get the catalog of the solsets/soltabs of a file, read once and cached until a solset or
+    soltab is created, deleted or renamed. Only groups and attributes are read, not the arrays.
 
-        return soltype+"%03d" % min(list(set(range(1000)) - set(nums)))
+    Parameters
+    ----------
+    fileh : pytables File
+        The open file.
 
+    Returns
+    -------
+    OrderedDict
+        {solsetName: {soltabName: {'type': str, 'axesNames': list, 'axesLens': list}}},
+        the soltab entry is None for soltabs without valid data.
+    """
+    catalog = _catalogs.get(id(fileh))
+    if catalog is None:
+        # sorted by name as in the file, the order of the groups in memory depends on when they were created
+        catalog = collections.OrderedDict()
+        for solsetName, solset in sorted(fileh.root._v_groups.items()):
+            soltabs = catalog[solsetName] = collections.OrderedDict()
+            for soltabName, soltab in sorted(solset._v_groups.items()):
+                try:
+                    axesNames = soltab.val.attrs['AXES']
+                    if not isinstance(axesNames, str): axesNames = str(axesNames, 'utf-8')
+                    soltabs[soltab._v_name] = {'type': str(soltab._v_title), 'axesNames': axesNames.split(','), \
+                            'axesLens': [int(n) for n in soltab.val.shape]}
+                except (tables.exceptions.NoSuchNodeError, KeyError):
+                    soltabs[soltab._v_name] = None
+        _catalogs[id(fileh)] = catalog
+    return catalog
 
-    def getSoltabs(self, useCache=False, sel={}):
-        """
-        Get all Soltabs in this Solset.
 
-        Parameters
-        ----------
-        useCache : bool, optional
-            soltabs obj will use cache, by default False
-        sel : dict, optional
-            selection dict, by default no selection
+def _getMmap(node):
+    """
+    Get a read-only memory map of a pytables array, if its file was opened with mmap=True.
+    Only uncompressed, contiguous arrays can be mapped, None is returned otherwise
+    and the array must be read normally.
 
-        Returns
-        -------
-        list
-            List of solution tables objects for all available soltabs in this solset
-        """
-        soltabs = []
-        for soltab in self.obj._v_groups.itervalues():
-            soltabs.append(Soltab(soltab, useCache, sel))
-        return soltabs
+    Parameters
+    ----------
+    node : pytables Array
+        The val or weight array of a soltab.
 
+    Returns
+    -------
+    numpy.memmap or None
+        The memory map of the array data.
+    """
+    maps = _mmaps.get(id(node._v_file))
+    if maps is None: return None
 
-    def getSoltabNames(self):
-        """
-        Get all Soltab names in this Solset.
+    if not node._v_pathname in maps:
+        maps[node._v_pathname] = None
+        if node.chunkshape is None and node.filters.complevel == 0:
+            try:
+                import h5py
+            except ImportError:
+                logging.warning('h5py is needed for memory mapping, reading data normally.')
+                _mmaps.pop(id(node._v_file)) # do not try again for this file
+                return None
+            with h5py.File(node._v_file.filename, 'r') as f:
+                dset = f[node._v_pathname]
+                # None if the data space is not allocated or the dataset is virtual
+                offset = None if dset.is_virtual else dset.id.get_offset()
+                dtype = dset.dtype
+            if offset is not None:
+                logging.debug('Memory mapping '+node._v_pathname+'.')
+                maps[node._v_pathname] = np.memmap(node._v_file.filename, dtype=dtype, mode='r', offset=offset, shape=node.shape)
 
-        Returns
-        -------
-        list
-            List of str for all available soltabs in this solset.
-        """
-        soltabNames = []
-        for soltabName in iter( self.obj._v_groups.keys() ):
-            soltabNames.append(soltabName)
-        return soltabNames
+    return maps[node._v_pathname]
 
 
-    def getSoltab(self, soltab, useCache=False, sel={}):
-        """
-        Get a soltab with a given name.
+# estimated cost of a single HDF5 read/write call, in number of array elements
+ioCallCost = 2**14
 
-        Parameters
-        ----------
-        soltab : str
-            A solution table name.
-        useCache : bool, optional
-            Soltabs obj will use cache, by default False.
-        sel : dict, optional
-            Selection dict, by default no selection.
 
-        Returns
-        -------
-        soltab obj
-            A solution table obj.
-        """
-        if soltab is None:
-            raise Exception("Solution-table not specified while querying for solution-table.")
+def _sameAxisSelection(sel1, sel2):
+    """
+    Check if two selections of an axis (None, slice, int or list) are the same.
+    """
+    if sel1 is sel2: return True
+    if isinstance(sel1, slice) or isinstance(sel2, slice) or sel1 is None or sel2 is None: return sel1 == sel2
+    return np.array_equal(sel1, sel2)
 
-        if not soltab in self.getSoltabNames():
-            raise Exception("Solution-table "+soltab+" not found in solset "+self.name+".")
 
-        return Soltab(self.obj._f_get_child(soltab), useCache, sel)
+def _selectionShape(selection, shape):
+    """
+    Shape of the array returned by an (orthogonal) selection, int entries remove the axis.
 
+    Parameters
+    ----------
+    selection : list
+        A list of slices, lists or ints (one per axis).
+    shape : tuple
+        Shape of the array the selection is applied to.
 
-    def getAnt(self):
-        """
-        Get the antenna subtable with antenna names and positions.
+    Returns
+    -------
+    tuple
+        Shape of the selected array.
+    """
+    selShape = []
+    for sel, n in zip(selection, shape):
+        if isinstance(sel, slice): selShape.append(len(range(*sel.indices(n))))
+        elif isinstance(sel, list): selShape.append(len(sel))
+    return tuple(selShape)
+
+
+def _listToRuns(idx):
+    """
+    Split a list of indexes in runs of consecutive values.
+
+    Parameters
+    ----------
+    idx : list
+        List of indexes.
+
+    Returns
+    -------
+    list
+        A [start, stop, position of start in idx] entry for each run.
+    """
+    runs = []
+    for o, i in enumerate(idx):
+        if len(runs) > 0 and i == runs[-1][1]: runs[-1][1] += 1
+        else: runs.append([i, i+1, o])
+    return runs
+
+
+def _outAxis(selection, axis):
+    # axis of the selected array corresponding to an axis of the original array (ints remove axes)
+    return axis - len([sel for sel in selection[:axis] if not isinstance(sel, (slice, list))])
+
+
+def _planSelection(selection, shape, write=False):
+    """
+    Decide how to access an HDF5 array with more than one list in the selection.
+    PyTables accepts only one list per selection, the other lists are split in runs of contiguous
+    values (hyperslabs). The alternative is to access the bounding box of the selection (superset)
+    and apply the lists in memory. The cheaper strategy is chosen counting ioCallCost elements for each HDF5 call.
+
+    Parameters
+    ----------
+    selection : list
+        A list of slices, lists or ints (one per axis).
+    shape : tuple
+        Shape of the array the selection is applied to.
+    write : bool, optional
+        If True plan a write (the superset must be read and written back), by default False.
+
+    Returns
+    -------
+    tuple
+        ('superset', None) or ('runs', (axis kept as a list, dict axis->runs)).
+    """
+    listsIdx = [i for i, sel in enumerate(selection) if isinstance(sel, list)]
+    runs = dict([(i, _listToRuns(selection[i])) for i in listsIdx])
+    # the list with more runs is passed to pytables as it is (point selection), the others are split in runs
+    keep = max(listsIdx, key=lambda i: len(runs[i]))
+    nCalls = int(np.prod([len(runs[i]) for i in listsIdx if i != keep]))
+
+    selected = int(np.prod(_selectionShape(selection, shape)))
+    superset = 1
+    for i, (sel, n) in enumerate(zip(selection, shape)):
+        if isinstance(sel, slice): superset *= len(range(*sel.indices(n)))
+        elif isinstance(sel, list): superset *= max(sel) - min(sel) + 1
+
+    if write: costSuperset = 2 * (superset + ioCallCost)
+    else: costSuperset = superset + ioCallCost
+    costRuns = selected + nCalls * ioCallCost
+    logging.debug('Selection access cost: superset %i, runs %i (%i calls)' % (costSuperset, costRuns, nCalls))
+
+    if costSuperset <= costRuns: return ('superset', None)
+    else: return ('runs', (keep, runs))
+
+
+def _supersetSelection(selection):
+    """
+    Split a selection in the selection of its bounding box and the selection to apply in memory afterwards.
+
+    Parameters
+    ----------
+    selection : list
+        A list of slices, lists or ints (one per axis).
+
+    Returns
+    -------
+    tuple
+        (bounding box selection, selection relative to the bounding box without the int axes).
+    """
+    boxSelection = []
+    memSelection = []
+    for sel in selection:
+        if isinstance(sel, list):
+            boxSelection.append(slice(min(sel), max(sel)+1))
+            memSelection.append([i-min(sel) for i in sel])
+        else:
+            boxSelection.append(sel)
+            if isinstance(sel, slice): memSelection.append(slice(None))
+    return boxSelection, memSelection
+
+
+def _hasInts(selection):
+    """
+    Check if a selection has ints (axes removed from the output).
+    """
+    return any(not isinstance(sel, (slice, list)) for sel in selection)
+
+
+def _readSelection(data, selection):
+    """
+    Read an orthogonal selection (each list selects independently along its axis, as for np.ix_)
+    from a numpy or pytables array.
+
+    Parameters
+    ----------
+    data : array
+        A numpy array or a pytables array.
+    selection : list
+        A list of slices, lists or ints (one per axis).
+
+    Returns
+    -------
+    array
+        The selected data.
+    """
+    selection = list(selection)
+    listsIdx = [i for i, sel in enumerate(selection) if isinstance(sel, list)]
+    # numpy would move the axis of a list combined with ints in front
+    if len(listsIdx) == 0 or (len(listsIdx) == 1 and not (isinstance(data, np.ndarray) and _hasInts(selection))):
+        return data[tuple(selection)]
+
+    if isinstance(data, np.ndarray):
+        # apply slices and ints (view), then one list at a time
+        firstSelection = [slice(None) if isinstance(sel, list) else sel for sel in selection]
+        data = data[tuple(firstSelection)]
+        for i in listsIdx:
+            data = np.take(data, selection[i], axis=_outAxis(selection, i))
+        return data
+
+    strategy, plan = _planSelection(selection, data.shape)
+    if strategy == 'superset':
+        boxSelection, memSelection = _supersetSelection(selection)
+        return _readSelection(data[tuple(boxSelection)], memSelection)
+
+    keep, runs = plan
+    others = [i for i in listsIdx if i != keep]
+    out = np.empty(_selectionShape(selection, data.shape), dtype=data.dtype)
+    subSelection = selection[:]
+    outSelection = [slice(None)] * out.ndim
+    for thisRuns in itertools.product(*[runs[i] for i in others]):
+        for i, (start, stop, o) in zip(others, thisRuns):
+            subSelection[i] = slice(start, stop)
+            outSelection[_outAxis(selection, i)] = slice(o, o+stop-start)
+        out[tuple(outSelection)] = data[tuple(subSelection)]
+    return out
+
+
+def _writeSelection(data, selection, vals):
+    """
+    Write an orthogonal selection (each list selects independently along its axis, as for np.ix_)
+    into a numpy or pytables array.
+
+    Parameters
+    ----------
+    data : array
+        A numpy array or a pytables array.
+    selection : list
+        A list of slices, lists or ints (one per axis).
+    vals : array or float
+        Values to write, reshaped to the selection shape. A single number is written in all the selected elements.
+    """
+    selection = list(selection)
+    listsIdx = [i for i, sel in enumerate(selection) if isinstance(sel, list)]
+    isScalar = isinstance(vals, (np.floating, float, int))
+    if not isScalar:
+        vals = np.reshape(vals, _selectionShape(selection, data.shape))
+
+    if len(listsIdx) == 0 or (len(listsIdx) == 1 and not (isinstance(data, np.ndarray) and _hasInts(selection))):
+        data[tuple(selection)] = vals
+        return
+
+    if isinstance(data, np.ndarray):
+        idx = [np.arange(n)[sel] if isinstance(sel, slice) else np.atleast_1d(sel) for sel, n in zip(selection, data.shape)]
+        if not isScalar:
+            vals = np.reshape(vals, [len(i) for i in idx])
+        data[np.ix_(*idx)] = vals
+        return
+
+    strategy, plan = _planSelection(selection, data.shape, write=True)
+    if strategy == 'superset':
+        boxSelection, memSelection = _supersetSelection(selection)
+        box = data[tuple(boxSelection)]
+        _writeSelection(box, memSelection, vals)
+        data[tuple(boxSelection)] = box
+        return
+
+    keep, runs = plan
+    others = [i for i in listsIdx if i != keep]
+    subSelection = selection[:]
+    valsSelection = [slice(None)] * len(_selectionShape(selection, data.shape))
+    for thisRuns in itertools.product(*[runs[i] for i in others]):
+        for i, (start, stop, o) in zip(others, thisRuns):
+            subSelection[i] = slice(start, stop)
+            valsSelection[_outAxis(selection, i)] = slice(o, o+stop-start)
+        if isScalar: data[tuple(subSelection)] = vals
+        else: data[tuple(subSelection)] = vals[tuple(valsSelection)]
+
+
+# number of set bits for each uint8 value
+_popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class FlagPlane( object ):
+    """
+    Weights stored as bit-packed flags: a uint8 pytables array with 1 bit per sample (1->FLAGGED),
+    packed along the last axis. The original length of the last axis is in the 'PACKED' attribute.
+    The object can be indexed as a pytables array, returning weights (0->FLAGGED, 1->NOT FLAGGED)
+    or, if flags=True, boolean flags.
+
+    Parameters
+    ----------
+    node : pytables Array
+        The packed weight array of a soltab.
+    flags : bool, optional
+        If True read/write boolean flags instead of weights, by default False.
+    """
+
+    def __init__(self, node, flags=False):
+        self.node = node
+        self.flags = flags
+        self._v_file = node._v_file
+        self._v_pathname = node._v_pathname
+        self.attrs = node.attrs
+        self.shape = tuple(node.shape[:-1]) + (int(node.attrs['PACKED']),)
+        self.ndim = len(self.shape)
+        if flags: self.dtype = np.dtype(bool)
+        else: self.dtype = np.dtype(np.float16)
+
+
+    def _split(self, selection):
+        # split a selection in the selection of the packed bytes and the one of the bits inside them
+        selection = tuple(selection) + (slice(None),) * (self.ndim - len(selection))
+        last = selection[-1]
+        if isinstance(last, slice): idx = np.arange(self.shape[-1])[last]
+        else: idx = np.array(last)
+        if idx.size == 0: byteSlice = slice(0, 0)
+        else: byteSlice = slice(int(np.min(idx))//8, int(np.max(idx))//8+1)
+        return selection[:-1] + (byteSlice,), idx - byteSlice.start*8
+
+
+    def read(self):
+        return self[(slice(None),) * self.ndim]
+
+
+    def __getitem__(self, selection):
+        if not isinstance(selection, tuple): selection = (selection,)
+        byteSelection, bitIdx = self._split(selection)
+        flags = np.unpackbits(self.node[byteSelection], axis=-1)[..., bitIdx].astype(bool)
+        if self.flags: return flags
+        return (~flags).astype(self.dtype)
+
+
+    def __setitem__(self, selection, vals):
+        if not isinstance(selection, tuple): selection = (selection,)
+        byteSelection, bitIdx = self._split(selection)
+        bits = np.unpackbits(self.node[byteSelection], axis=-1)
+        if self.flags: bits[..., bitIdx] = np.asarray(vals, dtype=bool)
+        else: bits[..., bitIdx] = (np.asarray(vals) == 0)
+        self.node[byteSelection] = np.packbits(bits, axis=-1)
+
+
+    def countFlagged(self):
+        """
+        Count the flagged samples without unpacking them.
+
+        Returns
+        -------
+        int
+            Number of flagged samples.
+        """
+        count = 0
+        if self.ndim == 1: return int(np.sum(_popcount[self.node[:]], dtype=np.int64))
+        for i in range(self.node.shape[0]):
+            count += int(np.sum(_popcount[self.node[i]], dtype=np.int64))
+        return count
+
+
+class SwmrFile( object ):
+    """
+    An HDF5 file opened with h5py in single-writer/multiple-reader (SWMR) mode, see h5parm(swmr=True).
+    pytables cannot open files in this mode, this object and the Swmr nodes provide the part of
+    the pytables File/Group/Array interface used by h5parm, Solset and Soltab.
+    Solsets/soltabs cannot be created, removed or renamed in SWMR mode.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 filename.
+    readonly : bool, optional
+        If True open as a reader, otherwise as the writer, by default True.
+        The writer needs a file in the latest HDF5 format (superblock version >= 3).
+    """
+
+    def __init__(self, filename, readonly=True):
+        try:
+            import h5py
+        except ImportError:
+            logging.critical('h5py is needed for SWMR mode.')
+            raise Exception('h5py is needed for SWMR mode.')
+
+        self.filename = filename
+        if readonly:
+            self.mode = 'r'
+            self.h5 = h5py.File(filename, 'r', libver='latest', swmr=True)
+        else:
+            self.mode = 'r+'
+            self.h5 = h5py.File(filename, 'r+', libver='latest')
+            self.h5.swmr_mode = True
+        self.isopen = True
+        self.root = SwmrGroup(self.h5['/'], self)
+
+
+    def get_node(self, where, name=None):
+        node = self.root
+        path = where if name is None else where.rstrip('/')+'/'+name
+        for childName in path.split('/'):
+            if childName != '': node = node._f_get_child(childName)
+        return node
+
+
+    def flush(self):
+        self.h5.flush()
+
+
+    def close(self):
+        if self.isopen: self.h5.close()
+        self.isopen = False
+
+
+    def _structureChange(self, *args, **kwargs):
+        logging.error('Solsets/soltabs cannot be created, removed or renamed in SWMR mode.')
+        raise Exception('Solsets/soltabs cannot be created, removed or renamed in SWMR mode.')
+
+    create_group = create_array = create_carray = create_earray = create_table = _structureChange
+
+
+class SwmrAttributeSet( object ):
+    """
+    Read-only attributes of a Swmr node, strings are returned as str as done by pytables.
+    """
+
+    def __init__(self, attrs):
+        self._attrs = attrs
+
+
+    @property
+    def _v_attrnames(self):
+        return sorted(self._attrs.keys())
+
+
+    @property
+    def _v_attrnamesuser(self):
+        return [name for name in self._v_attrnames if not tables.attributeset.issysattrname(name)]
+
+
+    def _f_list(self, attrset='user'):
+        if attrset == 'user': return self._v_attrnamesuser
+        return self._v_attrnames
+
+
+    def __contains__(self, name):
+        return name in self._attrs
+
+
+    def __getitem__(self, name):
+        import h5py
+        val = self._attrs[name]
+        if isinstance(val, bytes): return val.decode()
+        if isinstance(val, h5py.Empty): return ''
+        return val
+
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not name in self._attrs:
+            raise AttributeError("Attribute '"+name+"' does not exist.")
+        return self[name]
+
+
+class SwmrNode( object ):
+    """
+    Base class of the Swmr nodes, wrapping an h5py group or dataset.
+    """
+
+    def __init__(self, h5obj, fileh):
+        self.h5obj = h5obj
+        self._v_file = fileh
+        self._v_pathname = h5obj.name
+        self._v_name = h5obj.name.split('/')[-1] or '/'
+        self.attrs = self._v_attrs = SwmrAttributeSet(h5obj.attrs)
+
+
+    @property
+    def _v_title(self):
+        if 'TITLE' in self.attrs: return self.attrs['TITLE']
+        return ''
+
+
+    def _g_getparent(self):
+        return SwmrGroup(self.h5obj.parent, self._v_file)
+
+
+    def _f_remove(self, *args, **kwargs):
+        self._v_file._structureChange()
+
+    _f_rename = _f_copy = _f_setattr = _f_delattr = _f_remove
+
+
+class SwmrGroup( SwmrNode ):
+    """
+    An h5py group with the pytables Group interface, see SwmrFile.
+    Child datasets are wrapped once, so that each keeps the shape seen at its last refresh().
+    """
+
+    def __init__(self, h5obj, fileh):
+        SwmrNode.__init__(self, h5obj, fileh)
+        self._leaves = {}
+
+
+    def _f_get_child(self, name):
+        if not name in self.h5obj:
+            raise tables.NoSuchNodeError('Group '+self._v_pathname+' does not have a child named '+name+'.')
+        h5child = self.h5obj[name]
+        if not hasattr(h5child, 'shape'):
+            return SwmrGroup(h5child, self._v_file)
+        if not name in self._leaves:
+            self._leaves[name] = SwmrArray(h5child, self._v_file)
+        return self._leaves[name]
+
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError("Attribute '"+name+"' does not exist.")
+        return self._f_get_child(name)
+
+
+    def __contains__(self, name):
+        return name in self.h5obj
+
+
+    def __iter__(self):
+        for name in self.h5obj:
+            yield self._f_get_child(name)
+
+
+    @property
+    def _v_children(self):
+        return collections.OrderedDict((node._v_name, node) for node in self)
+
+
+    @property
+    def _v_groups(self):
+        return collections.OrderedDict((node._v_name, node) for node in self if isinstance(node, SwmrGroup))
+
+
+class SwmrArray( SwmrNode ):
+    """
+    An h5py dataset with the pytables Array/EArray/Table interface, see SwmrFile.
+    The shape is read when the dataset is opened and at each refresh(), data are accessed
+    only within it so that a reader sees a consistent table while the writer appends to it.
+    Written data are flushed immediately, to be seen by the readers.
+    """
+
+    def __init__(self, h5obj, fileh):
+        SwmrNode.__init__(self, h5obj, fileh)
+        self.shape = h5obj.shape
+        self.ndim = len(self.shape)
+        self.dtype = h5obj.dtype
+        self.chunkshape = h5obj.chunks
+        self.extdim = h5obj.maxshape.index(None) if None in h5obj.maxshape else -1
+
+
+    def refresh(self):
+        """
+        Read again the shape and the data, to see what the writer appended or modified.
+        """
+        self.h5obj.refresh()
+        self.shape = self.h5obj.shape
+
+
+    def _h5Selection(self, selection):
+        # selection within the current shape, h5py needs increasing lists without repetitions:
+        # they are made unique and the list axis (in the output) and the inverse indexes are returned
+        if not isinstance(selection, tuple): selection = (selection,)
+        if Ellipsis in selection:
+            i = selection.index(Ellipsis)
+            selection = selection[:i] + (slice(None),) * (self.ndim - len(selection) + 1) + selection[i+1:]
+        selection = selection + (slice(None),) * (self.ndim - len(selection))
+        h5Selection = []
+        listAxis = None
+        inverse = None
+        for sel, n in zip(selection, self.shape):
+            if isinstance(sel, slice):
+                h5Selection.append(slice(*sel.indices(n)))
+            elif isinstance(sel, (list, np.ndarray)):
+                idx = np.asarray(sel, dtype=np.int64)
+                idx = np.where(idx < 0, idx + n, idx)
+                idx, inverse = np.unique(idx, return_inverse=True)
+                listAxis = len([s for s in h5Selection if not isinstance(s, int)])
+                h5Selection.append(idx.tolist())
+            else:
+                h5Selection.append(int(sel) + n if sel < 0 else int(sel))
+        return tuple(h5Selection), listAxis, inverse
+
+
+    def __len__(self):
+        return self.shape[0]
+
+
+    @property
+    def nrows(self):
+        return self.shape[0]
+
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None: return self.read()
+        return self.read().astype(dtype)
+
+
+    def __iter__(self):
+        return iter(self.read())
+
+
+    def read(self):
+        return self[(slice(None),) * self.ndim]
+
+
+    def read_where(self, condition, condvars={}):
+        import numexpr
+        rows = self.read()
+        names = dict((name, rows[name]) for name in rows.dtype.names)
+        names.update(condvars)
+        return rows[numexpr.evaluate(condition, local_dict=names)]
+
+
+    def __getitem__(self, selection):
+        h5Selection, listAxis, inverse = self._h5Selection(selection)
+        data = self.h5obj[h5Selection]
+        if listAxis is not None and not np.array_equal(inverse, np.arange(len(inverse))):
+            data = np.take(data, inverse, axis=listAxis)
+        return data
+
+
+    def __setitem__(self, selection, vals):
+        h5Selection, listAxis, inverse = self._h5Selection(selection)
+        if listAxis is not None and not np.array_equal(inverse, np.arange(len(inverse))) and \
+                np.ndim(vals) == len([sel for sel in h5Selection if not isinstance(sel, int)]):
+            # for repeated elements the last value is written
+            last = np.zeros(len(h5Selection[listAxis]), dtype=np.int64)
+            last[inverse] = np.arange(len(inverse))
+            vals = np.take(vals, last, axis=listAxis)
+        self.h5obj[h5Selection] = vals
+        self.h5obj.flush()
+
+
+    def append(self, rows):
+        import h5py
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        n = self.h5obj.shape[self.extdim]
+        self.h5obj.resize(n + rows.shape[self.extdim], axis=self.extdim)
+        start = [0] * self.ndim
+        start[self.extdim] = n
+        fileSpace = self.h5obj.id.get_space()
+        fileSpace.select_hyperslab(tuple(start), rows.shape)
+        # written without conversion: h5py would drop the last character of full length pytables strings
+        self.h5obj.id.write(h5py.h5s.create_simple(rows.shape), fileSpace, rows, mtype=self.h5obj.id.get_type())
+        self.h5obj.flush()
+        self.shape = self.h5obj.shape
+
+
+    def flush(self):
+        self.h5obj.flush()
+
+
+# per-axis flag counters are kept only for axes up to this length (attributes are limited to 64 kB)
+statsMaxAxisLen = 4096
+
+
+def _selectionIndexes(selection, shape):
+    """
+    Get the positions selected on each axis, integers are kept as 1-element axes.
+
+    Parameters
+    ----------
+    selection : list
+        Selection, one slice/int/list for each axis.
+    shape : tuple
+        Shape of the full data.
+
+    Returns
+    -------
+    list
+        An array of positions for each axis.
+    """
+    selection = tuple(selection) + (slice(None),) * (len(shape) - len(selection))
+    return [np.atleast_1d(np.arange(n)[sel]) for sel, n in zip(selection, shape)]
+
+
+def _updateFlagStats(stats, axesNames, shape, selection, diff):
+    """
+    Add to the flag counters the change of flagged data in a selection.
+
+    Parameters
+    ----------
+    stats : dict
+        Statistics, updated in place.
+    axesNames : list
+        Names of the axes.
+    shape : tuple
+        Shape of the full data.
+    selection : list
+        Selection where the flags changed.
+    diff : array
+        Change of flags (+1 newly flagged, -1 unflagged, 0 unchanged) with the selection shape.
+    """
+    idx = _selectionIndexes(selection, shape)
+    diff = np.reshape(diff, [len(i) for i in idx]).astype(np.int64)
+    stats['flagged'] += int(diff.sum())
+    for j, axis in enumerate(axesNames):
+        if 'flagged_'+axis in stats:
+            others = tuple(k for k in range(len(shape)) if k != j)
+            np.add.at(stats['flagged_'+axis], idx[j], diff.sum(axis=others))
+
+
+def _updateValStats(stats, newVals):
+    """
+    Update the value statistics adding newVals, which do not replace other data (e.g. appended data).
+
+    Parameters
+    ----------
+    stats : dict
+        Statistics, updated in place.
+    newVals : array
+        Added values.
+    """
+    if newVals.size > 0:
+        stats['nan'] += int(np.count_nonzero(np.isnan(newVals)))
+        stats['sum'] += float(np.nansum(newVals, dtype=np.float64))
+        if stats['minmax'] and not np.all(np.isnan(newVals)):
+            stats['min'] = float(np.fmin(stats['min'], np.nanmin(newVals)))
+            stats['max'] = float(np.fmax(stats['max'], np.nanmax(newVals)))
+
+
+def _computeStats(axesNames, vals, weights, perAxis=None):
+    """
+    Compute the summary statistics of a soltab, data are read one element of the first axis at a time.
+
+    Parameters
+    ----------
+    axesNames : list
+        Names of the axes.
+    vals : array
+        Values, numpy array or any object indexable as one (pytables array, FlagPlane).
+    weights : array
+        Weights, as vals.
+    perAxis : list, optional
+        Axes for which the flagged data are also counted per element, by default axes not longer than statsMaxAxisLen.
+
+    Returns
+    -------
+    dict
+        'flagged' (flagged data), 'nan' (NaN values), 'sum' (sum of non-NaN values), 'min', 'max',
+        'minmax' (True if min/max are valid) and 'flagged_<axis>' (flagged data for each element of the axis).
+    """
+    shape = tuple(vals.shape)
+    if perAxis is None: perAxis = [axis for axis, n in zip(axesNames, shape) if n <= statsMaxAxisLen]
+    stats = {'flagged':0, 'nan':0, 'sum':0., 'min':np.nan, 'max':np.nan, 'minmax':True}
+    for axis in perAxis:
+        stats['flagged_'+axis] = np.zeros(shape[axesNames.index(axis)], dtype=np.int64)
+
+    for i in range(shape[0]):
+        selection = (i,) + (slice(None),) * (len(shape)-1)
+        _updateFlagStats(stats, axesNames, shape, selection, np.asarray(weights[i]) == 0)
+        _updateValStats(stats, np.asarray(vals[i]))
+    return stats
+
+
+def _copyData(node, parent, name, perm, axesNames, chunkShape, filters, maxMemory):
+    """
+    Copy a val/weight array into a new array with the axes reordered, in blocks of bounded size.
+    The new array is of the same kind of the source (extendable, chunked or contiguous),
+    a chunked array is created if a chunk shape is given or data are compressed.
+
+    Parameters
+    ----------
+    node : pytables Array
+        Source val/weight array (bit-packed weights are repacked along the new last axis).
+    parent : pytables Group
+        Group of the new array, also in another file.
+    name : str
+        Name of the new array.
+    perm : list
+        Axis k of the new array is the axis perm[k] of the source.
+    axesNames : list
+        Axes names in the new order.
+    chunkShape : list or None
+        Chunk shape of the new array (unpacked).
+    filters : pytables Filters
+        Compression of the new array.
+    maxMemory : int
+        Memory budget in bytes for the data copied at once.
+
+    Returns
+    -------
+    pytables Array
+        The new array.
+    """
+    fileh = parent._v_file
+    packed = 'PACKED' in node.attrs
+    src = FlagPlane(node, flags=True) if packed else node
+    shape = tuple(int(src.shape[j]) for j in perm)
+    storedShape = shape[:-1] + ((shape[-1]+7)//8,) if packed else shape
+
+    if chunkShape is not None:
+        chunkShape = tuple(chunkShape)
+        if packed: chunkShape = chunkShape[:-1] + ((chunkShape[-1]+7)//8,)
+    if isinstance(node, tables.EArray):
+        extShape = list(storedShape)
+        extShape[perm.index(node.extdim)] = 0
+        new = fileh.create_earray(parent, name, atom=node.atom, shape=tuple(extShape), \
+                chunkshape=chunkShape, filters=filters)
+        new.truncate(storedShape[perm.index(node.extdim)])
+    elif chunkShape is not None or filters.complevel > 0:
+        new = fileh.create_carray(parent, name, atom=node.atom, shape=storedShape, \
+                chunkshape=chunkShape, filters=filters)
+    else:
+        new = fileh.create_array(parent, name, atom=node.atom, shape=storedShape)
+    for attrName in node.attrs._v_attrnamesuser:
+        new.attrs[attrName] = node.attrs[attrName]
+    new.attrs['AXES'] = ','.join(axesNames)
+    if packed: new.attrs['PACKED'] = shape[-1]
+    dst = FlagPlane(new, flags=True) if packed else new
+
+    # blocks: one element of the first axes, a range of the split axis and all the following axes
+    itemsize = 1 if packed else node.atom.itemsize
+    split = len(shape) - 1
+    while split > 0 and int(np.prod(shape[split:])) * itemsize <= maxMemory: split -= 1
+    step = max(1, maxMemory // max(1, int(np.prod(shape[split+1:])) * itemsize))
+    if packed and split == len(shape) - 1: step = max(8, step // 8 * 8) # whole bytes
+    for idx in np.ndindex(shape[:split]):
+        for start in range(0, shape[split], step):
+            outSel = [slice(i, i+1) for i in idx] + [slice(start, min(start+step, shape[split]))] + \
+                    [slice(None)] * (len(shape) - split - 1)
+            srcSel = [None] * len(shape)
+            for k, j in enumerate(perm): srcSel[j] = outSel[k]
+            dst[tuple(outSel)] = np.transpose(src[tuple(srcSel)], perm)
+    return new
+
+
+def _updateNode(node, source, maxMemory):
+    """
+    Write in place into an array or table the content of a copy of it (e.g. modified in another file),
+    with its attributes. Arrays are written in blocks of bounded size along the first axis,
+    tables are modified row by row and the rows added to the copy are appended.
+
+    Parameters
+    ----------
+    node : pytables Array or Table
+        The node to update.
+    source : pytables Array or Table
+        The modified copy.
+    maxMemory : int
+        Memory budget in bytes for the data copied at once.
+
+    Returns
+    -------
+    bool
+        False if the node has a different kind, dtype or shape (or the table has more rows), nothing is written.
+    """
+    if type(node) != type(source) or node.dtype != source.dtype: return False
+    if isinstance(node, tables.Table):
+        if source.nrows < node.nrows: return False
+        if node.nrows > 0:
+            rows = source.read(0, node.nrows)
+            if not np.array_equal(node.read(), rows): node.modify_rows(0, rows=rows)
+        if source.nrows > node.nrows: node.append(source.read(node.nrows))
+    elif isinstance(node, tables.Array):
+        if node.shape != source.shape: return False
+        if node.ndim == 0: node[()] = source[()]
+        block = max(1, maxMemory // max(1, node.atom.itemsize * int(np.prod(node.shape[1:]))))
+        for i in range(0, node.shape[0] if node.ndim > 0 else 0, block):
+            node[i:i+block] = source[i:i+block]
+    else:
+        return False
+
+    _updateAttrs(node.attrs, source.attrs)
+    return True
+
+
+def _updateAttrs(attrs, source):
+    """
+    Make the user attributes of a node the same of a copy of it.
+
+    Parameters
+    ----------
+    attrs : pytables AttributeSet
+        The attributes to update.
+    source : pytables AttributeSet
+        The attributes of the copy.
+    """
+    sourceNames = source._f_list("user")
+    for name in attrs._f_list("user"):
+        if not name in sourceNames: attrs._f_delattr(name)
+    for name in sourceNames:
+        attrs[name] = source[name]
+
+
+def _updateSoltab(soltab, source, maxMemory=None):
+    """
+    Write in place into a soltab the content of a copy of it (e.g. a soltab modified in another h5parm),
+    instead of replacing it: HDF5 does not reuse the space of removed nodes, so the file would grow.
+    Cached data and statistics not yet stored of the soltab are discarded.
+
+    Parameters
+    ----------
+    soltab : soltab obj
+        The soltab to update.
+    source : soltab obj
+        The modified copy.
+    maxMemory : int, optional
+        Memory budget in bytes for the data copied at once, by default Soltab.iterMaxMemory or 256 MB.
+
+    Returns
+    -------
+    bool
+        False if the copy has a different structure (arrays, their dtypes or shapes), nothing is written:
+        the soltab must be replaced.
+    """
+    if maxMemory is None: maxMemory = Soltab.iterMaxMemory
+    if maxMemory is None: maxMemory = 2**28
+
+    children = soltab.obj._v_children
+    sourceChildren = source.obj._v_children
+    if sorted(children) != sorted(sourceChildren): return False
+    for name, child in children.items():
+        other = sourceChildren[name]
+        if type(child) != type(other) or child.dtype != other.dtype: return False
+        if isinstance(child, tables.Array) and child.shape != other.shape: return False
+        if isinstance(child, tables.Table) and other.nrows < child.nrows: return False
+
+    logging.debug('Writing back soltab '+soltab.name+' in place.')
+    for name in ['val', 'weight']: cacheManager.drop(children[name])
+    _flushStats(soltab.obj._v_file, [soltab.obj._v_pathname], discard=True)
+    _catalogs.pop(id(soltab.obj._v_file), None)
+    for name, child in children.items():
+        _updateNode(child, sourceChildren[name], maxMemory)
+    _updateAttrs(soltab.obj._v_attrs, source.obj._v_attrs)
+    soltab.axesIndex = {}
+    soltab.selectionVersion += 1
+    return True
+
+
+def _updateSolset(solset, source):
+    """
+    Write in place into a solset its tables (e.g. antenna/source) and attributes from a copy of it,
+    soltabs are not modified. Tables with a different structure are replaced.
+
+    Parameters
+    ----------
+    solset : solset obj
+        The solset to update.
+    source : solset obj
+        The modified copy.
+    """
+    soltabNames = set(solset.getSoltabNames()) | set(source.getSoltabNames())
+    children = solset.obj._v_children
+    sourceChildren = source.obj._v_children
+    for name in set(children) - set(sourceChildren) - soltabNames:
+        children[name]._f_remove(recursive=True)
+    for name, other in list(sourceChildren.items()):
+        if name in soltabNames: continue
+        if name in children:
+            if _updateNode(children[name], other, 2**28): continue
+            children[name]._f_remove(recursive=True)
+        other._f_copy(newparent=solset.obj, recursive=True)
+    _updateAttrs(solset.obj._v_attrs, source.obj._v_attrs)
+    _catalogs.pop(id(solset.obj._v_file), None)
+
+
+class Solset( object ):
+    """
+    Create a solset object
+
+    Parameters
+    ----------
+    solset : pytables group
+        The solution set pytables group object
+    """
+
+    def __init__(self, solset):
+
+        if not isinstance( solset, (tables.Group, SwmrGroup) ):
+            logging.error("Object must be initialized with a pyTables Group object.")
+            sys.exit(1)
+
+        self.obj = solset
+        self.name = solset._v_name
+
+    def close(self):
+        """
+        """
+        self.obj._g_flushGroup()
+
+
+    def delete(self):
+        """
+        Delete this solset.
+        """
+        logging.info("Solset \""+self.name+"\" deleted.")
+        for soltab in self.obj._v_groups.values():
+            for name in ['val', 'weight']:
+                if name in soltab: cacheManager.drop(soltab._f_get_child(name))
+        _flushStats(self.obj._v_file, [self.obj._v_pathname], discard=True)
+        _catalogs.pop(id(self.obj._v_file), None)
+        self.obj._f_remove(recursive=True)
+
+
+    def rename(self, newname, overwrite=False):
+        """
+        Rename this solset.
+
+        Parameters
+        ----------
+        newname : str
+            New solution set name.
+        overwrite : bool, optional
+            Overwrite existing solset with same name.
+        """
+        _flushStats(self.obj._v_file, [self.obj._v_pathname]) # indexed by path
+        _catalogs.pop(id(self.obj._v_file), None)
+        self.obj._f_rename(newname, overwrite)
+        logging.info('Solset "'+self.name+'" renamed to "'+newname+'".')
+        self.name = self.obj._v_name
+
+
+    def makeSoltab(self, soltype=None, soltabName=None,
+            axesNames = [], axesVals = [], chunkShape=None, vals=None,
+            weights=None, parmdbType='', weightDtype='f16', complevel=None, complib=None,
+            contiguousAxis=None, valDtype='f64', extendableAxis=None):
+        """
+        Create a Soltab into this solset.
+
+        Parameters
+        ----------
+        soltype : str
+            Solution-type (e.g. amplitude, phase)
+        soltabName : str, optional
+            The solution-table name, if not specified is generated from the solution-type
+        axesNames : list
+            List with the axes names
+        axesVals : list
+            List with the axes values (each is a separate list)
+        chunkShape : list, optional
+            List with the chunk shape, by default guessed from the axes lengths if the data are compressed.
+            If given (or if compression is active) val/weight are stored as chunked CArrays.
+        vals : numpy array
+            Array with shape given by the axesVals lenghts
+        weights : numpy array
+            Same shape of the vals array
+            0->FLAGGED, 1->MAX_WEIGHT
+        parmdbType : str
+            Original parmdb solution type
+        weightDtype : str
+            THe dtype of weights allowed values are ('f16' or 'f32' or 'f64' or the equivalent numpy dtype)
+            or 'bit' to store only flags (weights==0) as bit-packed uint8 (see FlagPlane)
+        complevel : int, optional
+            Compression level from 0 to 9, by default the one used to create the H5parm.
+        complib : str, optional
+            Compression library (zlib, lzo, bzip2, blosc, blosc:lz4, ...), by default the one used to create the H5parm.
+        contiguousAxis : str, optional
+            Axis usually read in full (e.g. 'time' or 'freq') used to guess the chunk shape, by default 'time'.
+        valDtype : str
+            The dtype of values allowed values are ('f32' or 'f64' or the equivalent numpy dtype), by default 'f64'.
+            Values are read and written back with this dtype.
+        extendableAxis : str, optional
+            Axis (e.g. 'time') along which data can be added later with Soltab.append(), by default None.
+            Axis values and val/weight are stored as EArrays, the initial data can have length 0 on that axis.
+
+        Returns
+        -------
+        soltab obj
+            Newly created soltab object
+        """
+
+        if soltype is None:
+            raise Exception("Solution-type not specified while adding a solution-table.")
+
+        soltabName = self._checkSoltabName(soltabName, soltype)
+
+        logging.info('Creating a new solution-table: '+soltabName+'.')
+
+        # check input
+        assert len(axesNames) == len(axesVals)
+        dim = []
+        for i, axisName in enumerate(axesNames):
+            dim.append(len(axesVals[i]))
+        assert dim == list(vals.shape)
+        assert dim == list(weights.shape)
+        if extendableAxis is not None:
+            assert extendableAxis in axesNames, "Extendable axis must be one of the axes"
+            extIdx = axesNames.index(extendableAxis)
+            if weightDtype == 'bit' and extendableAxis == axesNames[-1]:
+                raise Exception('Bit-packed weights cannot be extended along the last axis.')
+
+        # if input is OK, create table
+        _catalogs.pop(id(self.obj._v_file), None)
+        soltab = self.obj._v_file.create_group("/"+self.name, soltabName, title=soltype)
+        soltab._v_attrs['parmdb_type'] = parmdbType
+        for i, axisName in enumerate(axesNames):
+            #axis = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, axisName,\
+            #        obj=axesVals[i], chunkshape=[len(axesVals[i])])
+            if axisName == extendableAxis:
+                axisVals = np.asarray(axesVals[i])
+                if axisVals.dtype.kind == 'U': axisVals = axisVals.astype(bytes)
+                axis = self.obj._v_file.create_earray('/'+self.name+'/'+soltabName, axisName, \
+                        atom=tables.Atom.from_dtype(axisVals.dtype), shape=(0,))
+                axis.append(axisVals)
+            else:
+                axis = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, axisName, obj=axesVals[i])
+
+        # create the val/weight arrays
+        filters = self.obj._v_file.filters
+        if complevel is not None or complib is not None:
+            if complevel is None: complevel = filters.complevel
+            if complib is None: complib = filters.complib or 'zlib'
+            filters = tables.Filters(complevel=complevel, complib=complib)
+
+        assert valDtype in ['f32', 'f64'] or np.dtype(valDtype) in [np.float32, np.float64], "Allowed val dtypes are 'f32', 'f64'"
+        np_v, pt_v = _getDtype(valDtype)
+        vals = vals.astype(np_v, copy=False)
+        packed = isinstance(weightDtype, str) and weightDtype == 'bit'
+        if not packed:
+            np_d, pt_d = _getDtype(weightDtype)
+            weights = weights.astype(np_d, copy=False)
+        # summary statistics are computed here, while data are in memory, and then kept updated by setValues()
+        stats = _computeStats(axesNames, vals, weights)
+        if packed:
+            # 1 bit per sample: flagged (weight == 0) or not
+            weights = np.packbits(weights == 0, axis=-1)
+            np_d, pt_d = np.uint8, tables.UInt8Atom()
+
+        if chunkShape is None and filters.complevel == 0 and extendableAxis is None:
+            # array do not have compression but are much faster
+            val = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, 'val', obj=vals, atom=pt_v)
+            weight = self.obj._v_file.create_array('/'+self.name+'/'+soltabName, 'weight', obj=weights, atom=pt_d)
+        else:
+            if chunkShape is None:
+                guessShape = list(vals.shape)
+                if extendableAxis is not None:
+                    # final length unknown, assume at least a few hundreds elements
+                    guessShape[extIdx] = max(guessShape[extIdx], 128)
+                chunkShape = _chunkShape(guessShape, np.dtype(np_v).itemsize, axesNames, contiguousAxis)
+            assert len(chunkShape) == len(dim)
+            weightChunkShape = tuple(chunkShape)
+            if np_d is np.uint8: weightChunkShape = weightChunkShape[:-1] + ((weightChunkShape[-1]+7)//8,)
+            logging.debug('Chunk shape: '+str(tuple(chunkShape))+', compression: '+str(filters.complib)+' ('+str(filters.complevel)+').')
+            if extendableAxis is None:
+                val = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, 'val', obj=vals, \
+                        atom=pt_v, chunkshape=tuple(chunkShape), filters=filters)
+                weight = self.obj._v_file.create_carray('/'+self.name+'/'+soltabName, 'weight', obj=weights, \
+                        atom=pt_d, chunkshape=weightChunkShape, filters=filters)
+            else:
+                # the extendable dimension has length 0, data are then appended
+                valShape = list(vals.shape); valShape[extIdx] = 0
+                weightShape = list(weights.shape); weightShape[extIdx] = 0
+                val = self.obj._v_file.create_earray('/'+self.name+'/'+soltabName, 'val', atom=pt_v, \
+                        shape=tuple(valShape), chunkshape=tuple(chunkShape), filters=filters)
+                weight = self.obj._v_file.create_earray('/'+self.name+'/'+soltabName, 'weight', atom=pt_d, \
+                        shape=tuple(weightShape), chunkshape=weightChunkShape, filters=filters)
+                val.append(vals)
+                weight.append(weights)
+        val.attrs['AXES'] = ','.join([axisName for axisName in axesNames])
+        weight.attrs['AXES'] = ','.join([axisName for axisName in axesNames])
+        if np_d is np.uint8: weight.attrs['PACKED'] = dim[-1]
+
+        soltab = Soltab(soltab)
+        soltab._setStats(stats)
+        _flushStats(self.obj._v_file, [soltab.obj._v_pathname])
+        return soltab
+
+
+    def _checkSoltabName(self, soltabName, soltype):
+        """
+        Check that a name can be used for a new soltab, otherwise fall back on the first available soltype###.
+
+        Parameters
+        ----------
+        soltabName : str or None
+            Requested name.
+        soltype : str
+            Type of solution (amplitude, phase, RM, clock...)
+
+        Returns
+        -------
+        str
+            The soltab name to use.
+        """
+        if type(soltabName) is str and not re.match(r'^[A-Za-z0-9_-]+$', soltabName):
+            logging.warning('Solution-table '+soltabName+' contains unsuported characters. Use [A-Za-z0-9_-]. Switching to default.')
+            soltabName = None
+
+        if soltabName in self.getSoltabNames():
+            logging.warning('Solution-table '+soltabName+' already present. Switching to default.')
+            soltabName = None
+
+        if soltabName is None:
+            soltabName = self._fisrtAvailSoltabName(soltype)
+
+        return soltabName
+
+
+    def _fisrtAvailSoltabName(self, soltype):
+        """
+        Find the first available soltab name which
+        has the form of "soltypeName###"
+
+        Parameters
+        ----------
+        soltype : str
+            Type of solution (amplitude, phase, RM, clock...)
+
+        Returns
+        -------
+        str
+            First available soltab name
+        """
+        nums = []
+        for soltabName in self.getSoltabNames():
+            if re.match(r'^'+soltype+'[0-9][0-9][0-9]$', soltabName):
+                nums.append(int(soltabName[-3:]))
+
+        return soltype+"%03d" % min(list(set(range(1000)) - set(nums)))
+
+
+    def getSoltabs(self, useCache=False, sel={}):
+        """
+        Get all Soltabs in this Solset.
+
+        Parameters
+        ----------
+        useCache : bool, optional
+            soltabs obj will use cache, by default False
+        sel : dict, optional
+            selection dict, by default no selection
+
+        Returns
+        -------
+        list
+            List of solution tables objects for all available soltabs in this solset
+        """
+        soltabs = []
+        for soltab in self.obj._v_groups.values():
+            soltabs.append(Soltab(soltab, useCache, sel))
+        return soltabs
+
+
+    def getSoltabNames(self):
+        """
+        Get all Soltab names in this Solset.
+
+        Returns
+        -------
+        list
+            List of str for all available soltabs in this solset.
+        """
+        soltabNames = []
+        for soltabName in iter( self.obj._v_groups.keys() ):
+            soltabNames.append(soltabName)
+        return soltabNames
+
+
+    def getSoltab(self, soltab, useCache=False, sel={}):
+        """
+        Get a soltab with a given name.
+
+        Parameters
+        ----------
+        soltab : str
+            A solution table name.
+        useCache : bool, optional
+            Soltabs obj will use cache, by default False.
+        sel : dict, optional
+            Selection dict, by default no selection.
+
+        Returns
+        -------
+        soltab obj
+            A solution table obj.
+        """
+        if soltab is None:
+            raise Exception("Solution-table not specified while querying for solution-table.")
+
+        if not soltab in self.getSoltabNames():
+            raise Exception("Solution-table "+soltab+" not found in solset "+self.name+".")
+
+        return Soltab(self.obj._f_get_child(soltab), useCache, sel)
+
+
+    def copy(self, targetH5parm, solsetName=None, chunkShape=None, complevel=None, complib=None, soltabNames=None):
+        """
+        Copy this solset (soltabs, antenna/source tables and attributes) with an HDF5 object copy,
+        data are not loaded in memory. Soltabs can be re-chunked/re-compressed while copying.
+
+        Parameters
+        ----------
+        targetH5parm : h5parm obj
+            H5parm where to copy the solset, can be the one of this solset.
+        solsetName : str, optional
+            Name of the copy, by default the same name.
+        chunkShape : list, optional
+            Re-chunk val/weight of all soltabs with this chunk shape.
+        complevel : int, optional
+            Re-compress val/weight of all soltabs with this compression level from 0 to 9.
+        complib : str, optional
+            Re-compress val/weight of all soltabs with this compression library.
+        soltabNames : list, optional
+            Copy only these soltabs, by default all.
+
+        Returns
+        -------
+        solset obj
+            The new solset.
+        """
+        if solsetName is None: solsetName = self.name
+        if solsetName in targetH5parm.getSolsetNames():
+            logging.critical('Solution-set '+solsetName+' already present in '+targetH5parm.fileName+'.')
+            raise Exception('Solution-set '+solsetName+' already present in '+targetH5parm.fileName+'.')
+
+        # the copy is made from disk
+        for soltab in self.obj._v_groups.values():
+            for name in ['val', 'weight']:
+                if name in soltab: cacheManager.flush(soltab._f_get_child(name))
+        _flushStats(self.obj._v_file, [self.obj._v_pathname])
+        _catalogs.pop(id(targetH5parm.H), None)
+
+        logging.info('Copying solset '+self.name+' to '+targetH5parm.fileName+':'+solsetName+'.')
+        if chunkShape is None and complevel is None and complib is None and soltabNames is None:
+            solset = self.obj._f_copy(newparent=targetH5parm.H.root, newname=solsetName, recursive=True)
+        else:
+            solset = self.obj._f_copy(newparent=targetH5parm.H.root, newname=solsetName, recursive=False)
+            for child in self.obj._v_children.values():
+                if isinstance(child, tables.Group) and 'val' in child and 'weight' in child:
+                    if soltabNames is not None and not child._v_name in soltabNames: continue
+                    Soltab(child).copy(child._v_name, Solset(solset), chunkShape, complevel, complib)
+                else:
+                    child._f_copy(newparent=solset, recursive=True)
+
+        return Solset(solset)
+
+
+    def getAnt(self):
+        """
+        Get the antenna subtable with antenna names and positions.
 
         Returns
         -------
@@ -649,6 +2192,302 @@ class Solset( object ):
         return sources
 
 
+class CacheManager( object ):
+    """
+    Process-wide cache of the val/weight arrays of cached soltabs.
+    Arrays are loaded on demand and shared by all Soltab objects pointing to the same table.
+    The hyperslabs modified in each array are tracked so that only those are written back.
+    When the memory budget is exceeded the least recently used arrays are evicted,
+    writing them back to disk first if they were modified.
+
+    Parameters
+    ----------
+    maxMemory : int, optional
+        Memory budget in bytes, by default None (no limit).
+        The shared cacheManager has a budget of defaultCacheFraction of the available memory.
+    """
+
+    # fraction of the memory available at start (see _getAvailableMemory()) used as budget of the shared cacheManager
+    defaultCacheFraction = 0.5
+
+    # if True Soltab.flush() does not write back, the caller writes back with flushFile() (e.g. after more steps)
+    deferFlush = False
+
+    def __init__(self, maxMemory=None):
+        self.maxMemory = maxMemory
+        self.entries = collections.OrderedDict() # key -> {'node':pytables array, 'data':np array, 'dirty':list of boxes, 'box':whole array}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.tooLarge = set() # keys of the arrays not cached, see fits()
+
+
+    def _key(self, node):
+        return (id(node._v_file), node._v_pathname)
+
+
+    def get(self, node):
+        """
+        Get the cached copy of a pytables array, loading it if necessary.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+
+        Returns
+        -------
+        array
+            The cached numpy array.
+        """
+        key = self._key(node)
+        if key in self.entries:
+            self.hits += 1
+            # move to the most recently used position
+            entry = self.entries.pop(key)
+            self.entries[key] = entry
+            return entry['data']
+
+        self.misses += 1
+        logging.debug("Caching "+node._v_pathname+"...")
+        data = node.read()
+        self.entries[key] = {'node':node, 'data':data, 'dirty':[], 'box':tuple((0, n) for n in data.shape)}
+        self.size += self.entries[key]['data'].nbytes
+        self._evict()
+        return self.entries[key]['data']
+
+
+    def fits(self, nodes, maxMemory=None):
+        """
+        Check if pytables arrays used together (the val and weight arrays of a soltab) fit in the memory budget.
+        Larger arrays are not cached: they would evict each other and be read again at each access.
+
+        Parameters
+        ----------
+        nodes : list of pytables Array
+            The val and weight arrays of a soltab.
+        maxMemory : int, optional
+            Another budget to fit in, e.g. the one of the data read at once (Soltab.iterMaxMemory), by default None.
+
+        Returns
+        -------
+        bool
+            True if they can be cached.
+        """
+        budgets = [budget for budget in [self.maxMemory, maxMemory] if budget is not None]
+        if budgets == []: return True
+        size = sum(int(np.prod(node.shape)) * np.dtype(node.dtype).itemsize for node in nodes)
+        if size <= min(budgets): return True
+        key = self._key(nodes[0])
+        if not key in self.tooLarge:
+            self.tooLarge.add(key)
+            logging.warning('%s needs %i MB, more than the memory budget: data are read and written directly.' \
+                    % (os.path.dirname(nodes[0]._v_pathname), size/1024**2))
+        return False
+
+
+    def set(self, node, data):
+        """
+        Put a copy of data in the cache for a pytables array.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+        data : array
+            The values (same shape of node).
+        """
+        self.drop(node)
+        key = self._key(node)
+        data = np.array(data, dtype=node.dtype)
+        self.entries[key] = {'node':node, 'data':data, 'dirty':[], 'box':tuple((0, n) for n in data.shape)}
+        self.setDirty(node)
+        self.size += self.entries[key]['data'].nbytes
+        self._evict()
+
+
+    def _selectionToBox(self, selection, shape):
+        """
+        Convert a selection into the bounding box of the selected elements.
+
+        Parameters
+        ----------
+        selection : list
+            A selection (slices, lists or ints) as used by setValues().
+        shape : tuple
+            Shape of the array.
+
+        Returns
+        -------
+        tuple
+            A (start, stop) tuple for each axis.
+        """
+        box = []
+        for sel, n in zip(selection, shape):
+            if isinstance(sel, slice):
+                idx = range(*sel.indices(n))
+                if len(idx) == 0: return None
+                box.append((min(idx[0], idx[-1]), max(idx[0], idx[-1])+1))
+            elif isinstance(sel, list):
+                if len(sel) == 0: return None
+                box.append((int(min(sel)), int(max(sel))+1))
+            elif isinstance(sel, np.ndarray):
+                if len(sel) == 0: return None
+                box.append((int(np.min(sel)), int(np.max(sel))+1))
+            else:
+                box.append((int(sel), int(sel)+1))
+        return tuple(box)
+
+
+    def setDirty(self, node, selection=None):
+        """
+        Mark a region of the cached copy of a pytables array as modified.
+        Consecutive regions (e.g. from a getValuesIter() loop) are merged together.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+        selection : list, optional
+            The modified selection, by default the whole array.
+        """
+        key = self._key(node)
+        if not key in self.entries: return
+        dirty = self.entries[key]['dirty']
+        shape = self.entries[key]['data'].shape
+        # quick checks for the most common cases: the whole array or the last region already modified
+        if len(dirty) > 0 and dirty[-1] == self.entries[key]['box']: return
+
+        if selection is None: box = self.entries[key]['box']
+        else: box = self._selectionToBox(selection, shape)
+        if box is None: return
+        if len(dirty) > 0 and all(b[0] >= l[0] and b[1] <= l[1] for b, l in zip(box, dirty[-1])): return
+
+        # merge with the last modified boxes as long as they are contained or adjacent along one axis
+        while len(dirty) > 0:
+            last = dirty[-1]
+            if all(b[0] >= l[0] and b[1] <= l[1] for b, l in zip(box, last)):
+                box = last
+            elif all(b[0] <= l[0] and b[1] >= l[1] for b, l in zip(box, last)):
+                pass
+            else:
+                diff = [i for i, (b, l) in enumerate(zip(box, last)) if b != l]
+                if len(diff) != 1 or box[diff[0]][0] > last[diff[0]][1] or last[diff[0]][0] > box[diff[0]][1]: break
+                i = diff[0]
+                box = box[:i] + ((min(box[i][0], last[i][0]), max(box[i][1], last[i][1])),) + box[i+1:]
+            dirty.pop()
+        dirty.append(box)
+
+        # too many scattered regions: write back their bounding box
+        if len(dirty) > 1000:
+            self.entries[key]['dirty'] = [tuple((min(b[i][0] for b in dirty), max(b[i][1] for b in dirty)) for i in range(len(shape)))]
+
+
+    def _writeBack(self, entry):
+        if len(entry['dirty']) == 0: return
+        logging.debug("Writing back %i region(s) of %s..." % (len(entry['dirty']), entry['node']._v_pathname))
+        for box in entry['dirty']:
+            box = tuple(slice(start, stop) for start, stop in box)
+            entry['node'][box] = entry['data'][box]
+        entry['dirty'] = []
+
+
+    def _evict(self):
+        # never evict the most recently used entry, it is the one just requested
+        while self.maxMemory is not None and self.size > self.maxMemory and len(self.entries) > 1:
+            key, entry = self.entries.popitem(last=False)
+            logging.debug("Evicting "+entry['node']._v_pathname+" from cache.")
+            self._writeBack(entry)
+            self.size -= entry['data'].nbytes
+
+
+    def flush(self, node):
+        """
+        Write back the cached copy of a pytables array if modified.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+        """
+        key = self._key(node)
+        if key in self.entries:
+            self._writeBack(self.entries[key])
+
+
+    def peek(self, node):
+        """
+        Get the cached copy of a pytables array, without loading it.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+
+        Returns
+        -------
+        array or None
+            The cached numpy array, None if not cached.
+        """
+        entry = self.entries.get(self._key(node))
+        if entry is None: return None
+        return entry['data']
+
+
+    def flushFile(self, fileh, keep=[]):
+        """
+        Write back the modified cached arrays of a file, they stay in the cache.
+
+        Parameters
+        ----------
+        fileh : pytables File
+            The file handler.
+        keep : list, optional
+            Pathnames of soltabs (e.g. "/sol000/phase000") whose arrays are not written back.
+        """
+        for key, entry in self.entries.items():
+            if key[0] == id(fileh) and not os.path.dirname(key[1]) in keep:
+                self._writeBack(entry)
+        _flushStats(fileh, [key[1] for key in _stats if key[0] == id(fileh) and not key[1] in keep])
+
+
+    def drop(self, node):
+        """
+        Remove a pytables array from the cache without writing it back.
+
+        Parameters
+        ----------
+        node : pytables Array
+            The val or weight array of a soltab.
+        """
+        key = self._key(node)
+        if key in self.entries:
+            self.size -= self.entries.pop(key)['data'].nbytes
+
+
+    def clear(self, fileh, writeBack=True):
+        """
+        Remove all arrays of a file from the cache.
+
+        Parameters
+        ----------
+        fileh : pytables File
+            The file handler.
+        writeBack : bool, optional
+            Write back modified arrays before removing them, by default True.
+        """
+        for key in [key for key in self.entries if key[0] == id(fileh)]:
+            if writeBack: self._writeBack(self.entries[key])
+            self.size -= self.entries.pop(key)['data'].nbytes
+
+
+# cache shared by all the cached Soltab objects, bounded by default: None must be set explicitly for no limit
+cacheManager = CacheManager()
+_availableMemory = _getAvailableMemory()
+if _availableMemory is not None:
+    cacheManager.maxMemory = int(_availableMemory * CacheManager.defaultCacheFraction)
+
+
 class Soltab( object ):
     """
     Parameters
@@ -656,7 +2495,7 @@ class Soltab( object ):
     soltab : pytables Table obj
         Pytable Table object.
     useCache : bool, optional
-        Cache all data in memory, by default False.
+        Cache data in memory through the shared cacheManager, by default False.
     **args : optional
         Used to create a selection.
         Selections examples:
@@ -669,9 +2508,16 @@ class Soltab( object ):
         axisName = {min: xxx, max: yyy} # to selct values greater or equal than xxx and lower or equal than yyy
     """
 
+    # memory budget (bytes) used by getValuesIter() to read data in blocks, also larger soltabs are not cached (see _getData()),
+    # by default a quarter of the memory available at start, None fetches the whole selection at once
+    iterMaxMemory = None if _availableMemory is None else _availableMemory // 4
+
+    # number of getValues()/setValues() calls on all soltabs, used to profile the steps
+    calls = collections.Counter()
+
     def __init__(self, soltab, useCache = False, args = {}):
 
-        if not isinstance( soltab, tables.Group ):
+        if not isinstance( soltab, (tables.Group, SwmrGroup) ):
             logging.error("Object must be initialized with a pyTables Table object.")
             sys.exit(1)
 
@@ -690,13 +2536,25 @@ class Soltab( object ):
         for axis in self.getAxesNames():
             self.axes[axis] = soltab._f_get_child(axis)
 
+        # per-axis indexes used to resolve selections, built on first use
+        self.axesIndex = {}
+
+        # memoised axes values, valid while selectionVersion is unchanged (see getAxisValues())
+        self.axesValues = {}
+        self.selectionVersion = 0
+
+        # parset step and operation using this soltab, recorded in the history
+        self.step = None
+        self.operation = None
+
+        # a SWMR writer may be in the middle of an append, see refresh()
+        if isinstance(soltab._v_file, SwmrFile): self.refresh()
+
         # initialize selection
         self.setSelection(**args)
 
+        # data are loaded in the cache on first access
         self.useCache = useCache
-        if self.useCache:
-            logging.debug("Caching...")
-            self.setCache(self.obj.val, self.obj.weight)
 
 
     def delete(self):
@@ -704,6 +2562,10 @@ class Soltab( object ):
         Delete this soltab.
         """
         logging.info("Soltab \""+self.name+"\" deleted.")
+        cacheManager.drop(self._getNode())
+        cacheManager.drop(self._getNode(weight=True))
+        _flushStats(self.obj._v_file, [self.obj._v_pathname], discard=True)
+        _catalogs.pop(id(self.obj._v_file), None)
         self.obj._f_remove(recursive=True)
 
 
@@ -718,22 +2580,74 @@ class Soltab( object ):
         overwrite : bool, optional
             Overwrite existing soltab with same name.
         """
+        # cache is indexed by path, write it back before the path changes
+        for node in [self._getNode(), self._getNode(weight=True)]:
+            cacheManager.flush(node)
+            cacheManager.drop(node)
+        _flushStats(self.obj._v_file, [self.obj._v_pathname])
+        _catalogs.pop(id(self.obj._v_file), None)
         self.obj._f_rename(newname, overwrite)
         logging.info('Soltab "'+self.name+'" renamed to "'+newname+'".')
         self.name = self.obj._v_name
 
 
-    def setCache(self, val, weight):
+    def setCache(self, val, weight):
+        """
+        Set cache values.
+
+        Parameters
+        ----------
+        val : array
+        weight : array
+        """
+        cacheManager.set(self._getNode(), val)
+        cacheManager.set(self._getNode(weight=True), weight)
+
+
+    def _getNode(self, weight=False):
+        """
+        Get the pytables array (or FlagPlane for bit-packed weights) storing values or weights.
+
+        Parameters
+        ----------
+        weight : bool, optional
+            If true get the weights instead that the vals, by defaul False.
+
+        Returns
+        -------
+        pytables Array or FlagPlane
+        """
+        if not weight: return self.obj.val
+        if 'PACKED' in self.obj.weight.attrs: return FlagPlane(self.obj.weight)
+        return self.obj.weight
+
+
+    def _getData(self, weight=False):
         """
-        Set cache values.
+        Get the array to read/write, either the cached copy or the pytables array.
+        Soltabs too large for the cache budget or for iterMaxMemory (see CacheManager.fits()) are not cached,
+        so that getValuesIter() reads them in blocks.
 
         Parameters
         ----------
-        val : array
-        weight : array
+        weight : bool, optional
+            If true get the weights instead that the vals, by defaul False.
+
+        Returns
+        -------
+        array
+            A numpy array (if cached) or a pytables array.
         """
-        self.cacheVal = np.copy(val)
-        self.cacheWeight = np.copy(weight)
+        node = self._getNode(weight)
+        if self.useCache and (cacheManager.peek(node) is not None or \
+                cacheManager.fits([self._getNode(), self._getNode(weight=True)], self.iterMaxMemory)):
+            return cacheManager.get(node)
+        if isinstance(node, FlagPlane):
+            return node
+        mmap = _getMmap(node)
+        if mmap is not None:
+            return mmap
+        return node
 
 
     def getSolset(self):
@@ -767,6 +2681,32 @@ class Soltab( object ):
         self.setSelection()
 
 
+    def _getAxisIndex(self, axis):
+        """
+        Get the index of an axis, used to quickly resolve selections.
+        It is built once and kept until the axis values are changed.
+
+        Parameters
+        ----------
+        axis : str
+            The name of the axis.
+
+        Returns
+        -------
+        dict
+            {'values': all axis values, 'pos': dict value->first position, 'monotonic': True if sorted,
+            'regexp': dict of resolved regular expressions}
+        """
+        if not axis in self.axesIndex:
+            values = self.getAxisValues(axis, ignoreSelection=True)
+            pos = {}
+            for i, v in enumerate(values.tolist()):
+                pos.setdefault(v, i)
+            monotonic = values.dtype.kind in 'iuf' and bool(np.all(values[1:] >= values[:-1]))
+            self.axesIndex[axis] = {'values':values, 'pos':pos, 'monotonic':monotonic, 'regexp':{}}
+        return self.axesIndex[axis]
+
+
     def setSelection(self, update=False, **args):
         """
         Set a selection criteria. For each axes there can be a:
@@ -783,6 +2723,8 @@ class Soltab( object ):
             Only update axes passed as arguments, the rest is maintained. Default: False.
             
         """
+        self.selectionVersion += 1
+
         # create an initial selection which selects all values
         if not update:
             self.selection = [slice(None)] * len(self.getAxesNames())
@@ -804,17 +2746,22 @@ class Soltab( object ):
 
             # string -> regular expression
             elif type(selVal) is str:
-                if not self.getAxisType(axis).char is 'S':
+                if not self.getAxisType(axis).char == 'S':
                     logging.warning("Cannot select on axis \""+axis+"\" with a regular expression. Use all available values.")
                     continue
-                self.selection[idx] = [i for i, item in enumerate(self.getAxisValues(axis)) if re.search(selVal, item)]
+                axisIndex = self._getAxisIndex(axis)
+                if not selVal in axisIndex['regexp']:
+                    regexp = re.compile(selVal)
+                    axisIndex['regexp'][selVal] = [i for i, item in enumerate(axisIndex['values']) if regexp.search(item)]
+                self.selection[idx] = axisIndex['regexp'][selVal][:]
 
                 # transform list of 1 element in a relative slice(), faster as it gets reference
                 if len(self.selection[idx]) == 1: self.selection[idx] = slice(self.selection[idx][0],self.selection[idx][0]+1)
 
             # dict -> min max
             elif type(selVal) is dict:
-                axisVals = self.getAxisValues(axis)
+                axisIndex = self._getAxisIndex(axis)
+                axisVals = axisIndex['values']
                 # some checks
                 if 'min' in selVal and selVal['min'] > np.max(axisVals):
                     logging.error("Selection with min > than maximum value. Use all available values.")
@@ -823,21 +2770,19 @@ class Soltab( object ):
                     logging.error("Selection with max < than minimum value. Use all available values.")
                     continue
 
-                if 'min' in selVal and 'max' in selVal:
-                    self.selection[idx] = slice(np.where(axisVals >= selVal['min'])[0][0], np.where(axisVals <= selVal['max'])[0][-1]+1)
-                    #thisSelection[idx] = list(np.where((axisVals>=selVal['min']) & (axisVals<=selVal['max']))[0])
-                elif 'min' in selVal:
-                    self.selection[idx] = slice(np.where(axisVals >= selVal['min'])[0][0], None)
-                    #thisSelection[idx] = list(np.where(axisVals>=selVal['min'])[0])
-                elif 'max' in selVal:
-                    self.selection[idx] = slice(0, np.where(axisVals <= selVal['max'])[0][-1]+1)
-                    #thisSelection[idx] = list(np.where(axisVals<=selVal['max'])[0])
-                else:
+                if not 'min' in selVal and not 'max' in selVal:
                     logging.error("Selection with a dict must have 'min' and/or 'max' entry. Use all available values.")
                     continue
+                if axisIndex['monotonic']:
+                    # sorted axis (e.g. time/freq): binary search
+                    start = int(np.searchsorted(axisVals, selVal['min'], side='left')) if 'min' in selVal else 0
+                    stop = int(np.searchsorted(axisVals, selVal['max'], side='right')) if 'max' in selVal else None
+                else:
+                    start = int(np.where(axisVals >= selVal['min'])[0][0]) if 'min' in selVal else 0
+                    stop = int(np.where(axisVals <= selVal['max'])[0][-1])+1 if 'max' in selVal else None
+                self.selection[idx] = slice(start, stop)
                 if 'step' in selVal:
                     self.selection[idx] = slice(self.selection[idx].start, self.selection[idx].stop, selVal['step'])
-                    #thisSelection[idx] = thisSelection[idx][::selVal['step']]
 
             # single val/list -> exact matching
             else:
@@ -845,15 +2790,17 @@ class Soltab( object ):
                 if not type(selVal) is list: selVal = [selVal]
                 # convert to correct data type (from parset everything is a str)
                 selVal = np.array(selVal, dtype=self.getAxisType(axis))
+                if selVal.dtype.char == 'S': selVal = selVal.astype(str)
+                axisIndex = self._getAxisIndex(axis)
 
                 if len(selVal) == 1:
                     # speedup in the common case of a single value
-                    if not selVal[0] in self.getAxisValues(axis).tolist():
+                    if not selVal[0] in axisIndex['pos']:
                         logging.error('Cannot find value %s in axis %s. Skip selection.' % (selVal[0], axis))
                         return
-                    self.selection[idx] = [self.getAxisValues(axis).tolist().index(selVal)]
+                    self.selection[idx] = [axisIndex['pos'][selVal[0]]]
                 else:
-                    self.selection[idx] = [i for i, item in enumerate(self.getAxisValues(axis)) if item in selVal]
+                    self.selection[idx] = np.flatnonzero(np.isin(axisIndex['values'], selVal)).tolist()
 
                 # transform list of 1 element in a relative slice(), faster as it gets a reference
                 if len(self.selection[idx]) == 1: self.selection[idx] = slice(self.selection[idx][0], self.selection[idx][0]+1)
@@ -880,6 +2827,25 @@ class Soltab( object ):
         return self.obj._v_title
 
 
+    def getDtype(self, weight=False):
+        """
+        Get the dtype used to store the values (or weights) of this Soltab.
+
+        Parameters
+        ----------
+        weight : bool, optional
+            If true get the dtype of the weights instead that of the vals, by defaul False.
+
+        Returns
+        -------
+        str
+            One of 'f16', 'f32', 'f64' or 'bit' for bit-packed flags (as for makeSoltab()).
+        """
+        node = self._getNode(weight)
+        if isinstance(node, FlagPlane): return 'bit'
+        return 'f%i' % (node.dtype.itemsize*8)
+
+
     def getAxesNames(self):
         """
         Get axes names.
@@ -910,6 +2876,7 @@ class Soltab( object ):
         int
             The axis lenght.
         """
+        if ignoreSelection: return int(self.axes[axis].shape[0])
         return len(self.getAxisValues(axis, ignoreSelection = ignoreSelection))
 
 
@@ -947,24 +2914,34 @@ class Soltab( object ):
 
         Returns
         -------
-        list
-            A copy of all values present along a specific axis.
+        array
+            A read-only view of all values present along a specific axis.
+            Values are read once and memoised until the selection or the axis values change.
         """
         if axis not in self.getAxesNames():
             logging.error('Axis \"'+axis+'\" not found.')
             return None
 
+        axisIdx = self.getAxesNames().index(axis)
+        axisSel = None if ignoreSelection else self.selection[axisIdx]
+        memo = self.axesValues.get((axis, ignoreSelection))
+        # the selection entry is compared too, as it can be replaced without setSelection()
+        if memo is not None and memo[0] == self.selectionVersion and _sameAxisSelection(memo[1], axisSel):
+            return memo[2].view()
+
         if ignoreSelection:
             axisvalues = np.copy(self.axes[axis])
         else:
-            axisIdx = self.getAxesNames().index(axis)
-            axisvalues = np.copy(self.axes[axis][ self.selection[axisIdx] ])
+            axisvalues = np.copy(self.axes[axis][ axisSel ])
 
         if axisvalues.dtype.str[0:2] == '|S':
             # Convert to native string format for python 3
-            return axisvalues.astype(str)
-        else:
-            return axisvalues
+            axisvalues = axisvalues.astype(str)
+
+        axisvalues.flags.writeable = False
+        if isinstance(axisSel, list): axisSel = axisSel[:]
+        self.axesValues[(axis, ignoreSelection)] = (self.selectionVersion, axisSel, axisvalues)
+        return axisvalues.view()
 
 
     def setAxisValues(self, axis, vals):
@@ -985,6 +2962,8 @@ class Soltab( object ):
 
         axisIdx = self.getAxesNames().index(axis)
         self.axes[axis][ self.selection[axisIdx] ] = vals
+        self.axesIndex.pop(axis, None)
+        self.selectionVersion += 1
 
 
     def setValues(self, vals, selection = None, weight = False):
@@ -1003,51 +2982,265 @@ class Soltab( object ):
 
         weight : bool, optional
             If true store in the weights instead that in the vals, by default False
+
+        Notes
+        -----
+        If the soltab has stored statistics (see getStats()) they are only marked as outdated, so that writes
+        do not read the replaced data: they are computed again from the data on the next getStats() or when
+        they are stored in the file, i.e. when the soltab is flushed or the h5parm closed.
         """
         if selection is None: selection = self.selection
+        Soltab.calls['setValues'] += 1
+
+        dataVals = self._getData(weight)
+        node = self._getNode(weight)
+        if self.useCache: cacheManager.setDirty(node, selection)
+        else: cacheManager.drop(node) # a cached copy would be outdated
 
-        if self.useCache:
-            if weight: dataVals = self.cacheWeight
-            else: dataVals = self.cacheVal
+        # multiple lists are applied orthogonally (as np.ix_), see _writeSelection()
+        # a float allows quick reset of large arrays to a single value, arrays are reshaped
+        # to the selection shape e.g. [512] (vals shape) into [512,1,1] (selection output)
+        _writeSelection(dataVals, selection, vals)
+        self._setStats(None)
+
+    def append(self, vals, weights, axisVals):
+        """
+        Append data along the extendable axis of the soltab (see Solset.makeSoltab()).
+        Data are written and flushed to disk immediately.
+
+        Parameters
+        ----------
+        vals : array
+            Values, with the soltab shape apart from the extendable axis.
+        weights : array
+            Weights, same shape of vals.
+        axisVals : array
+            Values of the extendable axis for the appended data.
+        """
+        valNode = self.obj.val
+        if valNode.extdim < 0:
+            logging.error('Soltab '+self.name+' is not extendable.')
+            raise Exception('Soltab '+self.name+' is not extendable.')
+
+        extIdx = valNode.extdim
+        axis = self.getAxesNames()[extIdx]
+        axisVals = np.atleast_1d(axisVals)
+        shape = [int(n) for n in valNode.shape]
+        shape[extIdx] = len(axisVals)
+        vals = np.asarray(vals)
+        weights = np.asarray(weights)
+        if list(vals.shape) != shape or list(weights.shape) != shape:
+            logging.error('Appended data must have shape '+str(shape)+'.')
+            raise Exception('Appended data must have shape '+str(shape)+'.')
+
+        # cached copies would have the old shape
+        for node in [self._getNode(), self._getNode(weight=True)]:
+            cacheManager.flush(node)
+            cacheManager.drop(node)
+        _catalogs.pop(id(self.obj._v_file), None)
+
+        oldLen = valNode.shape[extIdx]
+        vals = vals.astype(valNode.dtype, copy=False)
+        if 'PACKED' in self.obj.weight.attrs:
+            self.obj.weight.append(np.packbits(weights == 0, axis=-1))
         else:
-            if weight: dataVals = self.obj.weight
-            else: dataVals = self.obj.val
+            weights = weights.astype(self.obj.weight.dtype, copy=False)
+            self.obj.weight.append(weights)
+        valNode.append(vals)
+        self.axes[axis].append(axisVals.astype(self.axes[axis].dtype))
+        self.axesIndex.pop(axis, None)
+        self.selectionVersion += 1
+
+        stats = self._getStats()
+        if stats is not None:
+            newLen = oldLen + len(axisVals)
+            if 'flagged_'+axis in stats:
+                if newLen <= statsMaxAxisLen:
+                    stats['flagged_'+axis] = np.append(stats['flagged_'+axis], np.zeros(len(axisVals), dtype=np.int64))
+                else:
+                    del stats['flagged_'+axis]
+                    if 'stats_flagged_'+axis in self.obj._v_attrs: self.obj._f_delattr('stats_flagged_'+axis)
+            selection = [slice(None)] * len(shape)
+            selection[extIdx] = slice(oldLen, newLen)
+            _updateFlagStats(stats, self.getAxesNames(), valNode.shape, selection, weights == 0)
+            _updateValStats(stats, vals)
+            self._setStats(stats)
+
+        self.obj._v_file.flush()
+
+
+    def relayout(self, newAxesOrder, chunkShape=None, maxMemory=None):
+        """
+        Reorder the axes of the val/weight arrays on disk, e.g. to make the most read axis the fastest varying.
+        Data are transposed in blocks into new arrays, which then replace the old ones.
+        Dtypes, compression, attributes, statistics and history are kept.
+        Other Soltab objects open on the same table are not updated.
+
+        Parameters
+        ----------
+        newAxesOrder : list
+            All the axes names in the new order (the last is the fastest varying).
+        chunkShape : list, optional
+            Chunk shape of the new arrays, by default guessed if the table is chunked.
+        maxMemory : int, optional
+            Memory budget in bytes for the data transposed at once, by default Soltab.iterMaxMemory or 256 MB.
+        """
+        axesNames = self.getAxesNames()
+        if sorted(newAxesOrder) != sorted(axesNames):
+            logging.error('New axes order must contain all the axes: '+', '.join(axesNames)+'.')
+            raise Exception('New axes order must contain all the axes: '+', '.join(axesNames)+'.')
+        newAxesOrder = list(newAxesOrder)
+        if newAxesOrder == axesNames and chunkShape is None:
+            logging.info('Soltab '+self.name+' has already axes '+', '.join(axesNames)+'.')
+            return
+        if maxMemory is None: maxMemory = self.iterMaxMemory
+        if maxMemory is None: maxMemory = 2**28
+
+        # output axis k is the source axis perm[k]
+        perm = [axesNames.index(axis) for axis in newAxesOrder]
+        valNode = self.obj.val
+        if 'PACKED' in self.obj.weight.attrs and isinstance(valNode, tables.EArray) and perm.index(valNode.extdim) == len(perm)-1:
+            raise Exception('Bit-packed weights cannot be extended along the last axis.')
+        if chunkShape is None and valNode.chunkshape is not None:
+            chunkShape = _chunkShape([valNode.shape[j] for j in perm], valNode.atom.itemsize, newAxesOrder)
+
+        for node in [self._getNode(), self._getNode(weight=True)]:
+            cacheManager.flush(node)
+            cacheManager.drop(node)
+        fileh = self.obj._v_file
+        if id(fileh) in _mmaps: _mmaps[id(fileh)].clear()
+        _catalogs.pop(id(fileh), None)
 
-        # NOTE: pytables has a nasty limitation that only one list can be applied when selecting.
-        # Conversely, one can apply how many slices he wants.
-        # Single values/contigous values are converted in slices in h5parm.
-        # This try/except implements a workaround for this limitation. Once the pytables will be updated, the except can be removed.
         try:
-            # the float check allows quick reset of large arrays to a single value
-            if isinstance(vals, (np.floating, float)): dataVals[tuple(selection)] = vals
-            # the reshape is needed when saving e.g. [512] (vals shape) into [512,1,1] (selection output)
-            else: dataVals[tuple(selection)] = np.reshape(vals, dataVals[tuple(selection)].shape)
+            for name in ['val', 'weight']:
+                node = self.obj._f_get_child(name)
+                _copyData(node, self.obj, name+'_relayout', perm, newAxesOrder, chunkShape, node.filters, maxMemory)
+
+            # swap the arrays: the old ones are removed only once both new ones are in place
+            for name in ['val', 'weight']:
+                self.obj._f_get_child(name)._f_rename(name+'_old')
+                self.obj._f_get_child(name+'_relayout')._f_rename(name)
         except:
-            logging.debug('Optimizing selection writing '+str(selection))
-            selectionListsIdx = [i for i, s in enumerate(selection) if type(s) is list]
-            subSelection = selection[:]
-            # create a subSelection also for the "vals" array
-            subSelectionForVals = [slice(None) for i in range(len(subSelection))]
-            # cycle across lists and save data index by index
-            for selectionListValsIter in itertools.product(*[selection[selectionListIdx] for selectionListIdx in selectionListsIdx[1:]]):
-                for i, selectionListIdx in enumerate(selectionListsIdx[1:]):
-                    # this is the sub selection which has a slice for every slice and a single value for every list
-                    subSelection[selectionListIdx] = selectionListValsIter[i]
-                    subSelectionForVals[selectionListIdx] = i
-                if type(vals) == float: dataVals[tuple(subSelection)] = vals
-                else: dataVals[tuple(subSelection)] = vals[tuple(subSelectionForVals)]
+            # put back the old arrays, the soltab is left as it was
+            logging.error('Reordering the axes of '+self.name+' failed, old arrays restored.')
+            for name in ['val', 'weight']:
+                if name+'_old' in self.obj:
+                    if name in self.obj: self.obj._f_get_child(name)._f_rename(name+'_relayout')
+                    self.obj._f_get_child(name+'_old')._f_rename(name)
+                if name+'_relayout' in self.obj: self.obj._f_get_child(name+'_relayout')._f_remove()
+            fileh.flush()
+            raise
+        for name in ['val', 'weight']:
+            self.obj._f_get_child(name+'_old')._f_remove()
+        fileh.flush()
+
+        self.axesNames = newAxesOrder
+        self.selection = [self.selection[j] for j in perm]
+        self.selectionVersion += 1
+        logging.info('Soltab '+self.name+' axes reordered to '+', '.join(newAxesOrder)+'.')
+
+
+    def copy(self, soltabName=None, solset=None, chunkShape=None, complevel=None, complib=None):
+        """
+        Copy this soltab (values, weights, axes, attributes and history) with an HDF5 object copy,
+        data are not loaded in memory. The selection is ignored, the whole table is copied.
+
+        Parameters
+        ----------
+        soltabName : str, optional
+            Name of the copy, by default the first available from the soltab type.
+        solset : solset obj, optional
+            Solset where to copy the soltab, also in another h5parm, by default the solset of this soltab.
+        chunkShape : list, optional
+            Re-chunk val/weight with this chunk shape.
+        complevel : int, optional
+            Re-compress val/weight with this compression level from 0 to 9.
+        complib : str, optional
+            Re-compress val/weight with this compression library.
+
+        Returns
+        -------
+        soltab obj
+            The new soltab.
+        """
+        if solset is None: solset = self.getSolset()
+        soltabName = solset._checkSoltabName(soltabName, self.getType())
+
+        # the copy is made from disk
+        cacheManager.flush(self._getNode())
+        cacheManager.flush(self._getNode(weight=True))
+        _flushStats(self.obj._v_file, [self.obj._v_pathname])
+        _catalogs.pop(id(solset.obj._v_file), None)
+
+        logging.info('Copying soltab '+self.name+' to '+solset.name+'/'+soltabName+'.')
+        if chunkShape is None and complevel is None and complib is None:
+            soltab = self.obj._f_copy(newparent=solset.obj, newname=soltabName, recursive=True)
+        else:
+            valNode = self.obj.val
+            filters = valNode.filters
+            if complevel is not None or complib is not None:
+                if complevel is None: complevel = filters.complevel
+                if complib is None: complib = filters.complib or 'zlib'
+                filters = tables.Filters(complevel=complevel, complib=complib)
+            if chunkShape is None:
+                if valNode.chunkshape is not None: chunkShape = valNode.chunkshape
+                elif filters.complevel > 0: chunkShape = _chunkShape(valNode.shape, valNode.atom.itemsize, self.getAxesNames())
+            maxMemory = self.iterMaxMemory
+            if maxMemory is None: maxMemory = 2**28
+
+            soltab = self.obj._f_copy(newparent=solset.obj, newname=soltabName, recursive=False)
+            perm = list(range(len(self.getAxesNames())))
+            for child in self.obj._v_children.values():
+                if child._v_name in ['val', 'weight']:
+                    _copyData(child, soltab, child._v_name, perm, self.getAxesNames(), chunkShape, filters, maxMemory)
+                else:
+                    child._f_copy(newparent=soltab)
+
+        return Soltab(soltab)
+
 
     def flush(self):
         """
-        Copy cached values into the table
+        Copy cached values into the table, only the modified regions are written.
+        Nothing is written if cacheManager.deferFlush is set.
         """
         if not self.useCache:
             logging.error("Flushing non cached data.")
             sys.exit(1)
+        if cacheManager.deferFlush:
+            logging.debug("Writing back of "+self.name+" deferred.")
+            return
 
         logging.info("Writing results...")
-        self.obj.weight[:] = self.cacheWeight
-        self.obj.val[:] = self.cacheVal
+        cacheManager.flush(self._getNode(weight=True))
+        cacheManager.flush(self._getNode())
+        _flushStats(self.obj._v_file, [self.obj._v_pathname])
+
+
+    def refresh(self):
+        """
+        Read again the shape of the soltab, to see the data that a SWMR writer appended or modified after
+        the soltab was opened (see h5parm(swmr=True)). Cached data and axes values are dropped, the selection is kept.
+        """
+        for node in [self._getNode(), self._getNode(weight=True)]:
+            cacheManager.flush(node)
+            cacheManager.drop(node)
+        _catalogs.pop(id(self.obj._v_file), None)
+        self.axesIndex = {}
+        self.selectionVersion += 1
+
+        if isinstance(self.obj._v_file, SwmrFile):
+            nodes = [self.obj.val, self.obj.weight] + [self.axes[axis] for axis in self.getAxesNames()]
+            if 'history' in self.obj: nodes.append(self.obj.history)
+            for node in nodes: node.refresh()
+            # Soltab.append() writes weight, val and then the axis: show only the complete part
+            extIdx = self.obj.val.extdim
+            if extIdx >= 0:
+                axis = self.axes[self.getAxesNames()[extIdx]]
+                length = min(self.obj.val.shape[extIdx], self.obj.weight.shape[extIdx], axis.shape[0])
+                for node in [self.obj.val, self.obj.weight]:
+                    node.shape = node.shape[:extIdx] + (length,) + node.shape[extIdx+1:]
+                axis.shape = (length,)
 
 
     def __getattr__(self, axis):
@@ -1076,37 +3269,15 @@ class Soltab( object ):
         # NOTE: pytables has a nasty limitation that only one list can be applied when selecting.
         # Conversely, one can apply how many slices he wants.
         # Single values/contigous values are converted in slices in h5parm.
-        # This implements a workaround for this limitation. Once the pytables will be updated, the except can be removed.
-        if np.sum( [1. for sel in selection if type(sel) is list] ) > 1 and \
-           ( type(data) is np.ndarray or \
-           np.sum( [len(sel)-1 for sel in selection if type(sel) is list] ) > 0 ):
-        
-            logging.debug('Optimizing selection reading '+str(selection))
-            # for performances is important to minimize the fetched data
-            # move all slices at the first selection and lists afterwards (first list is allowd in firstselection)
-            selectionListsIdx = [i for i, s in enumerate(selection) if type(s) is list]
-            firstSelection = selection[:]
-            for i in selectionListsIdx[1:]:
-                firstSelection[i] = slice(None)
-            # create a second selection using np.ix_
-            secondSelection = []
-            for i, sel in enumerate(selection):
-                #if i == selectionListsIdx[0]: secondSelection.append(range(self.getAxisLen(self.getAxesNames()[i], ignoreSelection=False)))
-                if i == selectionListsIdx[0]: secondSelection.append(range(len(sel)))
-                elif type(sel) is list: secondSelection.append(sel)
-                elif type(sel) is slice: secondSelection.append(range(self.getAxisLen(self.getAxesNames()[i], ignoreSelection=False)))
-            #print firstSelection
-            #print secondSelection
-            #print data[tuple(firstSelection)].shape
-            #print data[tuple(firstSelection)][np.ix_(*secondSelection)].shape
-            return data[tuple(firstSelection)][np.ix_(*secondSelection)]
-        else:
-            return data[tuple(selection)]
+        # Multiple lists are handled by _readSelection() which splits them in contiguous runs
+        # or reads a superset, whatever is cheaper.
+        return _readSelection(data, selection)
 
 
     def getValues(self, retAxesVals=True, weight=False, reference=None):
         """
         Creates a simple matrix of values. Fetching a copy of all selected rows into memory.
+        If the H5parm was opened with mmap=True, a read-only view of the memory map may be returned instead.
 
         Parameters
         ----------
@@ -1125,14 +3296,9 @@ class Soltab( object ):
             A numpy ndarrey (values or weights depending on parameters)
             If selected, returns also the axes values
         """
-        if self.useCache:
-            if weight: dataVals = self.cacheWeight
-            else: dataVals = self.cacheVal
-        else:
-            if weight: dataVals = self.obj.weight
-            else: dataVals = self.obj.val
-
-        dataVals = self._applyAdvSelection(dataVals, self.selection)
+        Soltab.calls['getValues'] += 1
+        data = self._getData(weight)
+        dataVals = self._applyAdvSelection(data, self.selection)
 
         if not reference is None:
             if not self.getType() in ['phase', 'scalarphase', 'rotation', 'tec', 'clock', 'tec3rd']:
@@ -1143,23 +3309,23 @@ class Soltab( object ):
                 logging.error('Cannot find antenna '+reference+'. Ignore referencing.')
             else:
 
-                if self.useCache:
-                    if weight: dataValsRef = self.cacheWeight
-                    else: dataValsRef = self.cacheVal
-                else:
-                    if weight: dataValsRef = self.obj.weight
-                    else: dataValsRef = self.obj.val
+                from losoto.lib_operations import normalize_phase
                 refSelection = self.selection[:]
                 antAxis = self.getAxesNames().index('ant')
                 refSelection[antAxis] = [self.getAxisValues('ant', ignoreSelection=True).tolist().index(reference)]
-                dataValsRef = self._applyAdvSelection(dataValsRef, refSelection)
+                # the reference has length 1 on the ant axis and is broadcast on the selection
+                dataValsRef = self._applyAdvSelection(data, refSelection)
+
+                # data are modified in place, but never the cached/memory mapped ones
+                if isinstance(data, np.ndarray) and np.may_share_memory(dataVals, data):
+                    dataVals = np.array(dataVals)
 
                 if weight:
-                    dataVals[ np.repeat(dataValsRef, axis=antAxis, repeats=len(self.getAxisValues('ant'))) == 0. ] = 0.
+                    np.copyto(dataVals, 0., where=(dataValsRef == 0.))
                 else:
-                    dataVals = dataVals - np.repeat(dataValsRef, axis=antAxis, repeats=len(self.getAxisValues('ant')))
-                    if not self.getType() != 'tec' and not self.getType() != 'clock' and not self.getType() != 'tec3rd':
-                        dataVals = normalize_phase(dataVals)
+                    dataVals -= dataValsRef
+                    if self.getType() in ['phase', 'scalarphase']:
+                        normalize_phase(dataVals, out=dataVals)
 
         if not retAxesVals:
             return dataVals
@@ -1171,12 +3337,306 @@ class Soltab( object ):
         return dataVals, axisVals
 
 
-    def getValuesIter(self, returnAxes=[], weight=False, reference=None):
+    def getFlags(self, selection=None):
+        """
+        Get the flags (True->FLAGGED, i.e. weight == 0) of the selected data.
+        Bit-packed weights are unpacked directly into booleans.
+
+        Parameters
+        ----------
+        selection : selection format, optional
+            To get only a subset of data, overriding global selection, by default use global selection.
+
+        Returns
+        -------
+        array
+            A boolean numpy ndarray.
+        """
+        if selection is None: selection = self.selection
+        node = self._getNode(weight=True)
+        if isinstance(node, FlagPlane) and not self.useCache:
+            return _readSelection(FlagPlane(node.node, flags=True), selection)
+        return _readSelection(self._getData(weight=True), selection) == 0
+
+
+    def setFlags(self, flags, selection=None):
+        """
+        Set the flags (True->FLAGGED) of the selected data.
+        Flagged data get weight 0, unflagged data keep their weight (or get weight 1 if they were flagged).
+
+        Parameters
+        ----------
+        flags : array or bool
+            Flags with the selection shape, or a single value for all the selected data.
+        selection : selection format, optional
+            To set only a subset of data, overriding global selection, by default use global selection.
+        """
+        if selection is None: selection = self.selection
+        node = self._getNode(weight=True)
+        if np.ndim(flags) == 0: flags = bool(flags)
+        else: flags = np.asarray(flags, dtype=bool)
+
+        if isinstance(node, FlagPlane) and not self.useCache:
+            cacheManager.drop(node) # a cached copy would be outdated
+            _writeSelection(FlagPlane(node.node, flags=True), selection, flags)
+            self._setStats(None)
+            return
+
+        weights = np.array(_readSelection(self._getData(weight=True), selection))
+        flags = np.broadcast_to(np.reshape(flags, weights.shape) if np.ndim(flags) > 0 else flags, weights.shape)
+        weights[flags] = 0
+        weights[~flags & (weights == 0)] = 1
+        self.setValues(weights, selection, weight=True)
+
+
+    def countFlagged(self):
+        """
+        Count the flagged data (weight == 0) in the current selection.
+        For bit-packed weights with no selection the bits are counted without unpacking them.
+
+        Returns
+        -------
+        int
+            Number of flagged data.
+        """
+        node = self._getNode(weight=True)
+        if isinstance(node, FlagPlane) and not self.useCache and \
+                all(isinstance(sel, slice) and sel == slice(None) for sel in self.selection):
+            return node.countFlagged()
+        return int(np.count_nonzero(self.getFlags()))
+
+
+    def _computeCurrentStats(self, perAxis):
+        """
+        Compute the statistics from the current data, the cached ones if modified and not yet written back.
+
+        Parameters
+        ----------
+        perAxis : list
+            Axes for which the flagged data are counted per element.
+        """
+        logging.debug('Computing statistics for '+self.name+'.')
+        data = []
+        for weight in [False, True]:
+            node = self._getNode(weight)
+            data.append(cacheManager.peek(node))
+            if data[-1] is None: data[-1] = node
+        return _computeStats(self.getAxesNames(), data[0], data[1], perAxis)
+
+
+    def _getStats(self):
+        """
+        Get the statistics modified in memory or stored in the soltab attributes.
+        Outdated statistics (see _setStats()) are computed from the data.
+
+        Returns
+        -------
+        dict
+            Statistics as returned by getStats(), None if they were never stored.
+        """
+        key = (id(self.obj._v_file), self.obj._v_pathname)
+        if key in _stats:
+            if _stats[key][1] is None: _stats[key][1] = self._computeCurrentStats(_stats[key][2])
+            return _stats[key][1]
+
+        attrNames = self.obj._v_attrs._v_attrnames
+        if not 'stats_flagged' in attrNames: return None
+        return dict((name[6:], self.obj._v_attrs[name]) for name in attrNames if name.startswith('stats_'))
+
+
+    def _setStats(self, stats):
+        """
+        Set the statistics of the soltab, they are kept in memory and stored in the soltab attributes
+        when the soltab is flushed or the h5parm closed (see _flushStats()).
+
+        Parameters
+        ----------
+        stats : dict or None
+            Statistics as returned by getStats(), None marks the statistics as outdated (if the soltab has them).
+        """
+        # attributes cannot be safely modified in SWMR mode, statistics are computed when needed
+        if isinstance(self.obj._v_file, SwmrFile): return
+        key = (id(self.obj._v_file), self.obj._v_pathname)
+        if stats is None:
+            if key in _stats:
+                if _stats[key][1] is not None:
+                    _stats[key][1:] = [None, [name[8:] for name in _stats[key][1] if name.startswith('flagged_')]]
+            else:
+                attrNames = self.obj._v_attrs._v_attrnames
+                if 'stats_flagged' in attrNames:
+                    _stats[key] = [self.obj, None, [name[14:] for name in attrNames if name.startswith('stats_flagged_')]]
+            return
+        _stats[key] = [self.obj, stats, None]
+
+
+    def getHash(self):
+        """
+        Get a hash of the content of the whole soltab (axes, values and weights), the selection is ignored.
+        Data modified in the cache and not yet written back are used.
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-1 digest.
+        """
+        import hashlib
+        h = hashlib.sha1()
+        h.update(','.join(self.getAxesNames()).encode())
+        for axis in self.getAxesNames():
+            h.update(np.ascontiguousarray(self.axes[axis].read()).tobytes())
+
+        maxMemory = self.iterMaxMemory
+        if maxMemory is None: maxMemory = 2**28
+        for weight in [False, True]:
+            node = self._getNode(weight)
+            if self.useCache: data = self._getData(weight)
+            else: data = cacheManager.peek(node)
+            if data is None: data = node
+            h.update((str(np.dtype(data.dtype))+str(tuple(int(n) for n in data.shape))).encode())
+            # read in blocks along the first axis
+            block = max(1, maxMemory // max(1, np.dtype(data.dtype).itemsize * int(np.prod(data.shape[1:]))))
+            for i in range(0, data.shape[0], block):
+                h.update(np.ascontiguousarray(data[i:i+block]).tobytes())
+
+        return h.hexdigest()
+
+
+    def getStats(self, recompute=False):
+        """
+        Get the summary statistics of the whole table (the selection is ignored).
+        Statistics are stored in the soltab attributes when the table is created, writes mark them as outdated and
+        they are computed again here or when the soltab is flushed or the h5parm closed (and then stored). They are
+        computed (and stored, if the file is writable) also for tables without them.
+
+        Parameters
+        ----------
+        recompute : bool, optional
+            If True ignore the stored statistics and compute them from the data, by default False.
+
+        Returns
+        -------
+        dict
+            'flagged' (flagged data), 'nan' (NaN values), 'sum' (sum of non-NaN values), 'min', 'max',
+            'minmax' (False if min/max are outdated, use recompute) and 'flagged_<axis>' (flagged data
+            for each element of the axis, only for axes not longer than statsMaxAxisLen).
+        """
+        stats = None if recompute else self._getStats()
+        if stats is None:
+            logging.debug('Computing statistics for '+self.name+'.')
+            stats = _computeStats(self.getAxesNames(), self._getData(), self._getData(weight=True))
+            if self.obj._v_file.mode != 'r': self._setStats(stats)
+        return stats
+
+
+    def getFlaggedFraction(self, axis):
+        """
+        Get the fraction of flagged data for each element of an axis (e.g. per antenna), on the whole table.
+
+        Parameters
+        ----------
+        axis : str
+            The name of the axis.
+
+        Returns
+        -------
+        array
+            Fraction of flagged data for each value of the axis.
+        """
+        if axis not in self.getAxesNames():
+            logging.error('Axis \"'+axis+'\" not found.')
+            return None
+
+        stats = self.getStats()
+        if not 'flagged_'+axis in stats:
+            stats = _computeStats(self.getAxesNames(), self._getData(), self._getData(weight=True), perAxis=[axis])
+        axisLen = self.getAxisLen(axis, ignoreSelection=True)
+        size = np.prod([self.getAxisLen(a, ignoreSelection=True) for a in self.getAxesNames()])
+        return stats['flagged_'+axis] / float(size/axisLen)
+
+
+    def _selectionToIdx(self, axis):
+        """
+        Get the positions of the selected values of an axis.
+
+        Parameters
+        ----------
+        axis : str
+            The name of the axis.
+
+        Returns
+        -------
+        array
+            Indexes (on the full axis) of the selected values.
+        """
+        axisIdx = self.getAxesNames().index(axis)
+        return np.arange(self.getAxisLen(axis, ignoreSelection=True))[ self.selection[axisIdx] ]
+
+
+    def _iterBlocks(self, returnAxes, weight, maxMemory):
+        """
+        Split the current selection in blocks along the non-returned axes, each fitting into maxMemory bytes.
+        Blocks are returned in the same order as np.ndindex() would visit the iterated axes.
+
+        Parameters
+        ----------
+        returnAxes : list
+            Axes that are not iterated.
+        weight : bool
+            If true also weights are fetched with the values.
+        maxMemory : int
+            Memory budget in bytes, if None a single block with the whole selection is returned.
+
+        Returns
+        -------
+        iterator
+            Yields (block selection, offset of the block along the iterated axes, block shape along the iterated axes).
+        """
+        axesNames = self.getAxesNames()
+        iterAxes = [axis for axis in axesNames if not axis in returnAxes]
+        iterAxesDim = [self.getAxisLen(axis) for axis in iterAxes]
+
+        if maxMemory is None or len(iterAxes) == 0:
+            yield (self.selection, [0]*len(iterAxes), iterAxesDim)
+            return
+
+        # bytes needed by a single returned matrix
+        itemBytes = self._getNode().dtype.itemsize
+        if weight: itemBytes += self._getNode(weight=True).dtype.itemsize
+        cubeBytes = itemBytes * int(np.prod([self.getAxisLen(axis) for axis in returnAxes]))
+
+        # find the outermost iterated axis which can be split keeping all the inner ones in memory
+        for k in range(len(iterAxes)):
+            innerBytes = cubeBytes * int(np.prod(iterAxesDim[k+1:]))
+            if innerBytes <= maxMemory: break
+        if innerBytes > maxMemory:
+            logging.debug('A single iteration needs %i bytes, more than the memory budget.' % innerBytes)
+        blockLen = int(min(iterAxesDim[k], max(1, maxMemory // innerBytes)))
+
+        selIdx = [self._selectionToIdx(axis) for axis in iterAxes]
+        iterAxesIdx = [axesNames.index(axis) for axis in iterAxes]
+        for outerIdx in np.ndindex(tuple(iterAxesDim[:k])):
+            for start in range(0, iterAxesDim[k], blockLen):
+                blockSelection = self.selection[:]
+                for i, j in enumerate(iterAxesIdx[:k]):
+                    pos = selIdx[i][outerIdx[i]]
+                    blockSelection[j] = slice(pos, pos+1)
+                blockIdx = selIdx[k][start:start+blockLen]
+                if len(blockIdx) == 1 or np.all(np.diff(blockIdx) == 1):
+                    blockSelection[iterAxesIdx[k]] = slice(blockIdx[0], blockIdx[-1]+1)
+                else:
+                    blockSelection[iterAxesIdx[k]] = blockIdx.tolist()
+                yield (blockSelection, list(outerIdx)+[start]+[0]*(len(iterAxes)-k-1), \
+                        [1]*k + [len(blockIdx)] + iterAxesDim[k+1:])
+
+
+    def getValuesIter(self, returnAxes=[], weight=False, reference=None, maxMemory=None):
         """
         Return an iterator which yields the values matrix (with axes = returnAxes) iterating along the other axes.
         E.g. if returnAxes are ['freq','time'], one gets a interetion over all the possible NxM
         matrix where N are the freq and M the time dimensions. The other axes are iterated in the getAxesNames() order.
-        Note that all the data are fetched in memory before returning them one at a time. This is quicker.
+        Data are read in blocks along the iterated axes within a memory budget (by default Soltab.iterMaxMemory),
+        so the whole selection is never loaded at once if larger; cached soltabs larger than the budget are not cached.
+        Without budget all the data are fetched in memory before returning them one at a time.
 
         Parameters
         ----------
@@ -1186,6 +3646,8 @@ class Soltab( object ):
             If true return also the weights, by default False.
         reference : str
             In case of phase solutions, reference to this station name.
+        maxMemory : int, optional
+            Memory budget in bytes for the data read at once, by default Soltab.iterMaxMemory (None: read everything).
 
         Returns
         -------
@@ -1195,91 +3657,184 @@ class Soltab( object ):
         {'axisname1':[axisvals1],'axisname2':[axisvals2],...}
         4) a selection which should be used to write this data back using a setValues()
         """
-        if weight: weigthVals = self.getValues(retAxesVals=False, weight=True, reference=reference)
-        dataVals = self.getValues(retAxesVals=False, weight=False, reference=reference)
+        if maxMemory is None: maxMemory = self.iterMaxMemory
 
-        # get dimensions of non-returned axis (in correct order)
-        iterAxesDim = [self.getAxisLen(axis) for axis in self.getAxesNames() if not axis in returnAxes]
+        def getBlock(blockSelection, weight):
+            # read a block temporarily replacing the global selection
+            selection = self.selection
+            self.selection = blockSelection
+            try:
+                return self.getValues(retAxesVals=False, weight=weight, reference=reference)
+            finally:
+                self.selection = selection
 
         # generator to cycle over all the combinations of iterAxes
         # it "simply" gets the indexes of this particular combination of iterAxes
         # and use them to refine the selection.
         def g():
-            for axisIdx in np.ndindex(tuple(iterAxesDim)):
-                refSelection = []
-                returnSelection = []
-                thisAxesVals = {}
-                i = 0
-                for j, axisName in enumerate(self.getAxesNames()):
-                    if axisName in returnAxes:
-                        thisAxesVals[axisName] = self.getAxisValues(axisName)
-                        # add a slice with all possible values (main selection is preapplied)
-                        refSelection.append(slice(None))
-                        # for the return selection use the "main" selection for the return axes
-                        returnSelection.append(self.selection[j])
-                    else:
+            # iteration plan, built once: selected axes values and their positions on the full axes
+            axesNames = self.getAxesNames()
+            axesVals = dict((axisName, self.getAxisValues(axisName)) for axisName in axesNames)
+            iterAxes = [axisName for axisName in axesNames if not axisName in returnAxes]
+            iterIdx = [self._selectionToIdx(axisName) for axisName in iterAxes]
+            iterPos = [axesNames.index(axisName) for axisName in iterAxes]
+            # return axes: all the values (main selection is preapplied) and the main selection to write back
+            returnSelectionTemplate = [self.selection[j] if axisName in returnAxes else None for j, axisName in enumerate(axesNames)]
+            refSelectionTemplate = [slice(None)] * len(axesNames)
+
+            for blockSelection, blockOffset, blockDim in self._iterBlocks(returnAxes, weight, maxMemory):
+                if weight: weigthVals = getBlock(blockSelection, weight=True)
+                dataVals = getBlock(blockSelection, weight=False)
+
+                for blockIdx in np.ndindex(tuple(blockDim)):
+                    refSelection = refSelectionTemplate[:]
+                    returnSelection = returnSelectionTemplate[:]
+                    iterAxesVals = {}
+                    for i, axisName in enumerate(iterAxes):
+                        axisIdx = blockOffset[i] + blockIdx[i]
                         #TODO: the iteration axes are not into a 1 element array, is it a problem?
-                        thisAxesVals[axisName] = self.getAxisValues(axisName)[axisIdx[i]]
-                        # add this index to the refined selection, this will return a single value for this axis
-                        # an int is appended, this will remove an axis from the final data
-                        refSelection.append(axisIdx[i])
-                        # for the return selection use the complete axis and find the correct index
-                        returnSelection.append( [self.getAxisValues(axisName, ignoreSelection=True).tolist().index(thisAxesVals[axisName])] )
-                        i += 1
-
-                # costly command
-                data = dataVals[tuple(refSelection)]
-                if weight:
-                    weights = weigthVals[tuple(refSelection)]
-                    yield (data, weights, thisAxesVals, returnSelection)
-                else:
-                    yield (data, thisAxesVals, returnSelection)
+                        iterAxesVals[axisName] = axesVals[axisName][axisIdx]
+                        # an int is used, this will remove an axis from the final data
+                        refSelection[iterPos[i]] = blockIdx[i]
+                        # for the return selection use the position on the complete axis
+                        returnSelection[iterPos[i]] = [int(iterIdx[i][axisIdx])]
+                    thisAxesVals = dict((axisName, iterAxesVals.get(axisName, axesVals[axisName])) for axisName in axesNames)
+
+                    # costly command
+                    data = dataVals[tuple(refSelection)]
+                    if weight:
+                        weights = weigthVals[tuple(refSelection)]
+                        yield (data, weights, thisAxesVals, returnSelection)
+                    else:
+                        yield (data, thisAxesVals, returnSelection)
 
         return g()
 
 
-    def addHistory(self, entry):
+    def _getHistoryTable(self, create=False):
+        """
+        Get the history table of this soltab.
+
+        Parameters
+        ----------
+        create : bool, optional
+            Create the table if missing, by default False.
+
+        Returns
+        -------
+        pytables Table or None
+            The history table, None if missing.
+        """
+        if 'history' in self.obj:
+            table = self.obj.history
+            # rows appended in SWMR mode are not in the pytables index, see _historyIndexed()
+            if not self._historyIndexed(table) and table._v_file.mode != 'r':
+                table.cols.operation.reindex()
+            return table
+        if not create:
+            return None
+        descriptor = np.dtype([('time', np.bytes_, 19), ('step', np.bytes_, 64), ('operation', np.bytes_, 32), ('entry', np.bytes_, 1024)])
+        table = self.obj._v_file.create_table(self.obj, 'history', descriptor, title='Soltab history', expectedrows=100)
+        table.cols.operation.create_index()
+        return table
+
+
+    def _historyIndexed(self, table):
+        """
+        Check if the pytables index of the history table covers all the rows, rows appended in SWMR mode
+        (by h5py) are not indexed and queries using the index would miss them.
+
+        Parameters
+        ----------
+        table : pytables Table
+            The history table.
+
+        Returns
+        -------
+        bool
+            False if the index is outdated.
+        """
+        if not isinstance(table, tables.Table) or not table.cols.operation.is_indexed: return True
+        return table.cols.operation.index.nelements == table.nrows
+
+
+    def addHistory(self, entry, step=None, operation=None):
         """
         Adds entry to the table history with current date and time
 
-        Since attributes cannot by default be larger than 64 kB, each
-        history entry is stored in a separate attribute.
+        Entries are appended as rows of the "history" table of the soltab,
+        old entries stored as HISTORYnnn attributes of the val array are still read.
 
         Parameters
         ----------
         entry : str
             entry to add to history list
+        step : str, optional
+            name of the parset step, by default the one of the step that opened this soltab (if any)
+        operation : str, optional
+            name of the operation, by default the one of the step that opened this soltab (if any)
         """
         import datetime
         current_time = str(datetime.datetime.now()).split('.')[0]
-        attrs = self.obj.val.attrs._f_list("user")
-        nums = []
-        for attr in attrs:
-            try:
-                if attr[:-3] == 'HISTORY':
-                    nums.append(int(attr[-3:]))
-            except:
-                pass
-        historyAttr = "HISTORY%03d" % min(list(set(range(1000)) - set(nums)))
+        if step is None: step = self.step
+        if operation is None: operation = self.operation
+        entry = str(entry)
+        if len(entry) > 1024:
+            logging.warning('History entry too long, truncating it to 1024 characters.')
 
-        self.obj.val.attrs[historyAttr] = current_time + ": " + str(entry)
+        table = self._getHistoryTable(create=True)
+        table.append([(current_time.encode(), str(step or '').encode(), str(operation or '').upper().encode(), \
+                entry[:1024].encode())])
+        table.flush()
 
 
-    def getHistory(self):
+    def getHistory(self, step=None, operation=None):
         """
         Get the soltab history.
 
+        Parameters
+        ----------
+        step : str, optional
+            only get entries added by this parset step, by default all entries
+        operation : str, optional
+            only get entries added by this operation, by default all entries
+
         Returns
         -------
         str
             The table history as a string with each entry separated by newlines.
         """
-        attrs = self.obj.val.attrs._f_list("user")
-        attrs.sort()
         history_list = []
-        for attr in attrs:
-            if attr[:-3] == 'HISTORY':
-                history_list.append(self.obj.val.attrs[attr])
+
+        # old-style history, one attribute per entry
+        if step is None and operation is None:
+            attrs = self.obj.val.attrs._f_list("user")
+            attrs.sort()
+            for attr in attrs:
+                if attr[:-3] == 'HISTORY':
+                    history_list.append(self.obj.val.attrs[attr])
+
+        table = self._getHistoryTable()
+        if table is not None:
+            if step is None and operation is None:
+                rows = table.read()
+            elif not self._historyIndexed(table):
+                rows = table.read()
+                if operation is not None: rows = rows[rows['operation'] == operation.upper().encode()]
+                if step is not None: rows = rows[rows['step'] == step.encode()]
+            else:
+                conditions = []
+                condvars = {}
+                if operation is not None:
+                    conditions.append('(operation == op)')
+                    condvars['op'] = operation.upper().encode()
+                if step is not None:
+                    conditions.append('(step == st)')
+                    condvars['st'] = step.encode()
+                rows = table.read_where(' & '.join(conditions), condvars)
+            for row in rows:
+                history_list.append(row['time'].decode() + ": " + row['entry'].decode())
+
         if len(history_list) == 0:
             history_str = ""
         else:
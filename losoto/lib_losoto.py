@@ -5,6 +5,8 @@
 
 import os, sys, ast, re
 import logging
+import io
+import contextlib
 from configparser import ConfigParser
 #if (sys.version_info > (3, 0)):
 #    from configparser import ConfigParser
@@ -12,6 +14,11 @@ from configparser import ConfigParser
 #    from ConfigParser import ConfigParser
 
 cacheSteps = ['plot','clip','flag','norm','smooth'] # steps to use chaced data
+readOnlySteps = ['plot','plotscreen','structure'] # steps not modifying the selected soltabs
+structureSteps = ['clocktec','directionscreen','duplicate','faraday','interpolate','polalign','prefactor_bandpass', \
+        'prefactor_xyoffset','screenvalues','splitleak','stationscreen','tec'] # steps creating/deleting soltabs in the selected solsets
+multiprocSteps = ['flag','flagextend','flagstation','plot','prefactor_bandpass','reweight'] # steps using [_global] ncpu processes
+soltabOptions = {'soltabsToAdd':'r', 'soltabsToSub':'r', 'soltabImport':'r', 'soltabExport':'w', 'resSoltab':'r'} # options naming other soltabs of the same solset
 
 class LosotoParser(ConfigParser):
     """
@@ -26,12 +33,12 @@ class LosotoParser(ConfigParser):
     def __init__(self, parsetFile):
         ConfigParser.__init__(self, inline_comment_prefixes=('#',';'))
 
-        import StringIO
-        config = StringIO.StringIO()
+        self.parsetFile = parsetFile
+        config = io.StringIO()
         # add [_global] fake section at beginning
         config.write('[_global]\n'+open(parsetFile).read())
         config.seek(0, os.SEEK_SET)
-        self.readfp(config)
+        self.read_file(config)
 
     def checkSpelling(self, s, soltab, availValues=[]):
         """
@@ -167,7 +174,51 @@ def getParAxis( parser, step, axisName ):
     return axisOpt
 
 
-def getStepSoltabs(parser, step, H):
+def _getStepSoltabSel(parser, step):
+    """
+    Return the list of regular expressions selecting the soltabs ("solset/soltab") of a step
+    """
+    if parser.has_option(step, 'soltab'):
+        return parser.getarraystr(step, 'soltab')
+    elif parser.has_option('_global', 'soltab'):
+        return parser.getarraystr('_global', 'soltab')
+    else:
+        return ['.*/.*'] # select all
+
+
+def getStepSoltabNames(parser, step, H):
+    """
+    Return the names of the soltabs selected by a step, without building their objects
+
+    Parameters
+    ----------
+    parser : parser obj
+        configuration file
+
+    step : str
+        current step
+
+    H : h5parm obj
+        the h5parm object
+
+    Returns
+    -------
+    list
+        list of "solset/soltab" names
+    """
+    stsel = [re.compile(this_stsel) for this_stsel in _getStepSoltabSel(parser, step)]
+
+    # match on the catalog names
+    names = []
+    for solsetName, soltabsInfo in H.getCatalog().items():
+        for soltabName in soltabsInfo:
+            if any(this_stsel.match(solsetName+'/'+soltabName) for this_stsel in stsel):
+                names.append(solsetName+'/'+soltabName)
+
+    return names
+
+
+def getStepSoltabs(parser, step, H, soltabNames=None):
     """
     Return a list of soltabs object for a step and apply selection creteria
 
@@ -182,38 +233,793 @@ def getStepSoltabs(parser, step, H):
     H : h5parm obj
         the h5parm object
 
+    soltabNames : list, optional
+        "solset/soltab" names of the soltabs to use, by default the ones selected by the step
+
     Returns
     -------
     list
         list of soltab obj with applied selection
     """
+    if soltabNames is None: soltabNames = getStepSoltabNames(parser, step, H)
 
-    # selection on soltabs
-    if parser.has_option(step, 'soltab'):
-        stsel = parser.getarraystr(step, 'soltab')
-    elif parser.has_option('_global', 'soltab'):
-        stsel = parser.getarraystr('_global', 'soltab')
-    else:
-        stsel = ['.*/.*'] # select all
-    #if not type(stsel) is list: stsel = [stsel]
-
+    # soltab objects are built only for the selected tables
     soltabs = []
-    for solset in H.getSolsets():
-        for soltabName in solset.getSoltabNames():
-            if any(re.compile(this_stsel).match(solset.name+'/'+soltabName) for this_stsel in stsel):
-                if parser.getstr(step, 'operation').lower() in cacheSteps:
-                    soltabs.append( solset.getSoltab(soltabName, useCache=True) )
-                else:
-                    soltabs.append( solset.getSoltab(soltabName, useCache=False) )
+    for name in soltabNames:
+        solsetName, soltabName = name.split('/')
+        solset = H.getSolset(solsetName)
+        if parser.getstr(step, 'operation').lower() in cacheSteps:
+            soltabs.append( solset.getSoltab(soltabName, useCache=True) )
+        else:
+            soltabs.append( solset.getSoltab(soltabName, useCache=False) )
 
     if soltabs == []:
         logging.warning('No soltabs selected for step %s.' % step)
 
     # axes selection
     for soltab in soltabs:
+        soltab.step = step
+        soltab.operation = parser.getstr(step, 'operation')
         userSel = {}
         for axisName in soltab.getAxesNames():
             userSel[axisName] = getParAxis( parser, step, axisName )
         soltab.setSelection(**userSel)
 
     return soltabs
+
+
+def _getStepCachedNames(parser, step, H):
+    """
+    Return the names of the soltabs a step reads only from the cache
+    """
+    if not parser.getstr(step, 'operation').lower() in cacheSteps:
+        return []
+    # other soltabs named in the options are read from disk
+    otherNames = set()
+    for option in soltabOptions:
+        otherNames.update(parser.getarraystr(step, option, []))
+    return [name for name in getStepSoltabNames(parser, step, H) if not name.split('/')[1] in otherNames]
+
+
+def _getKeptCachedNames(parser, steps, i, H, names):
+    """
+    Return the soltabs (from names) that the first following step using them reads from the cache,
+    their cached data do not need to be written back after step i
+    """
+    keep = []
+    for name in names:
+        for step in steps[i+1:]:
+            reads, writes = getStepIO(parser, step, H)
+            if _overlap(reads | writes, [name]):
+                if name in _getStepCachedNames(parser, step, H): keep.append(name)
+                break
+    return keep
+
+
+def _getStepScope(parser, step):
+    """
+    Return the solsets ("solset/") where a step can select soltabs, [""] (the whole file)
+    if the soltab selection does not name the solsets
+    """
+    scope = set()
+    for stsel in _getStepSoltabSel(parser, step):
+        solsetSel = stsel.split('/')[0]
+        if not '/' in stsel or '|' in stsel or re.escape(solsetSel) != solsetSel:
+            return set([''])
+        scope.add(solsetSel+'/')
+    return scope
+
+
+def getStepIO(parser, step, H, soltabNames=None):
+    """
+    Return the soltabs read and written by a step: the selected soltabs and the ones named by
+    the options in soltabOptions. Steps in structureSteps read and write the whole solsets of the selection.
+
+    Parameters
+    ----------
+    parser : parser obj
+        configuration file
+
+    step : str
+        current step
+
+    H : h5parm obj
+        the h5parm object
+
+    soltabNames : list, optional
+        "solset/soltab" names of the soltabs to use, by default the ones selected by the step
+
+    Returns
+    -------
+    set, set
+        read and written "solset/soltab" names, "solset/" for a whole solset and "" for the whole file
+    """
+    op = parser.getstr(step, 'operation').lower()
+    if op in structureSteps:
+        if soltabNames is None: scope = _getStepScope(parser, step)
+        else: scope = set(name.split('/')[0]+'/' for name in soltabNames)
+        return scope, set(scope)
+
+    names = soltabNames
+    if names is None: names = getStepSoltabNames(parser, step, H)
+    reads = set(names)
+    writes = set() if op in readOnlySteps else set(names)
+    for name in names:
+        solsetName, soltabName = name.split('/')
+        for option, mode in soltabOptions.items():
+            for otherName in parser.getarraystr(step, option, []):
+                if otherName == '': continue
+                if mode == 'r': reads.add(solsetName+'/'+otherName)
+                else: writes.add(solsetName+'/'+otherName)
+        # residual screens are read by default
+        if op == 'plotscreen': reads.add(name+'resid')
+
+    return reads, writes
+
+
+def _overlap(names1, names2):
+    """
+    Check if two sets of names from getStepIO() share any soltab
+    """
+    def contains(a, b):
+        return a == b or ((a == '' or a.endswith('/')) and b.startswith(a))
+    return any(contains(a, b) or contains(b, a) for a in names1 for b in names2)
+
+
+def _stepsConflict(earlier, later):
+    """
+    Check if a step must wait for an earlier one of the parset: the earlier step writes what the later reads
+    or writes, reads what the later writes, or creates soltabs where the later selects them
+    """
+    if earlier['op'] in structureSteps and _overlap(earlier['writes'], later['scope']):
+        return True
+    return _overlap(earlier['writes'], later['reads'] | later['writes']) or _overlap(earlier['reads'], later['writes'])
+
+
+def _getStepParamsHash(parser, step):
+    """
+    Return a hash of the operation, options and [_global] options of a step and of the losoto version
+    """
+    import hashlib, json
+    from losoto import _version
+    params = {'version': _version.__version__, 'step': sorted(parser.items(step)), \
+            'global': sorted((k, v) for k, v in parser.items('_global') if k != 'ncpu')} # same results with any ncpu
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()
+
+
+def _getSoltabNames(H, names):
+    """
+    Return the names of the soltabs of H matching names from getStepIO()
+    """
+    soltabNames = []
+    for solsetName, soltabsInfo in H.getCatalog().items():
+        for soltabName, soltabInfo in soltabsInfo.items():
+            if soltabInfo is not None and _overlap(names, [solsetName+'/'+soltabName]):
+                soltabNames.append(solsetName+'/'+soltabName)
+    return soltabNames
+
+
+def _getSoltabHashes(H, names, hashes, cachedNames=[]):
+    """
+    Return the hashes (see Soltab.getHash()) of soltabs, memoised in hashes.
+    Soltabs in cachedNames are hashed from the cache, loading them.
+    """
+    for name in names:
+        if not name in hashes:
+            solsetName, soltabName = name.split('/')
+            hashes[name] = H.getSolset(solsetName).getSoltab(soltabName, useCache=name in cachedNames).getHash()
+    return dict((name, hashes[name]) for name in names)
+
+
+def _getCurrentHashes(H, names, hashes):
+    """
+    Return the hashes of soltabs as in the checkpoint outputs (see runSteps()), None for the missing ones
+    """
+    soltabNames = _getSoltabNames(H, names)
+    currentHashes = dict((name, None) for name in names)
+    currentHashes.update(_getSoltabHashes(H, soltabNames, hashes))
+    return currentHashes
+
+
+def _getResumeStep(parser, steps, H):
+    """
+    Return the number of steps to skip when resuming: the ones whose checkpoint (see runSteps()) shows
+    they already ran with the same parameters on the same data
+    """
+    checkpoints = H.getCheckpoints()
+    if checkpoints == []:
+        logging.warning('No checkpoints in the h5parm, running all steps.')
+        return 0
+
+    # the soltabs must be as the checkpointed steps left them
+    expected = {}
+    for checkpoint in checkpoints:
+        for name, soltabHash in checkpoint['inputs'].items(): expected.setdefault(name, soltabHash)
+        expected.update(checkpoint['outputs'])
+    hashes = {}
+    soltabNames = _getSoltabNames(H, [''])
+    for name, soltabHash in expected.items():
+        if soltabHash is None: soltabHash = 'deleted'
+        if name in soltabNames: thisHash = _getSoltabHashes(H, [name], hashes)[name]
+        else: thisHash = 'deleted'
+        # e.g. a step failed while writing it, or it was modified outside the parset: running the steps
+        # again on data already processed would apply them twice
+        if thisHash != soltabHash:
+            logging.critical('Soltab %s changed after the checkpointed steps (a step failed while writing it or it was modified), cannot resume: run the parset on the original h5parm.' % name)
+            raise Exception('Soltab %s changed after the checkpointed steps, cannot resume.' % name)
+
+    n = 0
+    while n < min(len(steps), len(checkpoints)) and checkpoints[n]['step'] == steps[n] and \
+            checkpoints[n]['params'] == _getStepParamsHash(parser, steps[n]):
+        n += 1
+    if n < len(checkpoints):
+        logging.critical('Step \'%s\' changed or removed since it was run on this h5parm, cannot resume: run the parset on the original h5parm.' \
+                % checkpoints[n]['step'])
+        raise Exception('Step \'%s\' changed or removed since it was run on this h5parm, cannot resume.' % checkpoints[n]['step'])
+    return n
+
+
+def _getCpuCount():
+    """
+    Return the number of cpus this process can use: the ones in its affinity mask, within the cgroup cpu quota
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        ncpu = len(os.sched_getaffinity(0))
+    else:
+        import multiprocessing
+        ncpu = multiprocessing.cpu_count()
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max': ncpu = min(ncpu, max(1, int(-(-int(quota) // int(period)))))
+    except (IOError, OSError, ValueError):
+        pass
+    return ncpu
+
+
+def _getStepNcpu(parser, step, ncpu):
+    """
+    Return the number of processes used by a step, at most ncpu
+    """
+    if parser.getstr(step, 'operation').lower() in multiprocSteps:
+        stepNcpu = parser.getint('_global', 'ncpu', 0)
+        if stepNcpu == 0: stepNcpu = _getCpuCount()
+        return min(stepNcpu, ncpu)
+    return 1
+
+
+class StepProfiler(object):
+    """
+    Measure the steps run by runSteps() and write a performance report (see write())
+
+    Each step, and each soltab it runs on, gets a record with: the wall time, the cpu time of the process
+    and of its child processes (ended during the step), the peak memory (RSS, MB) of the process and the largest
+    one of its child processes ended so far, the bytes read and written by the process (the HDF5 I/O plus
+    any other file, e.g. plots; memory mapped reads are not counted), the getValues()/setValues() calls and
+    the cache hits/misses. Memory and I/O figures need the /proc filesystem (Linux), they are None elsewhere.
+    """
+
+    fields = ['step', 'operation', 'soltab', 'pid', 'wall', 'cpu', 'childrenCpu', 'peakRss', 'childrenPeakRss', \
+            'readBytes', 'writtenBytes', 'getValues', 'setValues', 'cacheHits', 'cacheMisses']
+
+    def __init__(self, cprofileSteps=0):
+        """
+        Parameters
+        ----------
+        cprofileSteps : int, optional
+            number of steps to profile with cProfile, the ones with the largest wall time are kept, by default 0.
+        """
+        self.records = []
+        self.cprofileSteps = cprofileSteps
+        self.cprofiles = [] # (wall, step, cProfile stats) of the heaviest steps
+        self.peaks = [] # peak RSS of the running measures, outer first
+        # the peak RSS of the process can be reset on Linux
+        try:
+            with open('/proc/self/clear_refs', 'w') as f: f.write('5')
+            self.resetPeak = True
+        except (IOError, OSError):
+            self.resetPeak = False
+
+    def _getPeakRss(self):
+        """
+        Peak RSS of the process in MB, since the last reset if possible
+        """
+        import resource
+        if self.resetPeak:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'): return int(line.split()[1])/1024.
+        # ru_maxrss is in bytes on macOS
+        if sys.platform == 'darwin': return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.**2
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.
+
+    def _getState(self):
+        """
+        Counters of the process
+        """
+        import time
+        from losoto.h5parm import Soltab, cacheManager
+
+        times = os.times()
+        state = {'wall': time.time(), 'cpu': times[0]+times[1], 'childrenCpu': times[2]+times[3], \
+                'readBytes': None, 'writtenBytes': None, 'getValues': Soltab.calls['getValues'], \
+                'setValues': Soltab.calls['setValues'], 'cacheHits': cacheManager.hits, 'cacheMisses': cacheManager.misses}
+        try:
+            with open('/proc/self/io') as f:
+                io = dict(line.split(':') for line in f)
+            state['readBytes'] = int(io['rchar'])
+            state['writtenBytes'] = int(io['wchar'])
+        except (IOError, OSError, KeyError, ValueError):
+            pass
+        return state
+
+    @contextlib.contextmanager
+    def measure(self, step, operation, soltab=''):
+        """
+        Context manager adding a record for the code it runs
+
+        Parameters
+        ----------
+        step : str
+            step name
+
+        operation : str
+            operation name
+
+        soltab : str, optional
+            "solset/soltab" name, by default '' for the whole step (profiled with cProfile if requested)
+        """
+        import resource
+
+        # nested measures: the enclosing one keeps the peak reached so far
+        if self.peaks != []: self.peaks[-1] = max(self.peaks[-1], self._getPeakRss())
+        if self.resetPeak:
+            with open('/proc/self/clear_refs', 'w') as f: f.write('5')
+        self.peaks.append(0)
+        profile = None
+        if soltab == '' and self.cprofileSteps > 0:
+            import cProfile
+            profile = cProfile.Profile()
+        start = self._getState()
+        if profile is not None: profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None: profile.disable()
+            end = self._getState()
+            peak = max(self.peaks.pop(), self._getPeakRss())
+            if self.peaks != []: self.peaks[-1] = max(self.peaks[-1], peak)
+            childrenPeak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            childrenPeak = childrenPeak/1024.**2 if sys.platform == 'darwin' else childrenPeak/1024.
+
+            record = {'step': step, 'operation': operation, 'soltab': soltab, 'pid': os.getpid(), \
+                    'peakRss': round(peak, 1), 'childrenPeakRss': round(childrenPeak, 1)}
+            for field in self.fields[4:]:
+                if field in start:
+                    if start[field] is None: record[field] = None
+                    else: record[field] = end[field] - start[field]
+            for field in ['wall', 'cpu', 'childrenCpu']: record[field] = round(record[field], 3)
+            self.records.append(record)
+
+            if profile is not None:
+                profile.create_stats()
+                self.addCprofiles([(record['wall'], step, profile.stats)])
+
+    def addCprofiles(self, cprofiles):
+        """
+        Keep the cProfile stats of the heaviest steps, from measure() or from another process
+
+        Parameters
+        ----------
+        cprofiles : list
+            (wall time, step name, cProfile stats) tuples
+        """
+        self.cprofiles = sorted(self.cprofiles + list(cprofiles), key=lambda c: -c[0])[:self.cprofileSteps]
+
+    def write(self, fileName):
+        """
+        Write the records in a CSV (.csv extension) or JSON file, and the cProfile stats of the heaviest steps
+        as "<fileName without extension>.<rank>.<step>.prof" (to read with pstats)
+
+        Parameters
+        ----------
+        fileName : str
+            report filename
+        """
+        import json, csv, marshal
+
+        if fileName.lower().endswith('.csv'):
+            with open(fileName, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fields)
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(fileName, 'w') as f:
+                json.dump({'fields': self.fields, 'records': self.records}, f, indent=1)
+        logging.info('Profile report written in: '+fileName)
+
+        for i, (wall, step, stats) in enumerate(self.cprofiles):
+            profileFile = '%s.%i.%s.prof' % (os.path.splitext(fileName)[0], i+1, re.sub(r'\W', '_', step))
+            with open(profileFile, 'wb') as f:
+                marshal.dump(stats, f)
+            logging.info('Profile of step \'%s\' (%.1f s) written in: %s' % (step, wall, profileFile))
+
+
+def runStep(parser, step, H, op, soltabNames=None, profiler=None):
+    """
+    Run a step on the soltabs it selects
+
+    Parameters
+    ----------
+    parser : parser obj
+        configuration file
+
+    step : str
+        current step
+
+    H : h5parm obj
+        the h5parm object
+
+    op : module
+        the operation module
+
+    soltabNames : list, optional
+        "solset/soltab" names of the soltabs to use, by default the ones selected by the step
+
+    profiler : StepProfiler obj, optional
+        to measure the step and each soltab, by default None
+
+    Returns
+    -------
+    int
+        return code of the step
+    """
+    import losoto.operations as operations
+
+    operation = parser.getstr(step, 'operation')
+    def measure(soltab=''):
+        if profiler is None: return contextlib.nullcontext()
+        return profiler.measure(step, operation, soltab)
+
+    returncode = 0
+    with operations.timer(logging, step, operation), measure():
+        # global+local selection on axes are applied by this function
+        for soltab in getStepSoltabs(parser, step, H, soltabNames):
+            with measure(soltab.getAddress()):
+                returncode += op._run_parser( soltab, parser, step )
+        if returncode != 0:
+           logging.error("Step \'" + step + "\' incomplete. Try to continue anyway.")
+        else:
+           logging.info("Step \'" + step + "\' completed successfully.")
+
+    return returncode
+
+
+def _initStepWorker(logLevel, iterMaxMemory, maxCacheMemory):
+    """
+    Set up a worker process of runSteps() as the main process
+    """
+    # importing _logging sets the colored format of the main process (spawned workers start without it)
+    from losoto import _logging
+    from losoto.h5parm import Soltab, cacheManager
+    _logging.setLevel(logging.getLevelName(logLevel).lower())
+    Soltab.iterMaxMemory = iterMaxMemory
+    cacheManager.maxMemory = maxCacheMemory
+
+
+def _runStepWorker(h5parmFile, parsetFile, step, opModule, soltabNames, cprofileSteps=None):
+    """
+    Run a step in a worker process of runSteps(), on the temporary h5parm with the job soltabs.
+    Returns the step return code, and its StepProfiler records and cProfile stats if cprofileSteps is not None.
+    """
+    import importlib
+    from losoto.h5parm import h5parm
+
+    op = importlib.import_module(opModule)
+    parser = LosotoParser(parsetFile)
+    profiler = None
+    if cprofileSteps is not None: profiler = StepProfiler(cprofileSteps)
+    H = h5parm(h5parmFile, readonly=False)
+    try:
+        returncode = runStep(parser, step, H, op, soltabNames, profiler)
+    finally:
+        H.close()
+    if profiler is None: return returncode, [], []
+    return returncode, profiler.records, profiler.cprofiles
+
+
+def _copyStepSoltabs(H, names, h5parmFile):
+    """
+    Copy the soltabs (names from getStepIO()) of H, with their solset tables, in a new h5parm
+    """
+    from losoto.h5parm import h5parm
+
+    T = h5parm(h5parmFile, readonly=False)
+    try:
+        for solsetName, soltabsInfo in H.getCatalog().items():
+            if '' in names or solsetName+'/' in names:
+                H.getSolset(solsetName).copy(T)
+            else:
+                soltabNames = [soltabName for soltabName in soltabsInfo if solsetName+'/'+soltabName in names]
+                if soltabNames != []:
+                    H.getSolset(solsetName).copy(T, soltabNames=soltabNames)
+    finally:
+        T.close()
+
+
+def _mergeStepSoltabs(H, names, h5parmFile):
+    """
+    Write back in H the soltabs (names from getStepIO()) of an h5parm made by _copyStepSoltabs():
+    soltabs are written in place (see h5parm._updateSoltab()), the created ones are copied and the deleted ones removed
+    """
+    from losoto.h5parm import h5parm, _updateSoltab, _updateSolset
+
+    T = h5parm(h5parmFile, readonly=True)
+    try:
+        if '' in names:
+            names = set(name+'/' for name in set(H.getSolsetNames()) | set(T.getSolsetNames()))
+        for name in sorted(names):
+            solsetName, soltabName = name.split('/')
+            if not solsetName in T.getSolsetNames():
+                if solsetName in H.getSolsetNames():
+                    if soltabName == '': H.getSolset(solsetName).delete()
+                    elif soltabName in H.getSolset(solsetName).getSoltabNames():
+                        H.getSolset(solsetName).getSoltab(soltabName).delete()
+                continue
+            if not solsetName in H.getSolsetNames():
+                if soltabName == '': T.getSolset(solsetName).copy(H)
+                continue
+
+            solset = H.getSolset(solsetName)
+            source = T.getSolset(solsetName)
+            if soltabName == '':
+                _updateSolset(solset, source)
+                soltabNames = sorted(set(solset.getSoltabNames()) | set(source.getSoltabNames()))
+            else:
+                soltabNames = [soltabName]
+            for soltabName in soltabNames:
+                inH = soltabName in solset.getSoltabNames()
+                inT = soltabName in source.getSoltabNames()
+                if inH and inT and _updateSoltab(solset.getSoltab(soltabName), source.getSoltab(soltabName)):
+                    continue
+                if inH: solset.getSoltab(soltabName).delete()
+                if inT: source.getSoltab(soltabName).copy(soltabName, solset)
+    finally:
+        T.close()
+
+
+def _getStepJobs(parser, step, H):
+    """
+    Split a step of runSteps() in one job per selected soltab
+    """
+    jobs = []
+    for k, name in enumerate(getStepSoltabNames(parser, step['name'], H)):
+        job = {'name': step['name'], 'index': step['index']+(k,), 'op': step['op'], 'ncpu': step['ncpu'], \
+                'scope': set([name.split('/')[0]+'/']), 'soltabs': [name]}
+        job['reads'], job['writes'] = getStepIO(parser, step['name'], H, [name])
+        jobs.append(job)
+    return jobs
+
+
+def runSteps(parser, steps, H, ops, ncpu=1, resume=False, checkpoint=False, profiler=None):
+    """
+    Run the steps of a parset, running at the same time the ones that do not depend on each other.
+
+    A step waits for the previous steps (see getStepIO()) writing the soltabs it reads or writes and
+    reading the soltabs it writes. Then it is split in one job per selected soltab, ordered in the same way,
+    each running in a worker process on a temporary h5parm with a copy of its soltabs. The soltabs a job writes
+    are written back in place in H when it ends, by this process only: HDF5 files cannot be written by more processes.
+    The results are the same as running the steps one after the other.
+    Jobs of steps creating soltabs (structureSteps) run one after the other in the same solset, as the names
+    of the new soltabs depend on the previous ones. When a single job can run, and no other is running,
+    it runs directly on H.
+
+    With ncpu=1 the steps run one after the other on H, a cached soltab (see cacheSteps) is written back only
+    before a step reading it from disk, or after the last step using it. With checkpoint, once the results of a step
+    are in the file its checkpoint is added to H (see h5parm.getCheckpoints()): the hashes of its operation and options,
+    of the soltabs it reads or writes before it runs and of the soltabs it writes after. With resume, the steps that ran
+    with the same options on the same data are skipped, the soltabs must be as the checkpointed steps left them.
+    If a step raises an exception the results of the completed steps are written back with their checkpoints,
+    the changes of the failing step to the soltabs it read from the cache are discarded.
+
+    Parameters
+    ----------
+    parser : parser obj
+        configuration file
+
+    steps : list
+        steps to run, in parset order
+
+    H : h5parm obj
+        the h5parm object
+
+    ops : dict
+        operation modules by operation name
+
+    ncpu : int, optional
+        max number of processes, by default 1 (steps are run one after the other), 0 for all the cpus available to the process.
+        Steps in multiprocSteps use [_global] ncpu processes.
+
+    resume : bool, optional
+        skip the steps already run, by default False (all steps are run and previous checkpoints removed).
+        Implies checkpoint.
+
+    checkpoint : bool, optional
+        add the checkpoints of the steps to H, by default False (soltabs are not hashed).
+
+    profiler : StepProfiler obj, optional
+        to measure the steps, also the ones running in worker processes, by default None.
+
+    Returns
+    -------
+    int
+        sum of the steps return codes
+    """
+    import multiprocessing, tempfile, shutil, queue, gc
+    from losoto.h5parm import Soltab, SwmrFile, cacheManager
+
+    if ncpu == 0: ncpu = _getCpuCount()
+
+    # checkpoints cannot be written in SWMR mode
+    writable = H.H.mode != 'r' and not isinstance(H.H, SwmrFile)
+    checkpoint = (checkpoint or resume) and writable
+    start = 0
+    if resume:
+        start = _getResumeStep(parser, steps, H)
+        for step in steps[:start]:
+            logging.info('Step \'%s\' skipped, already run on the same data.' % step)
+        steps = steps[start:]
+    elif writable:
+        H.clearCheckpoints() # they would not match the new data
+
+    returncode = 0
+    if ncpu == 1:
+        # consecutive cached steps on the same soltabs work on the same cached data, written back once after the last;
+        # SWMR readers see the results of each step
+        deferFlush = cacheManager.deferFlush
+        cacheManager.deferFlush = not isinstance(H.H, SwmrFile)
+        kept = []
+        hashes = {}
+        checkpoints = []
+        loaded = [] # soltabs the running step reads from the cache
+        try:
+            for i, step in enumerate(steps):
+                loaded = _getStepCachedNames(parser, step, H)
+                if checkpoint:
+                    reads, writes = getStepIO(parser, step, H)
+                    writtenNames = _getSoltabNames(H, writes)
+                    thisCheckpoint = {'step': step, 'operation': parser.getstr(step, 'operation'), \
+                            'params': _getStepParamsHash(parser, step), \
+                            'inputs': _getSoltabHashes(H, _getSoltabNames(H, reads | writes), hashes, _getStepCachedNames(parser, step, H))}
+
+                stepReturncode = runStep(parser, step, H, ops[parser.getstr(step, 'operation')], profiler=profiler)
+                returncode += stepReturncode
+                loaded = []
+                kept = _getKeptCachedNames(parser, steps, i, H, set(kept) | set(_getStepCachedNames(parser, step, H)))
+                cacheManager.flushFile(H.H, ['/'+name for name in kept])
+
+                if checkpoint:
+                    # incomplete steps are run again when resuming, and so the following ones
+                    if stepReturncode == 0:
+                        for name in writtenNames: hashes.pop(name, None)
+                        writtenNames = set(writtenNames) | set(_getSoltabNames(H, writes)) # soltabs may be created/deleted
+                        thisCheckpoint['outputs'] = dict((name, None) for name in writtenNames)
+                        thisCheckpoint['outputs'].update(_getSoltabHashes(H, _getSoltabNames(H, writtenNames), hashes))
+                        checkpoints.append(thisCheckpoint)
+                    else:
+                        checkpoint = False
+                # a checkpoint is added when the results of its step are in the file
+                while checkpoints != [] and not set(checkpoints[0]['outputs']) & set(kept):
+                    H.addCheckpoint(checkpoints.pop(0))
+                H.H.flush()
+                gc.collect()
+        except:
+            # the completed steps are not lost: their results kept in the cache are written back, while the
+            # changes of the failing step to the soltabs it loaded are discarded
+            for name in _getSoltabNames(H, set(loaded) - set(kept)):
+                solsetName, soltabName = name.split('/')
+                soltab = H.getSolset(solsetName).getSoltab(soltabName)
+                cacheManager.drop(soltab._getNode())
+                cacheManager.drop(soltab._getNode(weight=True))
+            cacheManager.flushFile(H.H)
+            # with their checkpoints, if the failing step did not modify their outputs
+            hashes = {}
+            while checkpoints != [] and _getCurrentHashes(H, checkpoints[0]['outputs'], hashes) == checkpoints[0]['outputs']:
+                H.addCheckpoint(checkpoints.pop(0))
+            raise
+        finally:
+            cacheManager.deferFlush = deferFlush
+        return returncode
+
+    if checkpoint and steps != []:
+        logging.info('Checkpoints are written only when steps run one after the other.')
+        if resume: H.clearCheckpoints()
+
+    # steps are split in jobs when they can start, the soltabs they select are known only then
+    pending = [{'name': step, 'index': (i,), 'op': parser.getstr(step, 'operation').lower(), \
+            'scope': _getStepScope(parser, step), 'ncpu': _getStepNcpu(parser, step, ncpu), 'soltabs': None} \
+            for i, step in enumerate(steps)]
+    for step in pending:
+        step['reads'], step['writes'] = getStepIO(parser, step['name'], H)
+    running = []
+    changed = False # soltabs created/deleted by a step
+    results = queue.Queue()
+    pool = None
+    tmpDir = tempfile.mkdtemp(prefix='losoto_', dir=os.path.dirname(os.path.abspath(H.fileName)))
+
+    try:
+        while pending != [] or running != []:
+            # the selections change only when soltabs are created/deleted
+            if changed:
+                for step in pending:
+                    if step['soltabs'] is None:
+                        step['reads'], step['writes'] = getStepIO(parser, step['name'], H)
+                changed = False
+            ready = []
+            i = 0
+            while i < len(pending):
+                job = pending[i]
+                earlier = pending[:i] + [j for j in running if j['index'] < job['index']]
+                if not any(_stepsConflict(j, job) for j in earlier):
+                    if job['soltabs'] is None:
+                        jobs = _getStepJobs(parser, job, H)
+                        if jobs == []:
+                            # nothing to do, report it
+                            pending.remove(job)
+                            returncode += runStep(parser, job['name'], H, ops[parser.getstr(job['name'], 'operation')], profiler=profiler)
+                            changed = changed or job['op'] in structureSteps
+                        else:
+                            pending[i:i+1] = jobs
+                        continue
+                    ready.append(job)
+                i += 1
+
+            if running == [] and len(ready) == 1:
+                job = ready[0]
+                pending.remove(job)
+                returncode += runStep(parser, job['name'], H, ops[parser.getstr(job['name'], 'operation')], job['soltabs'], profiler)
+                changed = changed or job['op'] in structureSteps
+                gc.collect()
+                continue
+
+            usedNcpu = sum(j['ncpu'] for j in running)
+            for job in ready:
+                if running != [] and usedNcpu + job['ncpu'] > ncpu: continue
+                if pool is None:
+                    pool = multiprocessing.get_context('spawn').Pool(ncpu, _initStepWorker, \
+                            (logging.root.level, Soltab.iterMaxMemory, cacheManager.maxMemory))
+                job['file'] = os.path.join(tmpDir, 'step'+'-'.join('%03i' % n for n in job['index'])+'.h5')
+                _copyStepSoltabs(H, job['reads'] | job['writes'], job['file'])
+                logging.info('Starting step \'%s\' on %s in a worker process.' % (job['name'], job['soltabs'][0]))
+                pool.apply_async(_runStepWorker, (job['file'], parser.parsetFile, job['name'], \
+                        ops[parser.getstr(job['name'], 'operation')].__name__, job['soltabs'], \
+                        None if profiler is None else profiler.cprofileSteps), \
+                        callback=lambda rc, job=job: results.put((job, rc, None)), \
+                        error_callback=lambda e, job=job: results.put((job, None, e)))
+                pending.remove(job)
+                running.append(job)
+                usedNcpu += job['ncpu']
+
+            # wait for a job to end and copy back its results
+            while running != []:
+                job, rc, e = results.get()
+                running.remove(job)
+                if e is not None:
+                    logging.critical('Step \'%s\' failed on %s.' % (job['name'], job['soltabs'][0]))
+                    raise e
+                rc, records, cprofiles = rc
+                if profiler is not None:
+                    profiler.records += records
+                    profiler.addCprofiles(cprofiles)
+                _mergeStepSoltabs(H, job['writes'], job['file'])
+                changed = changed or job['op'] in structureSteps
+                os.remove(job['file'])
+                returncode += rc
+                if results.empty(): break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+    return returncode
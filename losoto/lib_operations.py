@@ -131,7 +131,7 @@ def removeKeys( dic, keys = [] ):
     return dicCopy
 
 
-def normalize_phase(phase):
+def normalize_phase(phase, out=None):
     """
     Normalize phase to the range [-pi, pi].
     
@@ -139,6 +139,8 @@ def normalize_phase(phase):
     ----------
     phase : array of float
         Phase to normalize.
+    out : array of float, optional
+        Array where the result is stored, can be phase itself to normalize in place. By default a new array.
     
     Returns
     -------
@@ -147,13 +149,8 @@ def normalize_phase(phase):
     """
 
     # Convert to range [-2*pi, 2*pi].
-    out = np.fmod(phase, 2.0 * np.pi)
-    # Remove nans
-    nans = np.isnan(out)
-    np.putmask(out, nans, 0)
-    # Convert to range [-pi, pi]
-    out[out < -np.pi] += 2.0 * np.pi
-    out[out > np.pi] -= 2.0 * np.pi
-    # Put nans back
-    np.putmask(out, nans, np.nan)
+    out = np.fmod(phase, 2.0 * np.pi, out=out)
+    # Convert to range [-pi, pi], nans are left as they are (comparisons are False)
+    np.add(out, 2.0 * np.pi, out=out, where=(out < -np.pi))
+    np.subtract(out, 2.0 * np.pi, out=out, where=(out > np.pi))
     return out
@@ -1,9 +1,9 @@
-import os, time, glob
+import os, time, glob, logging
 
 __all__ = [ os.path.basename(f)[:-3] for f in glob.glob(os.path.dirname(__file__)+"/*.py") if f[0] != '_']
 
 for x in __all__:
-    __import__(x, locals(), globals())
+    __import__(x, globals(), locals(), [], 1)
 
 class timer(object):
     """
@@ -23,10 +23,13 @@ class timer(object):
     def __enter__(self):
         self.log.info("--> Starting \'" + self.step + "\' step (operation: " + self.operation + ").")
         self.start = time.time()
-        self.startcpu = time.clock()
+        self.startcpu = os.times()
 
     def __exit__(self, exit_type, value, tb):
 
         # if not an error
         if exit_type is None:
-            self.log.info("Time for this step: %i s (cpu: %i s)." % ( ( time.time() - self.start), (time.clock() - self.startcpu) ))
+            # cpu of the child processes (e.g. multiprocManager) is known once they have ended
+            cpu = os.times()
+            self.log.info("Time for this step: %i s (cpu: %i s, children cpu: %i s)." % ( ( time.time() - self.start), \
+                    (cpu[0] + cpu[1] - self.startcpu[0] - self.startcpu[1]), (cpu[2] + cpu[3] - self.startcpu[2] - self.startcpu[3]) ))
@@ -25,10 +25,15 @@ def run( soltab, soltabOut=''):
     if soltabOut == '':
         soltabOut = None
 
-    solset = soltab.getSolset()
-    soltabout = solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabOut, axesNames=soltab.getAxesNames(), \
-        axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
-        vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False))
+    if all(isinstance(sel, slice) and sel == slice(None) for sel in soltab.selection):
+        # whole table: copied on disk without loading the data
+        soltabout = soltab.copy(soltabOut)
+    else:
+        solset = soltab.getSolset()
+        soltabout = solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabOut, axesNames=soltab.getAxesNames(), \
+            axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
+            vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False), \
+            valDtype=soltab.getDtype(), weightDtype=soltab.getDtype(weight = True))
     # parmdbType=soltab.obj._v_attrs['parmdb_type'] # deprecated
 
     logging.info('Duplicate %s -> %s' % (soltab.name, soltabout.name) )
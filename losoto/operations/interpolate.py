@@ -163,7 +163,8 @@ def run( soltab, outsoltab, axisToRegrid, newdelta, delta='', maxFlaggedWidth=0)
         else:
             axesVals.append(soltab.getAxisValues(axisName))
     s = solset.makeSoltab(soltab.getType(), outsoltab,
-        axesNames=soltab.getAxesNames(), axesVals=axesVals, vals=new_vals, weights=new_weights)
+        axesNames=soltab.getAxesNames(), axesVals=axesVals, vals=new_vals, weights=new_weights,
+        valDtype=soltab.getDtype())
     s.addHistory('CREATE by INTERPOLATE operation from '+soltab.name+'.')
 
     return 0
@@ -69,7 +69,8 @@ def run( soltab, soltabOut='phasediff', maxResidual=1., fitOffset=False, average
     solset = soltab.getSolset()
     soltabout = solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabOut, axesNames=soltab.getAxesNames(), \
                       axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
-                      vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False))
+                      vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False), \
+                      valDtype=soltab.getDtype(), weightDtype=soltab.getDtype(weight = True))
     soltabout.addHistory('Created by POLALIGN operation from %s.' % soltab.name)
 
     if 'XX' in soltab.getAxisValues('pol'): pol = 'XX'
@@ -31,25 +31,30 @@ def run( soltab, soltabOutG=None, soltabOutD=None):
     if soltab.getType() != 'amplitude' and soltab.getType() != 'phase':
         logging.error('SPLITLEAK can work only on amplitude/phase soltabs. Found: %s.' % soltab.getType())
         return 1
-    if soltab.getAxisValues('pol') != ['XX', 'XY', 'YX', 'YY']:
+    if list(soltab.getAxisValues('pol')) != ['XX', 'XY', 'YX', 'YY']:
         logging.error('Pol in unusual order, not implemented.')
         return 1
 
     solset = soltab.getSolset()
 
+    def duplicate(soltabName):
+        if all(isinstance(sel, slice) and sel == slice(None) for sel in soltab.selection):
+            # whole table: copied on disk without loading the data
+            return soltab.copy(soltabName)
+        return solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabName, axesNames=soltab.getAxesNames(), \
+            axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
+            vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False), \
+            valDtype=soltab.getDtype(), weightDtype=soltab.getDtype(weight = True))
+
     ### G component
-    soltabOutG = solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabOutG, axesNames=soltab.getAxesNames(), \
-        axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
-        vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False))
+    soltabOutG = duplicate(soltabOutG)
 
     # set offdiag to 0
     soltabOutG.setSelection( pol=['XY','YX'] )
     soltabOutG.setValues( 0. )
 
     ### D component
-    soltabOutD = solset.makeSoltab(soltype = soltab.getType(), soltabName = soltabOutD, axesNames=soltab.getAxesNames(), \
-        axesVals=[soltab.getAxisValues(axisName) for axisName in soltab.getAxesNames()], \
-        vals=soltab.getValues(retAxesVals = False), weights=soltab.getValues(weight = True, retAxesVals = False))
+    soltabOutD = duplicate(soltabOutD)
 
     # divide offdiag by diag, then set diag to 1 (see Hamaker+ 96, appendix D)
     soltabOutD.setSelection(pol=['XX','YY'])
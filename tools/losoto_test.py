@@ -117,6 +117,12 @@ for matrix, coord, sel in st.getValuesIter(returnAxes=['axis2','axis3']):
     i += 1
 print(matrix.shape)
 print("Iterations:", i, "(expected: 2)")
+logging.info('Get Vaues Iter in blocks (exp: 2x4=8)')
+i=0
+for matrix, coord, sel in st.getValuesIter(returnAxes=['axis3'], maxMemory=100*8):
+    i += 1
+print(matrix.shape)
+print("Iterations:", i, "(expected: 2x4=8)")
 
 
 print("###########################################")
@@ -3,7 +3,6 @@
 
 from losoto.h5parm import h5parm
 import argparse
-import tables
 
 def soltab_swap_freq_time(soltab):
     """Swap the frequency and time axes to make the frequency the fastest varying axis
@@ -13,14 +12,7 @@ def soltab_swap_freq_time(soltab):
     soltab : Soltab
         Soltab object which will be changed
     """
-    vals = soltab.getValues(retAxesVals = False)
-    weights = soltab.getValues(weight=True, retAxesVals=False)
-
-    if vals.shape != weights.shape:
-        raise RuntimeError("Shape of weights differs from shape of values")
-
     axesnames = soltab.getAxesNames()
-    axesnums = list(range(len(axesnames)))
 
     if 'freq' not in axesnames or 'time' not in axesnames:
         print("Nothing to be done, no freq + time axes in " + soltab.name)
@@ -33,30 +25,11 @@ def soltab_swap_freq_time(soltab):
         print("Nothing to be done, freq already varies fastest in " + soltab.name)
         return
 
-    # Swap the time and frequency axis in the axes names and numbers
-    axesnums[freqindex], axesnums[timeindex] = axesnums[timeindex], axesnums[freqindex]
+    # Swap the time and frequency axis in the axes names
     axesnames[freqindex], axesnames[timeindex] = axesnames[timeindex], axesnames[freqindex]
 
-    # Swap the axes order in the metadata
-    soltab.obj.val._f_setattr("AXES", ",".join(axesnames))
-    # Transpose the values
-    vals = vals.transpose(axesnums)
-    weights = weights.transpose(axesnums)
-
-    # Need to remove the array from the file because changing shape is not supported by pytables
-    # Store the attributes in a dict
-    attrs = soltab.obj.val._v_attrs
-    attrsdict = {}
-    for attrname in attrs._f_list():
-        attrsdict[attrname] = attrs[attrname]
-    soltab.obj.val._f_remove()
-    soltab.obj.weight._f_remove()
-    # Create new val here
-    soltab.obj._v_file.create_array(soltab.obj._v_pathname, 'val', obj=vals, atom=tables.Float64Atom())
-    soltab.obj._v_file.create_array(soltab.obj._v_pathname, 'weight', obj=weights, atom=tables.Float16Atom())
-    # Restore the original attributes
-    for attrname in attrsdict:
-        soltab.obj.val._f_setattr(attrname, attrsdict[attrname])
+    # Transpose values and weights on disk, in blocks, keeping dtypes and attributes
+    soltab.relayout(axesnames)
 
     soltab.addHistory("Swap frequency and time axes to make frequency vary fastest")
 
@@ -78,7 +51,7 @@ def h5parm_swap_freq_time(h5parmname, solset='sol000', soltab='all'):
     """
     
     h5 = h5parm(h5parmname, False)
-    solset = h5.getSolset('sol000')
+    solset = h5.getSolset(solset)
 
     if soltab=='all':
         soltabnames = solset.getSoltabNames()
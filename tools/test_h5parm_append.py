@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestAppend(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.h5fname = os.path.join(self.tmpdir, 'test.h5')
+      np.random.seed(0)
+      self.axesNames = ['ant', 'time', 'freq']
+      self.axesVals = [['CS001', 'CS002', 'RS106'], np.arange(60.), np.arange(5.)*1e6+1e8]
+      self.vals = np.random.rand(3, 60, 5)
+      self.vals[1, 10:15, 2] = np.nan
+      self.weights = (np.random.rand(3, 60, 5) > 0.2).astype(float)
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def makeSoltabs(self, extendableAxis, blocks, **kwargs):
+      # the same data written at once and appended in blocks along the extendable axis
+      h5 = h5parm(self.h5fname, readonly=False)
+      solset = h5.makeSolset('sol000')
+      whole = solset.makeSoltab(soltype='phase', soltabName='whole', axesNames=self.axesNames, axesVals=self.axesVals,
+                                vals=self.vals, weights=self.weights, **kwargs)
+      extIdx = self.axesNames.index(extendableAxis)
+      axesVals = list(self.axesVals)
+      axesVals[extIdx] = np.array(self.axesVals[extIdx])[:blocks[0]]
+      first = tuple(slice(0, blocks[0]) if i == extIdx else slice(None) for i in range(3))
+      appended = solset.makeSoltab(soltype='phase', soltabName='appended', axesNames=self.axesNames, axesVals=axesVals,
+                                   vals=self.vals[first], weights=self.weights[first], extendableAxis=extendableAxis, **kwargs)
+      for start, stop in zip(blocks[:-1], blocks[1:]):
+          block = tuple(slice(start, stop) if i == extIdx else slice(None) for i in range(3))
+          appended.append(self.vals[block], self.weights[block], np.array(self.axesVals[extIdx])[start:stop])
+      return h5, whole, appended
+
+    def assertSameSoltab(self, whole, appended):
+      for axis in self.axesNames:
+          self.assertTrue(np.array_equal(appended.getAxisValues(axis), whole.getAxisValues(axis)), axis)
+      self.assertTrue(np.array_equal(appended.getValues(retAxesVals=False), whole.getValues(retAxesVals=False), equal_nan=True))
+      self.assertTrue(np.array_equal(appended.getValues(retAxesVals=False, weight=True), whole.getValues(retAxesVals=False, weight=True)))
+      for sel in [{'ant': 'RS106'}, {'time': {'min': 25, 'max': 45}}, {'ant': ['CS001', 'RS106'], 'freq': 1.02e8}]:
+          appended.setSelection(**sel)
+          whole.setSelection(**sel)
+          self.assertTrue(np.array_equal(appended.getValues(retAxesVals=False), whole.getValues(retAxesVals=False), equal_nan=True))
+      appended.clearSelection()
+      whole.clearSelection()
+
+    def assertSameStats(self, whole, appended):
+      # the stats updated at each append are the ones of the whole data
+      stats = appended.getStats()
+      for expected in [whole.getStats(), appended.getStats(recompute=True)]:
+          self.assertEqual(stats['flagged'], expected['flagged'])
+          self.assertEqual(stats['nan'], expected['nan'])
+          self.assertAlmostEqual(stats['sum'], expected['sum'])
+          self.assertAlmostEqual(stats['min'], expected['min'])
+          self.assertAlmostEqual(stats['max'], expected['max'])
+          for axis in self.axesNames:
+              self.assertTrue(np.array_equal(stats['flagged_'+axis], expected['flagged_'+axis]), axis)
+
+    def test_append_time(self):
+      h5, whole, appended = self.makeSoltabs('time', [0, 1, 20, 21, 60])
+      self.assertEqual(appended.getAxisLen('time'), 60)
+      self.assertSameSoltab(whole, appended)
+      self.assertSameStats(whole, appended)
+      h5.close()
+
+      # stored stats
+      h5 = h5parm(self.h5fname, readonly=True)
+      solset = h5.getSolset('sol000')
+      whole, appended = solset.getSoltab('whole'), solset.getSoltab('appended')
+      self.assertEqual(h5.getCatalog()['sol000']['appended']['axesLens'], [3, 60, 5])
+      self.assertSameSoltab(whole, appended)
+      self.assertSameStats(whole, appended)
+      h5.close()
+
+    def test_append_string_axis(self):
+      h5, whole, appended = self.makeSoltabs('ant', [1, 2, 3])
+      self.assertEqual(list(appended.getAxisValues('ant')), self.axesVals[0])
+      self.assertSameSoltab(whole, appended)
+      self.assertSameStats(whole, appended)
+      # one axis value for each appended element
+      self.assertRaises(Exception, appended.append, self.vals[:1], self.weights[:1], ['CS001', 'CS002'])
+      h5.close()
+
+    def test_append_packed(self):
+      h5, whole, appended = self.makeSoltabs('time', [0, 7, 30, 60], weightDtype='bit')
+      self.assertSameSoltab(whole, appended)
+      self.assertSameStats(whole, appended)
+      h5.close()
+
+    def test_not_extendable(self):
+      h5, whole, appended = self.makeSoltabs('time', [0, 60])
+      self.assertRaises(Exception, whole.append, self.vals[:, :1], self.weights[:, :1], [100.])
+      self.assertRaises(Exception, appended.append, self.vals[:2, :1], self.weights[:2, :1], [100.])
+      self.assertEqual(appended.getAxisLen('time'), 60)
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
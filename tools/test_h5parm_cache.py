@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm, cacheManager, _getAvailableMemory
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestCacheManager(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.maxMemory = cacheManager.maxMemory
+      np.random.seed(0)
+      self.vals = {}
+      self.h5 = h5parm(os.path.join(self.tmpdir, 'test.h5'), readonly=False)
+      solset = self.h5.makeSolset("sol000")
+      for k in range(4):
+          self.vals[k] = np.random.rand(4, 100, 50)
+          solset.makeSoltab(soltype="phase", soltabName="phase%03i" % k, axesNames=["ant", "time", "freq"],
+                            axesVals=[['CS%03i' % i for i in range(4)], np.arange(100.), np.arange(50.)],
+                            vals=self.vals[k], weights=np.ones_like(self.vals[k]))
+
+    def tearDown(self):
+      import shutil
+      cacheManager.maxMemory = self.maxMemory
+      cacheManager.clear(self.h5.H, writeBack=False)
+      self.h5.close()
+      shutil.rmtree(self.tmpdir)
+
+    def test_default_budget(self):
+      # bounded unless set to None explicitly
+      if _getAvailableMemory() is not None:
+          self.assertTrue(0 < self.maxMemory < _getAvailableMemory())
+
+    def test_bounded(self):
+      # room for two soltabs (val+weight) at a time
+      tableBytes = self.vals[0].nbytes
+      cacheManager.maxMemory = 4 * tableBytes
+      solset = self.h5.getSolset("sol000")
+      for k in range(4):
+          soltab = solset.getSoltab("phase%03i" % k, useCache=True)
+          soltab.setValues(soltab.getValues(retAxesVals=False) + k)
+          self.assertTrue(cacheManager.size <= cacheManager.maxMemory)
+      cacheManager.flushFile(self.h5.H)
+      for k in range(4):
+          soltab = solset.getSoltab("phase%03i" % k)
+          self.assertTrue(np.allclose(soltab.getValues(retAxesVals=False), self.vals[k] + k))
+
+    def test_too_large(self):
+      # soltabs larger than the budget are read and written directly
+      cacheManager.maxMemory = self.vals[0].nbytes
+      soltab = self.h5.getSolset("sol000").getSoltab("phase000", useCache=True)
+      soltab.setValues(soltab.getValues(retAxesVals=False) * 2)
+      self.assertEqual(cacheManager.peek(soltab._getNode()), None)
+      self.assertTrue(np.allclose(soltab.obj.val[:], self.vals[0] * 2))
+
+if __name__ == '__main__':
+    unittest.main()
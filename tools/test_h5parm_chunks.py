@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm, _chunkShape
+import tables
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestChunkedStorage(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      self.axesNames = ['time', 'freq', 'ant', 'pol']
+      self.axesVals = [np.arange(500.), np.arange(30.)*1e6+1e8, ['CS%03i' % i for i in range(10)], ['XX', 'YY']]
+      self.vals = np.random.rand(500, 30, 10, 2)
+      self.weights = (np.random.rand(500, 30, 10, 2) > 0.2).astype(float)
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def makeSoltab(self, name, complevel=0, **kwargs):
+      h5 = h5parm(os.path.join(self.tmpdir, name), readonly=False, complevel=complevel)
+      soltab = h5.makeSolset('sol000').makeSoltab('phase', 'phase000', axesNames=self.axesNames, axesVals=self.axesVals,
+                                                 vals=self.vals, weights=self.weights, **kwargs)
+      return h5, soltab
+
+    def test_chunk_shape(self):
+      # the contiguous axis (time by default) is whole in the chunk, then the fastest varying axes, ant/dir last
+      shape = (5000, 30, 10, 2)
+      chunk = _chunkShape(shape, 8, self.axesNames)
+      self.assertEqual(chunk, (5000, 3, 1, 2))
+      chunk = _chunkShape(shape, 8, self.axesNames, contiguousAxis='freq')
+      self.assertEqual(chunk, (546, 30, 1, 2))
+      # limited by the chunk size, small arrays fit in a chunk
+      for shape in [(5000, 30, 10, 2), (100000, 3, 2, 2), (5, 3, 2, 2)]:
+          chunk = _chunkShape(shape, 8, self.axesNames)
+          self.assertTrue(all(1 <= c <= n for c, n in zip(chunk, shape)))
+          self.assertTrue(np.prod(chunk) * 8 <= 2**18)
+      self.assertEqual(_chunkShape((5, 3, 2, 2), 8, self.axesNames), (5, 3, 2, 2))
+
+    def test_uncompressed(self):
+      # contiguous arrays unless a chunk shape is given
+      h5, soltab = self.makeSoltab('plain.h5')
+      self.assertFalse(isinstance(soltab.obj.val, tables.CArray))
+      self.assertEqual(soltab.obj.val.chunkshape, None)
+      h5.close()
+      h5, soltab = self.makeSoltab('chunked.h5', chunkShape=[100, 30, 1, 2])
+      for node in [soltab.obj.val, soltab.obj.weight]:
+          self.assertTrue(isinstance(node, tables.CArray))
+          self.assertEqual(node.chunkshape, (100, 30, 1, 2))
+          self.assertEqual(node.filters.complevel, 0)
+      h5.close()
+
+    def test_compressed(self):
+      # compression of the h5parm, chunk shape guessed
+      h5, soltab = self.makeSoltab('compressed.h5', complevel=5)
+      for node in [soltab.obj.val, soltab.obj.weight]:
+          self.assertTrue(isinstance(node, tables.CArray))
+          self.assertEqual(node.chunkshape, _chunkShape(self.vals.shape, 8, self.axesNames))
+          self.assertEqual(node.filters.complevel, 5)
+          self.assertEqual(node.filters.complib, 'zlib')
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), self.vals))
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True), self.weights))
+      self.assertTrue(soltab.obj.val.size_on_disk < self.vals.nbytes)
+      h5.close()
+
+      # compression of the soltab, bit-packed weights have chunks of whole bytes on the last axis
+      h5, soltab = self.makeSoltab('soltab.h5', complevel=1, complib='blosc', contiguousAxis='freq', weightDtype='bit')
+      chunk = _chunkShape(self.vals.shape, 8, self.axesNames, contiguousAxis='freq')
+      self.assertEqual(soltab.obj.val.chunkshape, chunk)
+      self.assertEqual(soltab.obj.weight.chunkshape, chunk[:-1] + (1,))
+      for node in [soltab.obj.val, soltab.obj.weight]:
+          self.assertEqual(node.filters.complevel, 1)
+          self.assertEqual(node.filters.complib, 'blosc')
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True), self.weights))
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm, FlagPlane
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestFlagPlane(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      self.h5 = h5parm(os.path.join(self.tmpdir, 'test.h5'), readonly=False)
+      self.solset = self.h5.makeSolset("sol000")
+
+    def tearDown(self):
+      import shutil
+      self.h5.close()
+      shutil.rmtree(self.tmpdir)
+
+    def makeSoltabs(self, nfreq):
+      # the same weights as float16 and bit-packed, freq (packed axis) of any length
+      vals = np.random.rand(4, 30, nfreq)
+      weights = np.random.rand(4, 30, nfreq)
+      weights[weights < 0.3] = 0
+      soltabs = []
+      for weightDtype in ['f16', 'bit']:
+          soltabs.append(self.solset.makeSoltab(soltype="phase", soltabName="%s%i" % (weightDtype, nfreq),
+                                                axesNames=["ant", "time", "freq"],
+                                                axesVals=[['CS%03i' % i for i in range(4)], np.arange(30.), np.arange(nfreq)*1e6],
+                                                vals=vals, weights=weights, weightDtype=weightDtype))
+      return soltabs, weights
+
+    def assertSameFlags(self, soltab, packed):
+      soltab.clearSelection()
+      packed.clearSelection()
+      flags = soltab.getValues(retAxesVals=False, weight=True) == 0
+      # unflagged data have weight 1
+      self.assertTrue(np.array_equal(packed.getValues(retAxesVals=False, weight=True), (~flags).astype(float)))
+      self.assertTrue(np.array_equal(packed.getFlags(), flags))
+      self.assertEqual(packed.countFlagged(), np.count_nonzero(flags))
+      self.assertEqual(packed.getStats()['flagged'], np.count_nonzero(flags))
+      self.assertEqual(packed.getStats(recompute=True)['flagged'], np.count_nonzero(flags))
+
+    def test_round_trip(self):
+      for nfreq in [1, 7, 8, 13, 16, 21]:
+          (soltab, packed), weights = self.makeSoltabs(nfreq)
+          self.assertEqual(packed.obj.weight.shape, (4, 30, (nfreq+7)//8))
+          self.assertEqual(packed.obj.weight.dtype, np.uint8)
+          self.assertTrue(isinstance(packed._getNode(weight=True), FlagPlane))
+          self.assertSameFlags(soltab, packed)
+
+          selections = [{'ant': 'CS001'}, {'freq': list(np.arange(0, nfreq, 3)*1e6)}, {'freq': float((nfreq-1)*1e6)},
+                        {'time': {'min': 5, 'max': 20, 'step': 2}, 'freq': {'min': 1e6}}, {'ant': ['CS000', 'CS003'], 'time': [1., 7., 8.]}]
+          for sel in selections:
+              soltab.setSelection(**sel)
+              packed.setSelection(**sel)
+              self.assertTrue(np.array_equal(packed.getFlags(), soltab.getFlags()), (nfreq, sel))
+              self.assertEqual(packed.countFlagged(), soltab.countFlagged())
+              # flag, unflag and write weights (non zero weights are stored as unflagged)
+              flags = np.random.rand(*soltab.getFlags().shape) > 0.5
+              for soltab_ in [soltab, packed]: soltab_.setFlags(flags)
+              self.assertSameFlags(soltab, packed)
+              for soltab_ in [soltab, packed]:
+                  soltab_.setSelection(**sel)
+                  soltab_.setFlags(True)
+              self.assertSameFlags(soltab, packed)
+              soltab.setSelection(**sel)
+              packed.setSelection(**sel)
+              weights = np.random.rand(*soltab.getFlags().shape)
+              weights[weights < 0.5] = 0
+              soltab.setValues((weights != 0).astype(float), weight=True)
+              packed.setValues(weights, weight=True)
+              self.assertSameFlags(soltab, packed)
+
+          # the padding bits of the last byte are never set
+          packed.clearSelection()
+          packed.setFlags(True)
+          self.assertEqual(packed.countFlagged(), 4*30*nfreq)
+
+    def test_cached(self):
+      (soltab, packed), weights = self.makeSoltabs(13)
+      cached = self.solset.getSoltab(packed.name, useCache=True)
+      cached.setSelection(freq=[2e6, 9e6, 12e6])
+      cached.setFlags(False)
+      cached.flush()
+      soltab.setSelection(freq=[2e6, 9e6, 12e6])
+      soltab.setFlags(False)
+      self.assertSameFlags(soltab, packed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+import unittest
+import numpy as np
+import os, re, tempfile
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.h5fname = os.path.join(self.tmpdir, 'test.h5')
+      h5 = h5parm(self.h5fname, readonly=False)
+      vals = np.zeros((2, 10))
+      h5.makeSolset("sol000").makeSoltab(soltype="phase", soltabName="phase000", axesNames=["ant", "time"],
+                                         axesVals=[["CS001", "CS002"], np.arange(10.)], vals=vals, weights=np.ones_like(vals))
+      h5.close()
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def getEntries(self, history):
+      # entries without dates
+      if history == '': return []
+      for line in history.split('\n'):
+          self.assertTrue(re.match(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d: ', line), line)
+      return [line[21:] for line in history.split('\n')]
+
+    def test_history(self):
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      self.assertEqual(soltab.getHistory(), '')
+      soltab.addHistory('no step')
+      soltab.step, soltab.operation = 'smooth1', 'smooth'
+      soltab.addHistory('from the step')
+      soltab.addHistory('other step', step='clip1', operation='CLIP')
+      soltab.addHistory('x'*2000)
+      h5.close()
+
+      h5 = h5parm(self.h5fname, readonly=True)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      self.assertEqual(self.getEntries(soltab.getHistory()), ['no step', 'from the step', 'other step', 'x'*1024])
+      self.assertEqual(self.getEntries(soltab.getHistory(operation='smooth')), ['from the step', 'x'*1024])
+      self.assertEqual(self.getEntries(soltab.getHistory(step='clip1')), ['other step'])
+      self.assertEqual(self.getEntries(soltab.getHistory(step='clip1', operation='SMOOTH')), [])
+      h5.close()
+
+    def test_many_entries(self):
+      # no limit of 1000 entries
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      for i in range(1100):
+          soltab.addHistory('entry %i' % i, operation='op%i' % (i % 2))
+      self.assertEqual(self.getEntries(soltab.getHistory()), ['entry %i' % i for i in range(1100)])
+      self.assertEqual(self.getEntries(soltab.getHistory(operation='op1')), ['entry %i' % i for i in range(1, 1100, 2)])
+      h5.close()
+
+    def test_old_history(self):
+      # files written before the history table have one HISTORYnnn attribute per entry
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      for i in [0, 1, 2, 10]:
+          soltab.obj.val.attrs['HISTORY%03i' % i] = '2017-01-01 10:00:%02i: old entry %i' % (i, i)
+      h5.close()
+
+      h5 = h5parm(self.h5fname, readonly=True)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      self.assertEqual(soltab._getHistoryTable(), None)
+      self.assertEqual(self.getEntries(soltab.getHistory()), ['old entry %i' % i for i in [0, 1, 2, 10]])
+      h5.close()
+
+      # new entries follow the old ones, which are kept
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("phase000")
+      soltab.addHistory('new entry', operation='FLAG')
+      self.assertEqual(self.getEntries(soltab.getHistory()), ['old entry %i' % i for i in [0, 1, 2, 10]] + ['new entry'])
+      self.assertEqual(self.getEntries(soltab.getHistory(operation='FLAG')), ['new entry'])
+      self.assertEqual(soltab.obj.val.attrs['HISTORY010'], '2017-01-01 10:00:10: old entry 10')
+      # kept by copies
+      copy = soltab.copy('phase001')
+      self.assertEqual(copy.getHistory(), soltab.getHistory())
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
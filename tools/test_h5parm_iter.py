@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestGetValuesIter(unittest.TestCase):
+    def test_iter_in_blocks(self):
+      import shutil
+      tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      vals = np.random.rand(5, 8, 10)
+      weights = (np.random.rand(5, 8, 10) > 0.1).astype(float)
+      h5 = h5parm(os.path.join(tmpdir, 'test.h5'), readonly=False)
+      solset = h5.makeSolset("sol000")
+      soltab = solset.makeSoltab(soltype="phase", soltabName="phase000", axesNames=["ant", "freq", "time"],
+                                 axesVals=[['CS%03i' % i for i in range(5)], np.arange(8.), np.arange(10.)],
+                                 vals=vals, weights=weights)
+      soltab.setSelection(ant=['CS000', 'CS002', 'CS003'], freq={'min': 2, 'max': 6})
+      ix = np.ix_([0, 2, 3], np.arange(2, 7), np.arange(10))
+
+      for returnAxes in [['time'], ['freq', 'time'], ['ant']]:
+          whole = list(soltab.getValuesIter(returnAxes=returnAxes, weight=True))
+          # blocks of about 2 return arrays
+          blocks = list(soltab.getValuesIter(returnAxes=returnAxes, weight=True, maxMemory=2*whole[0][0].nbytes))
+          self.assertEqual(len(whole), len(blocks))
+          self.assertEqual(len(whole), int(np.prod([n for n, axis in zip(vals[ix].shape, ["ant", "freq", "time"]) if not axis in returnAxes])))
+          for (v1, w1, coord1, sel1), (v2, w2, coord2, sel2) in zip(whole, blocks):
+              self.assertTrue(np.array_equal(v1, v2))
+              self.assertTrue(np.array_equal(w1, w2))
+              self.assertEqual(sel1, sel2)
+              for axis in coord1: self.assertTrue(np.array_equal(coord1[axis], coord2[axis]))
+
+      # write back through the returned selections
+      for v, w, coord, sel in soltab.getValuesIter(returnAxes=['time'], weight=True, maxMemory=100*8):
+          soltab.setValues(v*2, sel)
+      soltab.clearSelection()
+      expected = vals.copy()
+      expected[ix] *= 2
+      self.assertTrue(np.allclose(soltab.getValues(retAxesVals=False), expected))
+      h5.close()
+      shutil.rmtree(tmpdir)
+
+    def test_cached_steps_in_blocks(self):
+      # cached soltabs larger than the budget are not cached, operations read them in blocks
+      import shutil
+      from losoto.h5parm import Soltab, cacheManager
+      from losoto.lib_losoto import LosotoParser, runSteps
+      import losoto.operations as operations
+      tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      vals = np.random.rand(2, 300, 40)*5
+      h5fnames = [os.path.join(tmpdir, name) for name in ['whole.h5', 'blocks.h5']]
+      for h5fname in h5fnames:
+          h5 = h5parm(h5fname, readonly=False)
+          h5.makeSolset("sol000").makeSoltab(soltype="amplitude", soltabName="amplitude000", axesNames=["ant", "time", "freq"],
+                                             axesVals=[["CS001", "CS002"], np.arange(300.), np.arange(40.)*1e6+1e8],
+                                             vals=vals, weights=np.ones_like(vals))
+          h5.close()
+      parsetFile = os.path.join(tmpdir, 'test.parset')
+      with open(parsetFile, 'w') as f:
+          f.write("[clip]\noperation = CLIP\nsoltab = sol000/amplitude000\naxesToClip = [time]\nclipLevel = 1.5\n"
+                  "[smooth]\noperation = SMOOTH\nsoltab = sol000/amplitude000\naxesToSmooth = [time]\nsize = [5]\n")
+      parser = LosotoParser(parsetFile)
+      ops = {"CLIP": operations.clip, "SMOOTH": operations.smooth}
+
+      iterMaxMemory = Soltab.iterMaxMemory
+      data = []
+      try:
+          for h5fname, maxMemory in zip(h5fnames, [None, 300*8]):
+              Soltab.iterMaxMemory = maxMemory
+              h5 = h5parm(h5fname, readonly=False)
+              runSteps(parser, ['clip', 'smooth'], h5, ops)
+              self.assertEqual(cacheManager.peek(h5.getSolset("sol000").getSoltab("amplitude000")._getNode()) is None, \
+                               maxMemory is not None)
+              h5.close()
+              h5 = h5parm(h5fname, readonly=True)
+              soltab = h5.getSolset("sol000").getSoltab("amplitude000")
+              data.append((soltab.getValues(retAxesVals=False), soltab.getValues(retAxesVals=False, weight=True)))
+              h5.close()
+      finally:
+          Soltab.iterMaxMemory = iterMaxMemory
+      self.assertTrue(np.count_nonzero(data[0][1] == 0) > 0)
+      self.assertTrue(np.array_equal(data[0][0], data[1][0]))
+      self.assertTrue(np.array_equal(data[0][1], data[1][1]))
+      shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    unittest.main()
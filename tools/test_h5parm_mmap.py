@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestMmap(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.h5fname = os.path.join(self.tmpdir, 'test.h5')
+      np.random.seed(0)
+      self.ants = ['CS%03i' % i for i in range(6)]
+      h5 = h5parm(self.h5fname, readonly=False)
+      solset = h5.makeSolset("sol000")
+      for name, kwargs in [('contiguous', {}), ('float32', {'valDtype': 'f32', 'weightDtype': 'f32'}),
+                           ('chunked', {'chunkShape': [2, 16, 4]}), ('compressed', {'complevel': 3}),
+                           ('packed', {'weightDtype': 'bit'})]:
+          vals = np.random.rand(6, 100, 10)*6-3
+          weights = (np.random.rand(6, 100, 10) > 0.1).astype(float)
+          solset.makeSoltab(soltype="phase", soltabName=name, axesNames=["ant", "time", "freq"],
+                            axesVals=[self.ants, np.arange(100.), np.arange(10.)], vals=vals, weights=weights, **kwargs)
+      h5.close()
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def test_same_as_pytables(self):
+      h5 = h5parm(self.h5fname, readonly=True)
+      h5mmap = h5parm(self.h5fname, readonly=True, mmap=True)
+      selections = [{}, {'ant': 'CS002'}, {'ant': ['CS000', 'CS003', 'CS005'], 'freq': [1., 4., 5.]},
+                    {'time': {'min': 10, 'max': 80, 'step': 3}}, {'ant': ['CS001', 'CS004'], 'time': [3., 50., 99.], 'freq': 7.}]
+      for name in h5.getSolset("sol000").getSoltabNames():
+          soltab = h5.getSolset("sol000").getSoltab(name)
+          soltabMmap = h5mmap.getSolset("sol000").getSoltab(name)
+          # only uncompressed, contiguous arrays are mapped
+          mapped = isinstance(soltabMmap._getData(), np.memmap)
+          self.assertEqual(mapped, name in ['contiguous', 'float32', 'packed'], name)
+          self.assertEqual(isinstance(soltabMmap._getData(weight=True), np.memmap), name in ['contiguous', 'float32'], name)
+          if mapped:
+              self.assertRaises(ValueError, soltabMmap._getData().__setitem__, (0, 0, 0), 1.)
+
+          for sel in selections:
+              soltab.setSelection(**sel)
+              soltabMmap.setSelection(**sel)
+              for weight in [False, True]:
+                  vals = soltab.getValues(retAxesVals=False, weight=weight)
+                  valsMmap = soltabMmap.getValues(retAxesVals=False, weight=weight)
+                  self.assertEqual(vals.dtype, valsMmap.dtype)
+                  self.assertTrue(np.array_equal(vals, valsMmap), (name, sel, weight))
+              self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, reference='CS001'),
+                                             soltabMmap.getValues(retAxesVals=False, reference='CS001')))
+              for (v1, w1, c1, s1), (v2, w2, c2, s2) in zip(soltab.getValuesIter(returnAxes=['time'], weight=True),
+                                                            soltabMmap.getValuesIter(returnAxes=['time'], weight=True)):
+                  self.assertTrue(np.array_equal(v1, v2) and np.array_equal(w1, w2))
+                  self.assertEqual(s1, s2)
+          stats = soltab.getStats(recompute=True)
+          statsMmap = soltabMmap.getStats(recompute=True)
+          self.assertEqual(stats['flagged'], statsMmap['flagged'])
+          self.assertEqual(stats['sum'], statsMmap['sum'])
+
+      # losoto -i
+      self.assertEqual(h5.printInfo(verbose=True, recompute=True), h5mmap.printInfo(verbose=True, recompute=True))
+      h5.close()
+      h5mmap.close()
+
+    def test_writable(self):
+      # mapping is only for readonly files
+      h5 = h5parm(self.h5fname, readonly=False, mmap=True)
+      soltab = h5.getSolset("sol000").getSoltab("contiguous")
+      self.assertFalse(isinstance(soltab._getData(), np.memmap))
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+from losoto.lib_operations import normalize_phase
+import unittest
+import numpy as np
+import os, tempfile
+
+def wrap(phase):
+    # reference wrapping into [-pi, pi]
+    phase = np.fmod(phase, 2.0 * np.pi)
+    nans = np.isnan(phase)
+    phase[nans] = 0
+    phase[phase < -np.pi] += 2.0 * np.pi
+    phase[phase > np.pi] -= 2.0 * np.pi
+    phase[nans] = np.nan
+    return phase
+
+class TestReference(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      self.ants = ['CS001', 'CS002', 'CS003', 'RS106']
+      self.axesVals = [np.arange(20.), self.ants, np.arange(6.)*1e6+1e8]
+      self.vals = np.random.rand(20, 4, 6)*20 - 10
+      self.vals[3, 2, :] = np.nan
+      self.weights = (np.random.rand(20, 4, 6) > 0.2).astype(float)
+      self.h5 = h5parm(os.path.join(self.tmpdir, 'test.h5'), readonly=False)
+      self.solset = self.h5.makeSolset('sol000')
+      for soltype in ['phase', 'tec', 'amplitude']:
+          self.solset.makeSoltab(soltype=soltype, soltabName=soltype+'000', axesNames=['time', 'ant', 'freq'],
+                                 axesVals=self.axesVals, vals=self.vals, weights=self.weights)
+
+    def tearDown(self):
+      import shutil
+      self.h5.close()
+      shutil.rmtree(self.tmpdir)
+
+    def expected(self, sel, reference, wrapped):
+      # reference selected for each antenna, then subtracted
+      idx = [np.atleast_1d(np.arange(len(axisVals))[s]) for axisVals, s in zip(self.axesVals, sel)]
+      refIdx = list(idx)
+      refIdx[1] = np.repeat(self.ants.index(reference), len(idx[1]))
+      vals = self.vals[np.ix_(*idx)] - self.vals[np.ix_(*refIdx)]
+      weights = self.weights[np.ix_(*idx)].copy()
+      weights[self.weights[np.ix_(*refIdx)] == 0] = 0
+      return wrap(vals) if wrapped else vals, weights
+
+    def test_reference(self):
+      selections = [({}, [slice(None)]*3), ({'ant': ['CS002', 'RS106']}, [slice(None), [1, 3], slice(None)]),
+                    ({'ant': 'CS003', 'freq': [1e8, 1.03e8]}, [slice(None), [2], [0, 3]]),
+                    ({'time': {'min': 2, 'max': 10, 'step': 4}}, [slice(2, 11, 4), slice(None), slice(None)])]
+      for soltabName, wrapped in [('phase000', True), ('tec000', False)]:
+          for useCache in [False, True]:
+              soltab = self.solset.getSoltab(soltabName, useCache=useCache)
+              for sel, idx in selections:
+                  soltab.setSelection(**sel)
+                  for reference in ['CS001', 'CS003']:
+                      vals, weights = self.expected(idx, reference, wrapped)
+                      refVals = soltab.getValues(retAxesVals=False, reference=reference)
+                      self.assertEqual(refVals.shape, vals.shape)
+                      self.assertTrue(np.allclose(refVals, vals, equal_nan=True), (soltabName, sel, reference))
+                      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True, reference=reference), weights))
+                      if wrapped: self.assertTrue(np.all(np.abs(refVals[~np.isnan(refVals)]) <= np.pi))
+                      elif sel == {}: self.assertTrue(np.nanmax(np.abs(refVals)) > np.pi)
+                  # the reference antenna is zero, the stored data are not modified
+                  if 'CS001' in soltab.getAxisValues('ant'):
+                      refVals = soltab.getValues(retAxesVals=False, reference='CS001')
+                      self.assertTrue(np.all(refVals[:, 0][~np.isnan(refVals[:, 0])] == 0))
+              soltab.clearSelection()
+              self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), self.vals, equal_nan=True))
+              self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True), self.weights))
+              vals, axesVals = soltab.getValues(reference='CS002')
+              self.assertEqual(list(axesVals['ant']), self.ants)
+
+    def test_no_reference(self):
+      # not a phase soltab or unknown antenna: the values are returned as they are
+      for soltabName, reference in [('amplitude000', 'CS001'), ('phase000', 'CS999')]:
+          soltab = self.solset.getSoltab(soltabName)
+          self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, reference=reference), self.vals, equal_nan=True))
+          self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True, reference=reference), self.weights))
+
+    def test_normalize_phase(self):
+      phase = np.concatenate([np.linspace(-30, 30, 1001), [np.nan, np.pi, -np.pi, 2*np.pi, -3*np.pi]])
+      self.assertTrue(np.array_equal(normalize_phase(phase), wrap(phase), equal_nan=True))
+      out = phase.copy()
+      self.assertTrue(normalize_phase(out, out=out) is out)
+      self.assertTrue(np.array_equal(out, wrap(phase), equal_nan=True))
+
+if __name__ == '__main__':
+    unittest.main()
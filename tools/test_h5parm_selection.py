@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm, _readSelection, _writeSelection, _planSelection
+import tables
+import unittest
+import numpy as np
+import os, re, tempfile
+
+class TestMultiListSelection(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      self.data = np.random.rand(6, 30, 20, 4)
+      self.h5 = tables.open_file(os.path.join(self.tmpdir, 'test.h5'), 'w')
+      self.arrays = [self.h5.create_array('/', 'contiguous', obj=self.data),
+                     self.h5.create_carray('/', 'chunked', obj=self.data, chunkshape=(1, 8, 8, 4),
+                                           filters=tables.Filters(complevel=1, complib='zlib'))]
+
+    def tearDown(self):
+      import shutil
+      self.h5.close()
+      shutil.rmtree(self.tmpdir)
+
+    def randomSelection(self, shape):
+      selection = []
+      for n in shape:
+          kind = np.random.randint(4)
+          if kind == 0: selection.append(slice(None))
+          elif kind == 1: selection.append(slice(np.random.randint(n//2), n-np.random.randint(n//2)))
+          elif kind == 2: selection.append(int(np.random.randint(n)))
+          else: selection.append(sorted(np.random.choice(n, np.random.randint(1, n+1), replace=False).tolist()))
+      return selection
+
+    def reference(self, selection, shape):
+      # orthogonal selection as np.ix_, ints drop their axis
+      idx = [np.atleast_1d(np.arange(n)[sel]) for sel, n in zip(selection, shape)]
+      outShape = [len(i) for sel, i in zip(selection, idx) if not isinstance(sel, int)]
+      return np.ix_(*idx), outShape
+
+    def test_read(self):
+      for k in range(200):
+          selection = self.randomSelection(self.data.shape)
+          ix, outShape = self.reference(selection, self.data.shape)
+          expected = self.data[ix].reshape(outShape)
+          for data in [self.data] + self.arrays:
+              self.assertTrue(np.array_equal(_readSelection(data, selection), expected), (data, selection))
+
+    def test_write(self):
+      for k in range(100):
+          selection = self.randomSelection(self.data.shape)
+          ix, outShape = self.reference(selection, self.data.shape)
+          vals = np.random.rand(*outShape)
+          expected = self.data.copy()
+          expected[ix] = vals.reshape(expected[ix].shape)
+          for data in [self.data.copy()] + self.arrays:
+              data[:] = self.data
+              _writeSelection(data, selection, vals)
+              self.assertTrue(np.array_equal(data[:], expected), (data, selection))
+              # single value
+              data[:] = self.data
+              _writeSelection(data, selection, 2.)
+              written = self.data.copy()
+              written[ix] = 2.
+              self.assertTrue(np.array_equal(data[:], written), (data, selection))
+
+    def test_strategies(self):
+      # lists far apart are split in runs, close ones read through their bounding box
+      data = np.random.rand(4, 40000)
+      array = self.h5.create_array('/', 'long', obj=data)
+      sparse = [[0, 3], [5, 20000, 39999]]
+      dense = [[0, 1, 3], list(range(100, 300, 2))]
+      self.assertEqual(_planSelection(sparse, data.shape)[0], 'runs')
+      self.assertEqual(_planSelection(dense, data.shape)[0], 'superset')
+      for selection in [sparse, dense]:
+          ix = np.ix_(*selection)
+          self.assertTrue(np.array_equal(_readSelection(array, selection), data[ix]))
+          vals = np.random.rand(*data[ix].shape)
+          _writeSelection(array, selection, vals)
+          self.assertTrue(np.array_equal(array[:][ix], vals))
+
+    def test_soltab(self):
+      h5 = h5parm(os.path.join(self.tmpdir, 'test_soltab.h5'), readonly=False)
+      solset = h5.makeSolset("sol000")
+      ants = ['CS%03i' % i for i in range(6)]
+      soltab = solset.makeSoltab(soltype="phase", soltabName="phase000", axesNames=["ant", "time", "freq", "pol"],
+                                 axesVals=[ants, np.arange(30.), np.arange(20.), ['XX', 'XY', 'YX', 'YY']],
+                                 vals=self.data, weights=np.ones_like(self.data), chunkShape=[1, 8, 8, 4])
+      soltab.setSelection(ant=['CS001', 'CS004', 'CS005'], freq=[1., 7., 8., 15.], pol=['XX', 'YY'])
+      ix = np.ix_([1, 4, 5], np.arange(30), [1, 7, 8, 15], [0, 3])
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), self.data[ix]))
+      soltab.setValues(-self.data[ix])
+      expected = self.data.copy()
+      expected[ix] = -self.data[ix]
+      soltab.clearSelection()
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), expected))
+      self.assertAlmostEqual(soltab.getStats()['sum'], soltab.getStats(recompute=True)['sum'])
+      h5.close()
+
+class TestAxisIndex(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      self.ants = ['CS%03iHBA%i' % (i//2, i%2) for i in range(20)] + ['RS%03iHBA' % i for i in range(10)]
+      self.times = np.arange(200.)*10 + 4e9
+      self.freqs = np.random.permutation(50)*1e5 + 1e8 # not sorted
+      vals = np.random.rand(30, 200, 50)
+      self.h5 = h5parm(os.path.join(self.tmpdir, 'test.h5'), readonly=False)
+      self.soltab = self.h5.makeSolset("sol000").makeSoltab(soltype="phase", soltabName="phase000",
+                                                             axesNames=["ant", "time", "freq"], axesVals=[self.ants, self.times, self.freqs],
+                                                             vals=vals, weights=np.ones_like(vals))
+
+    def tearDown(self):
+      import shutil
+      self.h5.close()
+      shutil.rmtree(self.tmpdir)
+
+    def reference(self, axisVals, selVal):
+      # positions selected by scanning the axis values, as before the index
+      axisVals = np.asarray(axisVals)
+      if type(selVal) is str:
+          return [i for i, item in enumerate(axisVals) if re.search(selVal, item)]
+      if type(selVal) is dict:
+          start = np.where(axisVals >= selVal['min'])[0][0] if 'min' in selVal else 0
+          stop = np.where(axisVals <= selVal['max'])[0][-1]+1 if 'max' in selVal else len(axisVals)
+          return list(range(len(axisVals)))[start:stop:selVal.get('step', 1)]
+      if not type(selVal) is list: selVal = [selVal]
+      return [i for i, item in enumerate(axisVals.tolist()) if item in selVal]
+
+    def assertSelection(self, axis, axisVals, selVal):
+      self.soltab.setSelection(**{axis: selVal})
+      idx = self.soltab.getAxesNames().index(axis)
+      selected = np.arange(len(axisVals))[self.soltab.selection[idx]].tolist()
+      self.assertEqual(selected, self.reference(axisVals, selVal), (axis, selVal))
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues(axis), np.asarray(axisVals)[selected]))
+
+    def test_selections(self):
+      for k in range(2): # the second time from the resolved regexps
+          for selVal in ['CS', 'HBA1$', '^RS00[1-5]', 'CS00[0-3]HBA0|RS', 'CS002HBA1', ['CS001HBA0', 'RS003HBA', 'CS009HBA1'], \
+                         'RS003HBA', ['CS004HBA1', 'CS004HBA0']]:
+              self.assertSelection('ant', self.ants, selVal)
+      for selVal in [{'min': 4e9+100}, {'max': 4e9+1000}, {'min': 4e9+95, 'max': 4e9+1505}, {'min': 4e9+100, 'max': 4e9+1900, 'step': 7}, \
+                     {'min': 4e9, 'max': 5e9, 'step': 3}, 4e9+1000, [4e9+10, 4e9+20, 4e9+30], list(self.times[[5, 50, 150]])]:
+          self.assertSelection('time', self.times, selVal)
+      for selVal in [{'min': 1.01e8}, {'max': 1.02e8}, {'min': 1.01e8, 'max': 1.03e8}, {'min': 1.01e8, 'step': 2}, \
+                     1.02e8, [1.02e8, 1.01e8, 1.045e8], list(self.freqs[10:20])]:
+          self.assertSelection('freq', self.freqs, selVal)
+
+    def test_changed_axis(self):
+      # the index follows the new axis values
+      self.assertSelection('time', self.times, {'min': 4e9+1000})
+      self.soltab.clearSelection()
+      self.soltab.setAxisValues('time', self.times[::-1])
+      self.assertSelection('time', self.times[::-1], {'min': 4e9+1000})
+      self.assertSelection('time', self.times[::-1], [4e9+10, 4e9+1990])
+
+    def test_axis_values_read_only(self):
+      # memoised axis values are shared, returned as read-only views
+      for axis, axisVals in [('ant', self.ants), ('time', self.times), ('freq', self.freqs)]:
+          for ignoreSelection in [False, True]:
+              vals = self.soltab.getAxisValues(axis, ignoreSelection=ignoreSelection)
+              self.assertFalse(vals.flags.writeable)
+              self.assertRaises(ValueError, vals.__setitem__, 0, axisVals[1])
+              # a copy stays writable and does not change the memoised values
+              for copy in [vals.copy(), np.array(vals), list(vals)]:
+                  copy[0] = axisVals[1]
+                  self.assertEqual(copy[0], axisVals[1])
+              self.assertTrue(np.array_equal(self.soltab.getAxisValues(axis, ignoreSelection=ignoreSelection), axisVals))
+      self.assertEqual(self.soltab.getAxisValues('ant').dtype.kind, 'U')
+      self.assertFalse(self.soltab.time.flags.writeable)
+
+    def test_axis_values_memo(self):
+      # memoised values follow the selection, also when it is edited directly, and the axis values
+      times = self.soltab.getAxisValues('time')
+      self.soltab.setSelection(time={'max': 4e9+40})
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues('time'), self.times[:5]))
+      self.soltab.selection[1] = [3, 7]
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues('time'), self.times[[3, 7]]))
+      self.soltab.selection[1].append(9)
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues('time'), self.times[[3, 7, 9]]))
+      self.soltab.clearSelection()
+      self.soltab.setAxisValues('time', self.times + 1.)
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues('time'), self.times + 1.))
+      self.assertTrue(np.array_equal(self.soltab.getAxisValues('time', ignoreSelection=True), self.times + 1.))
+      # values returned before are not changed
+      self.assertTrue(np.array_equal(times, self.times))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+from losoto.lib_losoto import LosotoParser, runSteps
+import losoto.operations as operations
+import unittest
+import numpy as np
+import os, tempfile
+
+class TestH5parmStats(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.h5fname = os.path.join(self.tmpdir, 'test.h5')
+      np.random.seed(0)
+      h5 = h5parm(self.h5fname, readonly=False)
+      solset = h5.makeSolset("sol000")
+      vals = np.random.rand(2, 300, 40)*5
+      vals[0, 10:20, 5] = 100.
+      solset.makeSoltab(soltype="amplitude", soltabName="amplitude000",
+                        axesNames=["ant", "time", "freq"],
+                        axesVals=[["CS001", "CS002"], np.arange(300.), np.arange(40.)*1e6+1e8],
+                        vals=vals, weights=np.ones_like(vals))
+      h5.close()
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def runParset(self, parset):
+      parsetFile = os.path.join(self.tmpdir, 'test.parset')
+      with open(parsetFile, 'w') as f: f.write(parset)
+      parser = LosotoParser(parsetFile)
+      steps = [step for step in parser.sections() if step != '_global']
+      ops = {"CLIP": operations.clip, "NORM": operations.norm, "SMOOTH": operations.smooth}
+      h5 = h5parm(self.h5fname, readonly=False)
+      try:
+          runSteps(parser, steps, h5, ops)
+      finally:
+          h5.close()
+
+    def assertStoredStats(self):
+      h5 = h5parm(self.h5fname, readonly=True)
+      soltab = h5.getSolset("sol000").getSoltab("amplitude000")
+      stored = soltab.getStats()
+      recomputed = soltab.getStats(recompute=True)
+      weights = soltab.getValues(retAxesVals=False, weight=True)
+      h5.close()
+      self.assertEqual(stored['flagged'], np.count_nonzero(weights == 0))
+      self.assertEqual(stored['flagged'], recomputed['flagged'])
+      self.assertTrue(np.array_equal(stored['flagged_ant'], recomputed['flagged_ant']))
+      self.assertEqual(stored['nan'], recomputed['nan'])
+      self.assertAlmostEqual(stored['sum'], recomputed['sum'], delta=1e-6*abs(recomputed['sum']))
+      if stored['minmax']:
+          self.assertAlmostEqual(stored['min'], recomputed['min'])
+          self.assertAlmostEqual(stored['max'], recomputed['max'])
+      return stored
+
+    def test_stats_after_clip(self):
+      self.runParset("[clip]\noperation = CLIP\nsoltab = sol000/amplitude000\naxesToClip = [time]\nclipLevel = 1.5\n")
+      stats = self.assertStoredStats()
+      self.assertTrue(stats['flagged'] > 0)
+
+    def test_stats_after_cached_steps(self):
+      self.runParset("[clip]\noperation = CLIP\nsoltab = sol000/amplitude000\naxesToClip = [time]\nclipLevel = 1.5\n"
+                     "[smooth]\noperation = SMOOTH\nsoltab = sol000/amplitude000\naxesToSmooth = [time]\nsize = [5]\n"
+                     "[norm]\noperation = NORM\nsoltab = sol000/amplitude000\naxesToNorm = [time]\n")
+      self.assertStoredStats()
+
+    def test_stats_after_direct_writes(self):
+      # writes on non cached soltabs only mark the stats as outdated, they are computed again on close
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("amplitude000")
+      soltab.setSelection(ant='CS002', time={'min': 100, 'max': 149})
+      soltab.setValues(np.nan)
+      soltab.setValues(0., weight=True)
+      soltab.setSelection(freq=[3e6+1e8, 7e6+1e8])
+      soltab.setFlags(True)
+      h5.close()
+      stats = self.assertStoredStats()
+      self.assertEqual(stats['nan'], 50*40)
+      self.assertEqual(stats['flagged'], 50*40 + 2*(300-50) + 2*300)
+
+if __name__ == '__main__':
+    unittest.main()
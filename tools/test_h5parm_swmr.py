@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+from losoto.lib_losoto import LosotoParser, runSteps
+import losoto.operations as operations
+import unittest
+import multiprocessing
+import numpy as np
+import os, tempfile
+
+ants = ['CS001', 'CS002', 'CS003']
+freqs = np.arange(8.)*1e6+1e8
+
+def getBlock(k):
+    # data appended by the writer at step k, 5 times each
+    vals = np.random.RandomState(k).rand(3, 5, 8)
+    weights = np.ones_like(vals)
+    weights[k % 3, :, k] = 0
+    return vals, weights, np.arange(5.)+5*k
+
+def writer(h5fname, appended, read):
+    # open an existing file, switched to SWMR immediately
+    h5 = h5parm(h5fname, readonly=False, swmr=True)
+    try:
+        soltab = h5.getSolset('sol000').getSoltab('phase000')
+        for k in range(3):
+            soltab.append(*getBlock(k))
+            soltab.addHistory('appended block %i' % k)
+            appended.put(k)
+            read.get()
+        # modify data already read
+        soltab.setSelection(ant='CS002')
+        soltab.setValues(-1.)
+        soltab.setFlags(True)
+        appended.put('set')
+        read.get()
+    finally:
+        h5.close()
+
+class TestSwmr(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.h5fname = os.path.join(self.tmpdir, 'test.h5')
+      # new files are created in the latest HDF5 format, needed by SWMR
+      h5 = h5parm(self.h5fname, readonly=False, swmr=True)
+      solset = h5.makeSolset('sol000')
+      solset.makeSoltab(soltype='phase', soltabName='phase000', axesNames=['ant', 'time', 'freq'],
+                        axesVals=[ants, np.zeros(0), freqs], vals=np.zeros((3, 0, 8)), weights=np.zeros((3, 0, 8)),
+                        extendableAxis='time')
+      h5.close()
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def test_read_while_appending(self):
+      ctx = multiprocessing.get_context('spawn')
+      appended, read = ctx.Queue(), ctx.Queue()
+      process = ctx.Process(target=writer, args=(self.h5fname, appended, read))
+      process.start()
+      try:
+          self.assertEqual(appended.get(timeout=60), 0)
+          h5 = h5parm(self.h5fname, readonly=True, swmr=True)
+          solset = h5.getSolset('sol000')
+          self.assertEqual(solset.getSoltabNames(), ['phase000'])
+          self.assertEqual(len(solset.getAnt()), 0)
+          soltab = solset.getSoltabs()[0]
+          vals, weights, times = [], [], []
+          for k in range(3):
+              if k > 0: self.assertEqual(appended.get(timeout=60), k)
+              soltab.refresh()
+              block = getBlock(k)
+              vals.append(block[0]); weights.append(block[1]); times.append(block[2])
+              self.assertEqual(soltab.getAxisLen('time'), 5*(k+1))
+              self.assertTrue(np.array_equal(soltab.getAxisValues('time'), np.concatenate(times)))
+              self.assertTrue(np.array_equal(soltab.getAxisValues('ant'), ants))
+              self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), np.concatenate(vals, axis=1)))
+              self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True), np.concatenate(weights, axis=1)))
+              self.assertEqual(soltab.countFlagged(), 5*(k+1))
+              self.assertTrue('appended block %i' % k in soltab.getHistory())
+              # stats are not stored in SWMR mode, they are computed
+              self.assertEqual(soltab.getStats()['flagged'], 5*(k+1))
+              # losoto -i
+              info = h5.printInfo(verbose=True)
+              self.assertTrue('phase000' in info and 'CS001' in info)
+              read.put(k)
+
+          self.assertEqual(appended.get(timeout=60), 'set')
+          soltab.refresh()
+          expected = np.concatenate(vals, axis=1)
+          expected[1] = -1.
+          self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), expected))
+          soltab.setSelection(ant='CS002')
+          self.assertTrue(np.all(soltab.getFlags()))
+          read.put('set')
+          h5.close()
+      finally:
+          process.join(60)
+          if process.is_alive(): process.terminate()
+      self.assertEqual(process.exitcode, 0)
+
+      # written normally again, stats are stored
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset('sol000').getSoltab('phase000')
+      self.assertEqual(soltab.getStats()['flagged'], 3*5*8 + 2*5)
+      h5.close()
+
+    def test_steps(self):
+      # losoto --swmr write: steps writing existing soltabs
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset('sol000').getSoltab('phase000')
+      for k in range(3): soltab.append(*getBlock(k))
+      h5.close()
+      import shutil
+      h5fnameNormal = os.path.join(self.tmpdir, 'normal.h5')
+      shutil.copy(self.h5fname, h5fnameNormal)
+
+      parsetFile = os.path.join(self.tmpdir, 'test.parset')
+      with open(parsetFile, 'w') as f:
+          f.write("[smooth]\noperation = SMOOTH\nsoltab = sol000/phase000\naxesToSmooth = [time]\nsize = [3]\n"
+                  "[clip]\noperation = CLIP\nsoltab = sol000/phase000\naxesToClip = [time]\nclipLevel = 1.2\n")
+      parser = LosotoParser(parsetFile)
+      ops = {"CLIP": operations.clip, "SMOOTH": operations.smooth}
+      data = []
+      for h5fname, swmr in [(self.h5fname, True), (h5fnameNormal, False)]:
+          h5 = h5parm(h5fname, readonly=False, swmr=swmr)
+          self.assertEqual(runSteps(parser, ['smooth', 'clip'], h5, ops), 0)
+          h5.close()
+          h5 = h5parm(h5fname, readonly=True)
+          soltab = h5.getSolset('sol000').getSoltab('phase000')
+          data.append((soltab.getValues(retAxesVals=False), soltab.getValues(retAxesVals=False, weight=True),
+                       soltab.getHistory(operation='CLIP') != ''))
+          h5.close()
+      self.assertTrue(np.array_equal(data[0][0], data[1][0]))
+      self.assertTrue(np.array_equal(data[0][1], data[1][1]))
+      self.assertTrue(data[0][2])
+
+      # the history index is rebuilt when the file is written normally
+      h5 = h5parm(self.h5fname, readonly=False)
+      soltab = h5.getSolset('sol000').getSoltab('phase000')
+      soltab.addHistory('normal mode', operation='test')
+      self.assertTrue('normal mode' in soltab.getHistory(operation='TEST'))
+      self.assertTrue('CLIP' in soltab.getHistory(operation='CLIP'))
+      h5.close()
+
+      # solsets/soltabs cannot be created in SWMR mode
+      h5 = h5parm(self.h5fname, readonly=False, swmr=True)
+      self.assertRaises(Exception, h5.makeSolset, 'sol001')
+      self.assertRaises(Exception, h5.getSolset('sol000').getSoltab('phase000').delete)
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
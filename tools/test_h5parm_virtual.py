@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm, makeVirtualH5parm
+import unittest
+import subprocess, sys
+import numpy as np
+import os, tempfile
+
+collector = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin', 'H5parm_collector.py')
+
+class TestVirtualH5parm(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      # one h5parm per subband, the last one without a time block and an antenna
+      self.h5fnames = []
+      for i in range(3):
+          h5fname = os.path.join(self.tmpdir, 'SB%03i.h5' % i)
+          ants = ['CS001', 'CS002', 'RS106'] if i < 2 else ['CS001', 'RS106']
+          times = np.arange(40.) if i < 2 else np.arange(20., 40.)
+          freqs = np.arange(4.)*1e6 + 1e8 + i*4e6
+          h5 = h5parm(h5fname, readonly=False)
+          solset = h5.makeSolset('sol000')
+          solset.obj.antenna.append([(ant, [k, i, 0]) for k, ant in enumerate(ants)])
+          solset.obj.source.append([('pointing', [1., 0.5])])
+          for soltype, soltabName in [('phase', 'phase000'), ('amplitude', 'amplitude000')]:
+              vals = np.random.rand(len(ants), len(times), len(freqs))
+              weights = (np.random.rand(len(ants), len(times), len(freqs)) > 0.2).astype(float)
+              solset.makeSoltab(soltype=soltype, soltabName=soltabName, axesNames=['ant', 'time', 'freq'],
+                                axesVals=[ants, times, freqs], vals=vals, weights=weights)
+          h5.close()
+          self.h5fnames.append(h5fname)
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def assertSameSoltab(self, soltab, soltabCollected):
+      self.assertEqual(soltab.getType(), soltabCollected.getType())
+      self.assertEqual(soltab.getAxesNames(), soltabCollected.getAxesNames())
+      for axis in soltab.getAxesNames():
+          self.assertTrue(np.array_equal(soltab.getAxisValues(axis), soltabCollected.getAxisValues(axis)))
+      for sel in [{}, {'ant': 'CS002'}, {'freq': [1e8, 1.05e8, 1.1e8]}, {'time': {'min': 10, 'max': 30}, 'ant': ['CS001', 'RS106']}]:
+          soltab.setSelection(**sel)
+          soltabCollected.setSelection(**sel)
+          # missing data are NaN and flagged
+          vals = soltab.getValues(retAxesVals=False)
+          self.assertTrue(np.array_equal(vals, soltabCollected.getValues(retAxesVals=False), equal_nan=True), sel)
+          self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True),
+                                         soltabCollected.getValues(retAxesVals=False, weight=True)), sel)
+          self.assertTrue(np.array_equal(soltab.getFlags(), soltabCollected.getFlags()))
+      soltab.clearSelection()
+      soltabCollected.clearSelection()
+
+    def test_same_as_collected(self):
+      # H5parm_collector.py copying the data and with --virtual
+      outCollected = os.path.join(self.tmpdir, 'collected.h5')
+      outVirtual = os.path.join(self.tmpdir, 'virtual.h5')
+      for soltabName in ['phase000', 'amplitude000']:
+          subprocess.check_call([sys.executable, collector, '-t', soltabName, '-o', outCollected] + self.h5fnames)
+      subprocess.check_call([sys.executable, collector, '-x', '-o', outVirtual] + self.h5fnames)
+      self.assertTrue(os.path.getsize(outVirtual) < os.path.getsize(outCollected))
+
+      h5 = h5parm(outVirtual, readonly=True)
+      h5Collected = h5parm(outCollected, readonly=True)
+      solset = h5.getSolset('sol000')
+      solsetCollected = h5Collected.getSolset('sol000')
+      self.assertEqual(sorted(solset.getSoltabNames()), ['amplitude000', 'phase000'])
+      self.assertEqual(sorted(solset.getAnt()), sorted(solsetCollected.getAnt()))
+      self.assertEqual(sorted(solset.getSou()), sorted(solsetCollected.getSou()))
+      for soltabName in ['phase000', 'amplitude000']:
+          soltab = solset.getSoltab(soltabName)
+          self.assertEqual(soltab.getAxisLen('ant'), 3)
+          self.assertEqual(soltab.getAxisLen('freq'), 12)
+          self.assertSameSoltab(soltab, solsetCollected.getSoltab(soltabName))
+      h5.close()
+      h5Collected.close()
+
+    def test_members_changed(self):
+      # the virtual h5parm reads the members, not a copy
+      outVirtual = os.path.join(self.tmpdir, 'virtual.h5')
+      self.assertEqual(makeVirtualH5parm(self.h5fnames, outVirtual, soltabNames=['phase000'], outSolsetName='sol001'), 'sol001')
+      h5 = h5parm(self.h5fnames[1], readonly=False)
+      soltab = h5.getSolset('sol000').getSoltab('phase000')
+      soltab.setSelection(ant='CS002')
+      soltab.setValues(-1.)
+      h5.close()
+
+      h5 = h5parm(outVirtual, readonly=True)
+      soltab = h5.getSolset('sol001').getSoltab('phase000', sel={'ant': 'CS002'})
+      self.assertEqual(h5.getSolset('sol001').getSoltabNames(), ['phase000'])
+      vals = soltab.getValues(retAxesVals=False)
+      self.assertTrue(np.all(vals[:, :, 4:8] == -1.))
+      self.assertTrue(np.all(vals[:, :, :4] >= 0.))
+      self.assertTrue(np.all(np.isnan(vals[:, :, 8:])))
+      h5.close()
+
+if __name__ == '__main__':
+    unittest.main()
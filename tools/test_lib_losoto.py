@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from losoto.h5parm import h5parm
+from losoto.lib_losoto import LosotoParser, StepProfiler, runStep, runSteps, getStepSoltabNames, getStepSoltabs, _getStepJobs, _copyStepSoltabs, _mergeStepSoltabs
+import losoto.operations as operations
+import unittest
+import numpy as np
+import os, re, tempfile
+
+ops = {"CLIP": operations.clip, "DUPLICATE": operations.duplicate, "NORM": operations.norm,
+       "RESET": operations.reset, "RESIDUALS": operations.residuals, "SMOOTH": operations.smooth}
+
+class TestRunSteps(unittest.TestCase):
+    def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      np.random.seed(0)
+      h5 = h5parm(self.fileName('test.h5'), readonly=False)
+      for solsetName in ["sol000", "sol001"]:
+          solset = h5.makeSolset(solsetName)
+          for soltype in ["phase", "amplitude"]:
+              for k in range(2):
+                  vals = np.random.rand(2, 100, 20)*(1 if soltype == "phase" else 5)
+                  solset.makeSoltab(soltype=soltype, soltabName="%s%03i" % (soltype, k),
+                                    axesNames=["ant", "time", "freq"],
+                                    axesVals=[["CS001", "CS002"], np.arange(100.), np.arange(20.)*1e6+1e8],
+                                    vals=vals, weights=np.ones_like(vals))
+      h5.close()
+
+    def tearDown(self):
+      import shutil
+      shutil.rmtree(self.tmpdir)
+
+    def fileName(self, name):
+      return os.path.join(self.tmpdir, name)
+
+    def copy(self, name):
+      import shutil
+      shutil.copy(self.fileName('test.h5'), self.fileName(name))
+      return self.fileName(name)
+
+    def runParset(self, h5fname, parset, ncpu=1, resume=False, checkpoint=False):
+      parsetFile = self.fileName('test.parset')
+      with open(parsetFile, 'w') as f: f.write(parset)
+      parser = LosotoParser(parsetFile)
+      steps = [step for step in parser.sections() if step != '_global']
+      h5 = h5parm(h5fname, readonly=False)
+      try:
+          return runSteps(parser, steps, h5, ops, ncpu, resume, checkpoint)
+      finally:
+          h5.close()
+
+    def getData(self, h5fname):
+      h5 = h5parm(h5fname, readonly=True)
+      data = {}
+      for solset in h5.getSolsets():
+          for soltab in solset.getSoltabs():
+              # history without dates
+              history = re.sub(r'^[0-9: -]*: ', '', soltab.getHistory(), flags=re.M)
+              data[solset.name+'/'+soltab.name] = (soltab.getValues(retAxesVals=False), \
+                      soltab.getValues(retAxesVals=False, weight=True), history)
+      checkpoints = h5.getCheckpoints()
+      h5.close()
+      return data, checkpoints
+
+    def test_failing_step_keeps_completed_steps(self):
+      clip = "[clip]\noperation = CLIP\nsoltab = sol000/amplitude000\naxesToClip = [time]\nclipLevel = 1.5\n"
+      h5fname = self.copy('ok.h5')
+      self.runParset(h5fname, clip)
+      h5fnameFailed = self.copy('failed.h5')
+      self.assertRaises(ValueError, self.runParset, h5fnameFailed,
+                        clip + "[norm]\noperation = NORM\nsoltab = sol000/amplitude000\naxesToNorm = [time]\nnormVal = abc\n",
+                        checkpoint=True)
+      data, checkpoints = self.getData(h5fname)
+      dataFailed, checkpointsFailed = self.getData(h5fnameFailed)
+      self.assertTrue(np.count_nonzero(dataFailed['sol000/amplitude000'][1] == 0) > 0)
+      for name in data:
+          for a, b in zip(data[name], dataFailed[name]):
+              self.assertTrue(np.array_equal(a, b))
+      self.assertEqual([c['step'] for c in checkpointsFailed], ['clip'])
+
+    def assertSameData(self, h5fname1, h5fname2):
+      data1, checkpoints1 = self.getData(h5fname1)
+      data2, checkpoints2 = self.getData(h5fname2)
+      self.assertEqual(sorted(data1), sorted(data2))
+      for name in data1:
+          self.assertTrue(np.array_equal(data1[name][0], data2[name][0]), name)
+          self.assertTrue(np.array_equal(data1[name][1], data2[name][1]), name)
+          self.assertEqual(data1[name][2], data2[name][2], name)
+
+    resumeParset = "[smooth]\noperation = SMOOTH\nsoltab = sol000/phase000\naxesToSmooth = [time]\nsize = [5]\n" \
+                   "[residuals]\noperation = RESIDUALS\nsoltab = sol000/phase001\nsoltabsToSub = [phase000]\n" \
+                   "[norm]\noperation = NORM\nsoltab = sol000/amplitude000\naxesToNorm = [time]\n"
+
+    def test_resume_after_complete_run(self):
+      h5fname = self.copy('full.h5')
+      self.runParset(h5fname, self.resumeParset, checkpoint=True)
+      h5fnameResumed = self.copy('resumed.h5')
+      self.runParset(h5fnameResumed, self.resumeParset, checkpoint=True)
+      self.runParset(h5fnameResumed, self.resumeParset, resume=True)
+      self.assertSameData(h5fname, h5fnameResumed)
+      self.assertEqual([c['step'] for c in self.getData(h5fnameResumed)[1]], ['smooth', 'residuals', 'norm'])
+
+    def test_resume_after_failure(self):
+      h5fname = self.copy('full.h5')
+      self.runParset(h5fname, self.resumeParset)
+      h5fnameResumed = self.copy('resumed.h5')
+      self.assertRaises(ValueError, self.runParset, h5fnameResumed,
+                        self.resumeParset.replace("axesToNorm = [time]\n", "axesToNorm = [time]\nnormVal = abc\n"), checkpoint=True)
+      self.assertEqual([c['step'] for c in self.getData(h5fnameResumed)[1]], ['smooth', 'residuals'])
+      self.runParset(h5fnameResumed, self.resumeParset, resume=True)
+      self.assertSameData(h5fname, h5fnameResumed)
+
+    def test_resume_refused(self):
+      h5fname = self.copy('resumed.h5')
+      self.runParset(h5fname, self.resumeParset, checkpoint=True)
+      # a step already run changed
+      self.assertRaises(Exception, self.runParset, h5fname, self.resumeParset.replace("size = [5]", "size = [3]"), resume=True)
+      # a soltab changed after the checkpointed steps, e.g. a step failed while writing it
+      h5 = h5parm(h5fname, readonly=False)
+      soltab = h5.getSolset("sol000").getSoltab("phase001")
+      soltab.setValues(soltab.getValues(retAxesVals=False)*2.)
+      h5.close()
+      data, checkpoints = self.getData(h5fname)
+      self.assertRaises(Exception, self.runParset, h5fname, self.resumeParset, resume=True)
+      dataAfter, checkpointsAfter = self.getData(h5fname)
+      self.assertTrue(np.array_equal(data['sol000/phase001'][0], dataAfter['sol000/phase001'][0]))
+      self.assertEqual(checkpoints, checkpointsAfter)
+
+    def test_no_checkpoints(self):
+      h5fname = self.copy('run.h5')
+      self.runParset(h5fname, self.resumeParset, checkpoint=True)
+      self.runParset(h5fname, self.resumeParset)
+      self.assertEqual(self.getData(h5fname)[1], [])
+
+    def test_parallel_same_as_sequential(self):
+      # independent steps, steps depending on the previous ones, a step creating soltabs and steps reading other soltabs
+      parset = "[smooth0]\noperation = SMOOTH\nsoltab = sol000/phase000\naxesToSmooth = [time]\nsize = [5]\n" \
+               "[clip0]\noperation = CLIP\nsoltab = sol000/amplitude.*\naxesToClip = [time]\nclipLevel = 1.5\n" \
+               "[duplicate1]\noperation = DUPLICATE\nsoltab = sol001/phase000\nsoltabOut = phaseDup\n" \
+               "[smooth1]\noperation = SMOOTH\nsoltab = sol001/phase.*\naxesToSmooth = [freq]\nsize = [3]\n" \
+               "[residuals0]\noperation = RESIDUALS\nsoltab = sol000/phase001\nsoltabsToSub = [phase000]\n" \
+               "[norm1]\noperation = NORM\nsoltab = sol001/amplitude000\naxesToNorm = [time]\n" \
+               "[reset]\noperation = RESET\nsoltab = .*/amplitude001\n" \
+               "[smoothall]\noperation = SMOOTH\nsoltab = [sol000/phase.*, sol001/phase.*]\naxesToSmooth = [time]\nsize = [3]\n"
+      h5fnameSequential = self.copy('sequential.h5')
+      self.assertEqual(self.runParset(h5fnameSequential, parset), 0)
+      h5fnameParallel = self.copy('parallel.h5')
+      self.assertEqual(self.runParset(h5fnameParallel, parset, ncpu=2), 0)
+      self.assertSameData(h5fnameSequential, h5fnameParallel)
+      self.assertTrue('sol001/phaseDup' in self.getData(h5fnameParallel)[0])
+      # no temporary files left
+      self.assertEqual(sorted(os.listdir(self.tmpdir)), ['parallel.h5', 'sequential.h5', 'test.h5', 'test.parset'])
+
+    def test_step_jobs(self):
+      parsetFile = self.fileName('test.parset')
+      with open(parsetFile, 'w') as f:
+          f.write("[smooth]\noperation = SMOOTH\nsoltab = [sol001/phase.*, sol000/phase001]\naxesToSmooth = [time]\n")
+      parser = LosotoParser(parsetFile)
+      h5 = h5parm(self.fileName('test.h5'), readonly=True)
+      step = {'name': 'smooth', 'index': (0,), 'op': 'smooth', 'ncpu': 1, 'scope': None, 'soltabs': None}
+      jobs = _getStepJobs(parser, step, h5)
+      h5.close()
+      # one job per soltab, in the catalog order
+      self.assertEqual([job['soltabs'] for job in jobs], [['sol000/phase001'], ['sol001/phase000'], ['sol001/phase001']])
+      self.assertEqual([job['index'] for job in jobs], [(0, 0), (0, 1), (0, 2)])
+      for job in jobs:
+          self.assertEqual(job['reads'], set(job['soltabs']))
+          self.assertEqual(job['writes'], set(job['soltabs']))
+
+    def test_step_soltabs(self):
+      # the soltabs matched on the catalog are the ones matched by a regex on every soltab
+      def scanSoltabs(h5, stsel):
+          names = []
+          for solset in h5.getSolsets():
+              for soltabName in solset.getSoltabNames():
+                  if any(re.compile(this_stsel).match(solset.name+'/'+soltabName) for this_stsel in stsel):
+                      names.append(solset.name+'/'+soltabName)
+          return names
+
+      parsetFile = self.fileName('test.parset')
+      selections = ['.*/.*', 'sol000/phase000', 'sol001/amp.*', '.*/phase001', '[sol000/phase.*, sol001/amplitude000]',
+                    'sol00/.*', 'phase000', '[.*/amplitude001, sol000/.*]', 'sol002/.*']
+      with open(parsetFile, 'w') as f:
+          for i, stsel in enumerate(selections):
+              f.write("[step%i]\noperation = SMOOTH\nsoltab = %s\n" % (i, stsel))
+          f.write("[global]\noperation = SMOOTH\n")
+      parser = LosotoParser(parsetFile)
+      h5 = h5parm(self.fileName('test.h5'), readonly=False)
+      for changed in [False, True]:
+          for i, stsel in enumerate(selections):
+              names = scanSoltabs(h5, parser.getarraystr('step%i' % i, 'soltab'))
+              self.assertEqual(sorted(getStepSoltabNames(parser, 'step%i' % i, h5)), sorted(names), stsel)
+              soltabs = getStepSoltabs(parser, 'step%i' % i, h5)
+              self.assertEqual(sorted(soltab.getAddress() for soltab in soltabs), sorted(names))
+          # no soltab selection in the step
+          self.assertEqual(sorted(getStepSoltabNames(parser, 'global', h5)), sorted(scanSoltabs(h5, ['.*/.*'])))
+          if changed: break
+          # the catalog follows new, deleted and renamed solsets/soltabs
+          solset = h5.getSolset('sol000')
+          solset.getSoltab('phase000').copy('phase002')
+          solset.getSoltab('amplitude001').delete()
+          solset.getSoltab('amplitude000').rename('phase003')
+          h5.getSolset('sol001').rename('sol002')
+          h5.makeSolset('sol003')
+      h5.close()
+
+    def test_step_profiler(self):
+      parset = "[smooth]\noperation = SMOOTH\nsoltab = sol000/phase.*\naxesToSmooth = [time]\nsize = [5]\n" \
+               "[clip]\noperation = CLIP\nsoltab = sol001/amplitude000\naxesToClip = [time]\nclipLevel = 1.5\n"
+      parsetFile = self.fileName('test.parset')
+      with open(parsetFile, 'w') as f: f.write(parset)
+      parser = LosotoParser(parsetFile)
+      profiler = StepProfiler(cprofileSteps=1)
+      h5 = h5parm(self.copy('profiled.h5'), readonly=False)
+      self.assertEqual(runSteps(parser, ['smooth', 'clip'], h5, ops, profiler=profiler), 0)
+      h5.close()
+      # profiling does not change the results
+      h5fname = self.copy('run.h5')
+      self.runParset(h5fname, parset)
+      self.assertSameData(h5fname, self.fileName('profiled.h5'))
+
+      # a record for each soltab, then one for the whole step
+      self.assertEqual([(r['step'], r['operation'], r['soltab']) for r in profiler.records],
+                       [('smooth', 'SMOOTH', 'sol000/phase000'), ('smooth', 'SMOOTH', 'sol000/phase001'), ('smooth', 'SMOOTH', ''),
+                        ('clip', 'CLIP', 'sol001/amplitude000'), ('clip', 'CLIP', '')])
+      for record in profiler.records:
+          self.assertEqual(sorted(record), sorted(StepProfiler.fields))
+          self.assertEqual(record['pid'], os.getpid())
+          self.assertTrue(record['wall'] >= 0 and record['cpu'] >= 0)
+          self.assertTrue(record['getValues'] > 0 and record['setValues'] > 0)
+      steps = [r for r in profiler.records if r['soltab'] == '']
+      soltabs = [r for r in profiler.records if r['soltab'] != '']
+      self.assertEqual(steps[0]['getValues'], soltabs[0]['getValues'] + soltabs[1]['getValues'])
+      self.assertTrue(steps[0]['wall'] >= soltabs[0]['wall'] + soltabs[1]['wall'])
+      self.assertTrue(steps[0]['peakRss'] >= max(soltabs[0]['peakRss'], soltabs[1]['peakRss']))
+      self.assertEqual(len(profiler.cprofiles), 1)
+      self.assertEqual(profiler.cprofiles[0][1], max(steps, key=lambda r: r['wall'])['step'])
+
+      # CSV and JSON reports, cProfile stats readable by pstats
+      import csv, json, pstats
+      profiler.write(self.fileName('report.csv'))
+      with open(self.fileName('report.csv')) as f:
+          rows = list(csv.DictReader(f))
+      self.assertEqual([row['soltab'] for row in rows], [r['soltab'] for r in profiler.records])
+      profiler.write(self.fileName('report.json'))
+      with open(self.fileName('report.json')) as f:
+          report = json.load(f)
+      self.assertEqual(report['records'], profiler.records)
+      profileFile = self.fileName('report.1.%s.prof' % profiler.cprofiles[0][1])
+      self.assertTrue(pstats.Stats(profileFile).total_tt > 0)
+
+      # runStep alone, without cProfile
+      profiler = StepProfiler()
+      h5 = h5parm(h5fname, readonly=False)
+      self.assertEqual(runStep(parser, 'clip', h5, operations.clip, profiler=profiler), 0)
+      self.assertEqual(runStep(parser, 'clip', h5, operations.clip), 0)
+      h5.close()
+      self.assertEqual([r['soltab'] for r in profiler.records], ['sol001/amplitude000', ''])
+      self.assertEqual(profiler.cprofiles, [])
+
+    def test_copy_merge_soltabs(self):
+      h5fname = self.copy('merged.h5')
+      data, checkpoints = self.getData(h5fname)
+      names = set(['sol000/phase000', 'sol001/'])
+      h5 = h5parm(h5fname, readonly=False)
+      _copyStepSoltabs(h5, names, self.fileName('job.h5'))
+
+      # the job h5parm has only the copied soltabs, with the solset tables
+      job = h5parm(self.fileName('job.h5'), readonly=False)
+      self.assertEqual(sorted(job.getSolset('sol000').getSoltabNames()), ['phase000'])
+      self.assertEqual(sorted(job.getSolset('sol001').getSoltabNames()), ['amplitude000', 'amplitude001', 'phase000', 'phase001'])
+      self.assertEqual(job.getSolset('sol000').getAnt(), h5.getSolset('sol000').getAnt())
+      soltab = job.getSolset('sol000').getSoltab('phase000')
+      soltab.setValues(soltab.getValues(retAxesVals=False)*2.)
+      job.getSolset('sol001').getSoltab('amplitude001').delete()
+      job.getSolset('sol001').getSoltab('phase001').copy('phaseDup')
+      job.close()
+
+      nodes = [h5.getSolset('sol000').getSoltab('phase000').obj.val, h5.getSolset('sol001').getSoltab('phase001').obj.weight]
+      _mergeStepSoltabs(h5, names, self.fileName('job.h5'))
+      # soltabs are written back in place, a replaced node would be closed
+      for node in nodes: self.assertTrue(node._v_isopen)
+      h5.close()
+      merged, checkpoints = self.getData(h5fname)
+      self.assertEqual(sorted(merged), sorted(set(data) - set(['sol001/amplitude001']) | set(['sol001/phaseDup'])))
+      self.assertTrue(np.allclose(merged['sol000/phase000'][0], data['sol000/phase000'][0]*2.))
+      self.assertTrue(np.array_equal(merged['sol001/phaseDup'][0], data['sol001/phase001'][0]))
+      for name in data:
+          if name in merged and name != 'sol000/phase000':
+              self.assertTrue(np.array_equal(merged[name][0], data[name][0]), name)
+              self.assertTrue(np.array_equal(merged[name][1], data[name][1]), name)
+
+if __name__ == '__main__':
+    unittest.main()
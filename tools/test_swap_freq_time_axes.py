@@ -4,13 +4,13 @@
 from losoto.h5parm import h5parm
 import tables
 import unittest
+from unittest import mock
 import numpy as np
-import os
+import os, tempfile
 from swap_freq_time_axes import h5parm_swap_freq_time
 
 class TestH5parmSwapFreqTime(unittest.TestCase):
     def test_swap_freq_time_axes(self):
-      import os, tempfile
       h5fname = tempfile.mktemp(suffix='.h5')
 
       h5 = h5parm(h5fname, readonly=False)
@@ -20,11 +20,13 @@ class TestH5parmSwapFreqTime(unittest.TestCase):
       timevals = np.arange(0, 5)
       freqvals = np.arange(0, 3)
 
-      vals = np.ones((2, 3, 5))
+      vals = np.arange(30.).reshape((2, 3, 5))
+      weights = np.ones((2, 3, 5))
+      weights[0, 1, 2] = 0
       soltab = solset.makeSoltab(soltype=b"phase", soltabName="phase000",
                                  axesNames=["dir","freq","time"], 
                                  axesVals=[dirvals, freqvals, timevals],
-                                 vals=vals, weights=vals)
+                                 vals=vals, weights=weights, valDtype='f32')
 
       h5.close()
 
@@ -33,13 +35,46 @@ class TestH5parmSwapFreqTime(unittest.TestCase):
       h5 = h5parm(h5fname, readonly=False)
       solset = h5.getSolset("sol000")
       soltab = solset.getSoltab("phase000")
-      vals = soltab.getValues(retAxesVals = False)
-      weights = soltab.getValues(retAxesVals=False, weight=True)
+      newvals = soltab.getValues(retAxesVals = False)
+      newweights = soltab.getValues(retAxesVals=False, weight=True)
       axesnames = soltab.getAxesNames()
 
-      self.assertEqual(vals.shape, (2, 5, 3))
-      self.assertEqual(weights.shape, (2, 5, 3))
+      self.assertEqual(newvals.shape, (2, 5, 3))
+      self.assertEqual(newweights.shape, (2, 5, 3))
       self.assertEqual(axesnames, ["dir", "time", "freq"])
+      self.assertTrue(np.array_equal(newvals, vals.transpose((0, 2, 1))))
+      self.assertTrue(np.array_equal(newweights, weights.transpose((0, 2, 1))))
+      self.assertEqual(soltab.getDtype(), 'f32')
+      self.assertEqual(soltab.getDtype(weight=True), 'f16')
+      h5.close()
+
+      os.remove(h5fname)
+
+    def test_relayout_rollback(self):
+      h5fname = tempfile.mktemp(suffix='.h5')
+
+      h5 = h5parm(h5fname, readonly=False)
+      solset = h5.makeSolset("sol000")
+      vals = np.arange(30.).reshape((2, 3, 5))
+      weights = np.ones((2, 3, 5))
+      soltab = solset.makeSoltab(soltype="phase", soltabName="phase000",
+                                 axesNames=["dir","freq","time"],
+                                 axesVals=[["CasA", "VirA"], np.arange(0, 3), np.arange(0, 5)],
+                                 vals=vals, weights=weights)
+
+      # fail while swapping the weights, after the values are swapped
+      rename = tables.node.Node._f_rename
+      def failingRename(node, newname, overwrite=False):
+          if node._v_name == 'weight_relayout': raise IOError('test failure')
+          return rename(node, newname, overwrite)
+      with mock.patch.object(tables.node.Node, '_f_rename', failingRename):
+          self.assertRaises(IOError, soltab.relayout, ["dir", "time", "freq"])
+
+      self.assertEqual(sorted(soltab.obj._v_children.keys()), sorted(['val', 'weight', 'dir', 'freq', 'time']))
+      self.assertEqual(soltab.getAxesNames(), ["dir", "freq", "time"])
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False), vals))
+      self.assertTrue(np.array_equal(soltab.getValues(retAxesVals=False, weight=True), weights))
+      h5.close()
 
       os.remove(h5fname)
 